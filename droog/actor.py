@@ -23,8 +23,19 @@ class Actor(object):
     actor act when their turn comes up."""
 
     DONE = -1
+    # Batched actors due at the same tick act together, if they share the
+    # same act_batch.
+    batched = False
 
     def act(self):
         """Perform an action and return action cost. Children should override
         this method."""
         raise NotImplementedError("Actor.act() should be overridden.")
+
+    @staticmethod
+    def act_batch(actors):
+        """Decide the actions of batched actors due at the same tick, and
+        return a list of functions, one for each actor, that carry out its
+        action and return its cost. Batched children should override this
+        method."""
+        raise NotImplementedError("Actor.act_batch() should be overridden.")
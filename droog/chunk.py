@@ -0,0 +1,505 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Droog - Chunked Worlds
+
+Very large worlds are split into square chunks of terrain that are generated
+the first time they are touched, and may be thrown away and generated again
+when they have not been needed for a while.
+
+Every chunk is generated from the world seed and its own coordinates alone,
+so it comes out the same whichever order the chunks are generated in. The
+roads between junctions are decided the same way, from the seed and the
+junctions at either end, so they line up across chunk borders."""
+
+import random
+import logging
+from . import fov
+from . import pathing
+from . import sampling
+from . import tile
+from . import world
+
+LOG = logging.getLogger(__name__)
+
+# Chunks are a whole number of road blocks across, so no building is split
+# between chunks.
+CHUNK_BLOCKS = 4
+CHUNK_SIZE = world.ROAD_GRID_SIZE * CHUNK_BLOCKS
+# The most chunks kept in memory at once.
+CHUNK_CAPACITY = 256
+# Worlds with more cells than this are too big to generate all at once.
+EAGER_WORLD_LIMIT = 1000 * 1000
+
+_TERRAIN = 0
+_TRANSPARENT = 1
+
+
+def _random_for(seed, *coords):
+    """Return a random number generator seeded from the world seed and a set
+    of coordinates. The seed does not depend on Python's string hashing, so it
+    is the same from one run to the next."""
+    value = seed & 0xffffffffffffffff
+    for coord in coords:
+        value = ((value * 1000003) ^ (coord & 0xffffffff)) & 0xffffffffffffffff
+    return random.Random(value)
+
+
+class ChunkedWorld(world.World):
+    """A world generated and kept in memory a chunk at a time.
+
+    Only the chunks that have been looked at, walked through or spawned into
+    are held in memory, and the ones farthest from the hero are evicted when
+    there are too many. The flags for cells that have been seen are kept for
+    every chunk ever seen, so exploration costs memory but a big map does
+    not. Chunks whose terrain was changed after they were generated are never
+    evicted."""
+
+    def __init__(self, rows, cols, seed=None, capacity=CHUNK_CAPACITY):
+        """Creates a chunked World of the specified height and width.
+
+        seed -- the seed every chunk is generated from; by default, a random
+                one
+        capacity -- the most chunks to keep in memory at once
+        """
+        self._capacity = capacity
+        self._chunks = {}
+        self._pinned = set()
+        self._generated = set()
+        # Callables taking (top, bottom, left, right) that populate an area of
+        # the map the first time it is generated.
+        self.chunk_populators = []
+        world.World.__init__(self, rows, cols, vectorized=False,
+                             seed=seed)
+
+    def _allocate(self):
+        """Create planes that load chunks on demand."""
+        self._terrain = _ChunkedPlane(self, _TERRAIN)
+        self._transparent = _ChunkedPlane(self, _TRANSPARENT)
+        self._seen = _SparsePlane(self.cols)
+        self._was_seen = _SparsePlane(self.cols)
+        self._free_indoor = sampling.IndexSet()
+        self._free_outdoor = sampling.IndexSet()
+        self._hidden = sampling.IndexSet()
+
+    def __getstate__(self):
+        """Pickle the world without its caches. The sampling sets are kept,
+        as they cover chunks no longer in memory and cannot be rebuilt."""
+        state = world.World.__getstate__(self)
+        for name in ('_free_indoor', '_free_outdoor', '_hidden'):
+            state[name] = getattr(self, name)
+        return state
+
+    def _index_locations(self):
+        """Nothing to do; the cells of each chunk are indexed when it is first
+        generated."""
+        pass
+
+    def _create_caches(self):
+        """Create the caches; there are too many cells to keep a Location,
+        or a path finding buffer, for each one."""
+        self.fov_cache = fov.FovCache()
+        self._route_planner = None
+        self._path_finder = pathing.PathFinder(self._terrain, self.rows,
+                                               self.cols)
+
+    def _generate(self, vectorized):
+        """Place the generator; the terrain is generated chunk by chunk."""
+        self.generator_location = self.location(self.rows / 2,
+                                                self.cols / 2)
+
+    def location(self, row, col):
+        """Return a new Location for (row, col)."""
+        return world.Location(row, col)
+
+    def seen_tile_count(self):
+        """Return the number of tiles currently being seen."""
+        return self._seen.count()
+
+    def _walkable_locations(self, indoor, area=None):
+        """Return a list of unoccupied, walkable Locations that are either
+        indoors or outdoors. Without an area, only the chunks in memory are
+        searched."""
+        if area is not None:
+            return world.World._walkable_locations(self, indoor, area)
+        results = []
+        for chunk_row, chunk_col in sorted(self._chunks):
+            results.extend(world.World._walkable_locations(
+                self, indoor, self._chunk_area(chunk_row, chunk_col)))
+        return results
+
+    def _log(self):
+        """Dumps the chunks in memory into a file called 'world.dump'"""
+        with open("world.dump", "w") as dump_file:
+            for chunk_row, chunk_col in sorted(self._chunks):
+                top, bottom, left, right = self._chunk_area(chunk_row,
+                                                            chunk_col)
+                dump_file.write("Chunk at row %d, col %d\n" % (top, left))
+                for row in xrange(top, bottom):
+                    start = row * self.cols
+                    dump_file.write("".join(
+                        tile.GLYPHS[code] for code in
+                        self._terrain[start + left:start + right]))
+                    dump_file.write("\n")
+
+    def loaded_chunk_count(self):
+        """Return the number of chunks in memory."""
+        return len(self._chunks)
+
+    def _set_terrain(self, row, col, tile_type):
+        """Set the terrain of the cell at (row, col) to a TileType, keeping
+        its chunk in memory from then on."""
+        world.World._set_terrain(self, row, col, tile_type)
+        self._pinned.add((row // CHUNK_SIZE, col // CHUNK_SIZE))
+
+    def _chunk_area(self, chunk_row, chunk_col):
+        """Return the half-open rows and columns of a chunk within the map,
+        as (top, bottom, left, right)."""
+        top = chunk_row * CHUNK_SIZE
+        left = chunk_col * CHUNK_SIZE
+        return (top, min(top + CHUNK_SIZE, self.rows),
+                left, min(left + CHUNK_SIZE, self.cols))
+
+    def _chunk(self, chunk_row, chunk_col):
+        """Return the planes of a chunk, generating it if it is not in
+        memory."""
+        key = (chunk_row, chunk_col)
+        planes = self._chunks.get(key)
+        if planes is None:
+            planes = self._load_chunk(key)
+        return planes
+
+    def _load_chunk(self, key):
+        """Generate a chunk, and populate it if it is new."""
+        if len(self._chunks) >= self._capacity:
+            self._evict_chunk()
+        painter = _ChunkPainter(self, key)
+        self._paint_chunk(painter, *self._chunk_area(*key))
+        planes = self._chunks[key] = painter.finish()
+        if key not in self._generated:
+            self._generated.add(key)
+            self._index_chunk(key, planes[_TERRAIN])
+            for populate in self.chunk_populators:
+                populate(*self._chunk_area(*key))
+        return planes
+
+    def _index_chunk(self, key, terrain):
+        """Add the unoccupied, walkable cells of a new chunk to the sampling
+        sets."""
+        top, bottom, left, right = self._chunk_area(*key)
+        for row in xrange(top, bottom):
+            start = (row - top) * CHUNK_SIZE
+            for offset in xrange(right - left):
+                code = terrain[start + offset]
+                if not tile.WALKABLE[code]:
+                    continue
+                index = row * self.cols + left + offset
+                if index in self._creatures:
+                    continue
+                if tile.INDOOR[code]:
+                    self._free_indoor.add(index)
+                else:
+                    self._free_outdoor.add(index)
+                if index not in self._lit:
+                    self._hidden.add(index)
+
+    def _evict_chunk(self):
+        """Throw away the chunk farthest from the hero that has not been
+        changed."""
+        hero_row, hero_col = self.hero_location.row, self.hero_location.col
+        farthest = None
+        farthest_distance = -1
+        for key in self._chunks:
+            if key in self._pinned:
+                continue
+            top, bottom, left, right = self._chunk_area(*key)
+            distance = max(abs((top + bottom) / 2 - hero_row),
+                           abs((left + right) / 2 - hero_col))
+            if distance > farthest_distance:
+                farthest, farthest_distance = key, distance
+        if farthest is not None:
+            LOG.debug("Evicting chunk %r", farthest)
+            del self._chunks[farthest]
+
+    def _edge(self, direction, junction_row, junction_col):
+        """Return True if the random draw for the road into a junction, from
+        the north ('v') or from the west ('h'), made one.
+
+        The road north of a junction is the road south of the junction above
+        it, and the road west of a junction is the road east of the junction
+        to its left, so neighbouring junctions always agree."""
+        return _random_for(self.seed, ord(direction), junction_row,
+                           junction_col).random() < world.ROAD_CHANCE
+
+    def _drawn_road(self, junction_row, junction_col, drow, dcol):
+        """Return True if the draw made a road from a junction to the
+        neighbouring junction (drow, dcol) away."""
+        if drow:
+            return self._edge('v', junction_row + max(drow, 0), junction_col)
+        return self._edge('h', junction_row, junction_col + max(dcol, 0))
+
+    def _arrives(self, junction_row, junction_col, drow, dcol):
+        """Return True if a road comes into a junction from the neighbouring
+        junction (drow, dcol) away, either drawn or carried on through that
+        junction."""
+        while not self._drawn_road(junction_row, junction_col, drow, dcol):
+            junction_row += drow
+            junction_col += dcol
+            if not self._carries_on(junction_row, junction_col, drow, dcol):
+                return False
+        return True
+
+    def _carries_on(self, junction_row, junction_col, drow, dcol):
+        """Return True if a junction is on the map and no road was drawn to
+        either side of the line through it in direction (drow, dcol)."""
+        size = world.ROAD_GRID_SIZE
+        return 0 <= junction_row < self.rows // size and \
+            0 <= junction_col < self.cols // size and \
+            not self._drawn_road(junction_row, junction_col, dcol, drow) and \
+            not self._drawn_road(junction_row, junction_col, -dcol, -drow)
+
+    def _road(self, junction_row, junction_col, drow, dcol):
+        """Return True if there is a road from a junction to the neighbouring
+        junction (drow, dcol) away.
+
+        A road is there if it was drawn, or if a road coming into either
+        junction from the other side would otherwise end there. The roads
+        are carried straight on through junctions that have no other roads
+        drawn, so like the roads of World's junction grid, no junction ends
+        up with just one road."""
+        return self._drawn_road(junction_row, junction_col, drow, dcol) or \
+            (self._carries_on(junction_row, junction_col, drow, dcol) and
+             self._arrives(junction_row, junction_col, -drow, -dcol)) or \
+            (self._carries_on(junction_row + drow, junction_col + dcol,
+                              drow, dcol) and
+             self._arrives(junction_row + drow, junction_col + dcol, drow,
+                           dcol))
+
+    def _junction(self, junction_row, junction_col):
+        """Return the [north, south, east, west] roads of a junction."""
+        return [self._road(junction_row, junction_col, -1, 0),
+                self._road(junction_row, junction_col, 1, 0),
+                self._road(junction_row, junction_col, 0, 1),
+                self._road(junction_row, junction_col, 0, -1)]
+
+    def _paint_chunk(self, painter, top, bottom, left, right):
+        """Paint the terrain of the area of a chunk, in the same stages as a
+        whole world."""
+        painter.sprinkle(top, bottom, left, right, tile.make_tree(),
+                         world.TREE_CHANCE, tile.make_empty())
+        self._paint_roads(painter, top, bottom, left, right)
+        row, col = self.generator_location.row, self.generator_location.col
+        painter.fill(row, row + 1, col, col + 1,
+                     tile.make_shield_generator())
+        self._generate_shield(painter)
+        block_size = world.ROAD_GRID_SIZE
+        for block_row in xrange(top // block_size, bottom // block_size):
+            if (block_row + 1) * block_size >= self.rows:
+                break
+            for block_col in xrange(left // block_size, right // block_size):
+                if (block_col + 1) * block_size >= self.cols:
+                    break
+                # Each block has its own random numbers, so its building is
+                # the same however many random numbers the chunk used.
+                painter.random = _random_for(self.seed, ord('b'), block_row,
+                                             block_col)
+                if painter.random.random() < world.BUILDING_CHANCE:
+                    begin = world.Location(block_row * block_size,
+                                           block_col * block_size)
+                    end = world.Location(begin.row + block_size,
+                                         begin.col + block_size)
+                    self._generate_building(painter, begin, end,
+                                            painter.random)
+
+    def _paint_roads(self, painter, top, bottom, left, right):
+        """Paint the roads of every junction that reach into an area.
+
+        Roads reach a few cells past the junctions at their ends, so the
+        junctions just beyond the area are painted too."""
+        street = tile.make_street()
+        empty = tile.make_empty()
+        size = world.ROAD_GRID_SIZE
+        junction_rows = xrange(max(top // size - 1, 0),
+                               min(bottom // size + 1, self.rows // size))
+        junction_cols = xrange(max(left // size - 1, 0),
+                               min(right // size + 1, self.cols // size))
+        junctions = [(junction_row, junction_col,
+                      self._junction(junction_row, junction_col))
+                     for junction_row in junction_rows
+                     for junction_col in junction_cols]
+        for junction_row, junction_col, junction in junctions:
+            road_row = (junction_row + 1) * size
+            road_col = (junction_col + 1) * size
+            if junction[0]:  # North road
+                north, south = max(road_row - size - 3, 0), road_row
+                painter.fill_around(north, south, road_col - 5,
+                                    road_col - 3, empty, street)
+                painter.fill(north, south, road_col - 3, road_col, street)
+                if road_col < self.cols - 1:
+                    painter.fill_around(north, south, road_col,
+                                        road_col + 1, empty, street)
+                if road_col < self.cols - 2:
+                    painter.fill_around(north, south, road_col + 1,
+                                        road_col + 2, empty, street)
+            if junction[3]:  # West road
+                west, east = road_col - size, road_col
+                painter.fill_around(road_row - 5, road_row - 3, west, east,
+                                    empty, street)
+                painter.fill(road_row - 3, road_row, west, east, street)
+                if road_row < self.rows - 1:
+                    painter.fill_around(road_row, road_row + 1, west, east,
+                                        empty, street)
+                if road_row < self.rows - 2:
+                    painter.fill_around(road_row + 1, road_row + 2, west,
+                                        east, empty, street)
+        for junction_row, junction_col, junction in junctions:
+            road_row = (junction_row + 1) * size
+            road_col = (junction_col + 1) * size
+            if not junction[0] and not junction[3]:
+                painter.fill(road_row - 3, road_row - 2, road_col - 3,
+                             road_col - 2, empty)
+            if not junction[2] and not junction[3]:
+                painter.fill(road_row - 1, road_row, road_col - 3,
+                             road_col - 2, empty)
+            if not junction[1] and not junction[2]:
+                painter.fill(road_row - 1, road_row, road_col - 1,
+                             road_col, empty)
+            if not junction[0] and not junction[1]:
+                painter.fill(road_row - 3, road_row - 2, road_col - 1,
+                             road_col, empty)
+
+
+class _ChunkPainter(object):
+    """Paints the terrain of one chunk, ignoring whatever falls outside it.
+
+    Areas are given in world coordinates, as half-open ranges of rows and
+    columns. The painter's random numbers come from the world seed and the
+    chunk coordinates."""
+
+    def __init__(self, chunked_world, key):
+        self._top = key[0] * CHUNK_SIZE
+        self._left = key[1] * CHUNK_SIZE
+        self._terrain = bytearray(CHUNK_SIZE * CHUNK_SIZE)
+        self.random = _random_for(chunked_world.seed, ord('c'), *key)
+
+    def _cells(self, top, bottom, left, right):
+        """Yield the chunk indices of the cells of an area within the
+        chunk."""
+        top = max(top - self._top, 0)
+        bottom = min(bottom - self._top, CHUNK_SIZE)
+        left = max(left - self._left, 0)
+        right = min(right - self._left, CHUNK_SIZE)
+        for row in xrange(top, bottom):
+            start = row * CHUNK_SIZE
+            for index in xrange(start + left, start + right):
+                yield index
+
+    def fill(self, top, bottom, left, right, tile_type):
+        """Fill an area with a type of tile."""
+        for index in self._cells(top, bottom, left, right):
+            self._terrain[index] = tile_type.code
+
+    def fill_around(self, top, bottom, left, right, tile_type, keep):
+        """Fill an area with a type of tile, except for cells that are
+        already of the type to keep."""
+        for index in self._cells(top, bottom, left, right):
+            if self._terrain[index] != keep.code:
+                self._terrain[index] = tile_type.code
+
+    def sprinkle(self, top, bottom, left, right, tile_type, chance,
+                 otherwise):
+        """Fill each cell of an area with a type of tile by chance, and with
+        the other type of tile otherwise."""
+        rand = self.random.random
+        for index in self._cells(top, bottom, left, right):
+            if chance > rand():
+                self._terrain[index] = tile_type.code
+            else:
+                self._terrain[index] = otherwise.code
+
+    def outline(self, top, bottom, left, right, tile_type, break_chance):
+        """Draw the border of an area with a type of tile, leaving each cell
+        of it untouched by chance."""
+        for row in xrange(top, bottom):
+            for col in xrange(left, right):
+                if row == top or row == bottom - 1 or col == left \
+                        or col == right - 1:
+                    if break_chance < self.random.random():
+                        self.fill(row, row + 1, col, col + 1, tile_type)
+
+    def finish(self):
+        """Return the terrain and transparency planes of the chunk."""
+        transparent = bytearray(tile.TRANSPARENT[code]
+                                for code in self._terrain)
+        return (self._terrain, transparent)
+
+
+class _ChunkedPlane(object):
+    """A row-major plane of bytes over the whole map, read from and written
+    to the planes of its chunks."""
+
+    def __init__(self, chunked_world, plane):
+        self._world = chunked_world
+        self._plane = plane
+
+    def __len__(self):
+        return self._world.rows * self._world.cols
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return bytearray(self[i]
+                             for i in xrange(*index.indices(len(self))))
+        row, col = divmod(index, self._world.cols)
+        planes = self._world._chunk(row // CHUNK_SIZE, col // CHUNK_SIZE)
+        return planes[self._plane][(row % CHUNK_SIZE) * CHUNK_SIZE +
+                                   col % CHUNK_SIZE]
+
+    def __setitem__(self, index, value):
+        row, col = divmod(index, self._world.cols)
+        planes = self._world._chunk(row // CHUNK_SIZE, col // CHUNK_SIZE)
+        planes[self._plane][(row % CHUNK_SIZE) * CHUNK_SIZE +
+                            col % CHUNK_SIZE] = value
+
+
+class _SparsePlane(object):
+    """A row-major plane of flags over the whole map, which only keeps the
+    chunks that have a flag set."""
+
+    def __init__(self, cols):
+        self._cols = cols
+        self._chunks = {}
+
+    def __getitem__(self, index):
+        row, col = divmod(index, self._cols)
+        flags = self._chunks.get((row // CHUNK_SIZE, col // CHUNK_SIZE))
+        if flags is None:
+            return 0
+        return flags[(row % CHUNK_SIZE) * CHUNK_SIZE + col % CHUNK_SIZE]
+
+    def __setitem__(self, index, value):
+        row, col = divmod(index, self._cols)
+        key = (row // CHUNK_SIZE, col // CHUNK_SIZE)
+        flags = self._chunks.get(key)
+        if flags is None:
+            if not value:
+                return
+            flags = self._chunks[key] = bytearray(CHUNK_SIZE * CHUNK_SIZE)
+        flags[(row % CHUNK_SIZE) * CHUNK_SIZE + col % CHUNK_SIZE] = value
+
+    def count(self):
+        """Return the number of flags set."""
+        return sum(flags.count(chr(True)) for flags in self._chunks.values())
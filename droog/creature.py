@@ -20,6 +20,7 @@ creature types."""
 
 import logging
 import random
+import functools
 from . import actor
 from . import attack
 from . import the
@@ -27,6 +28,11 @@ from . import world
 from . import combat
 from . import engine
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 LOG = logging.getLogger(__name__)
 
 
@@ -64,6 +70,11 @@ class Creature(actor.Actor):
         Currently that is stunned."""
         self.is_stunned = False
 
+    @staticmethod
+    def act_batch(creatures):
+        """Decide the actions of monsters due at the same tick together."""
+        return ai_act_batch(creatures)
+
     def __repr__(self):
         """A string representation of the creature."""
         return self.name
@@ -109,6 +120,8 @@ class Creature(actor.Actor):
 
 class Zombie(Creature):
     """Zombie creature."""
+    batched = True
+
     def __init__(self, improvement=None):
         """Create a zombie.
 
@@ -151,6 +164,8 @@ class Zombie(Creature):
 
 class ZombieDog(Creature):
     """Zombie dog."""
+    batched = True
+
     def __init__(self):
         self.attacks = [attack.make_bite(effectiveness=70)]
         self.sense_range = 30
@@ -172,6 +187,8 @@ class ZombieDog(Creature):
 
 class Cop(Creature):
     """Cop."""
+    batched = True
+
     def __init__(self):
         super(Cop, self).__init__('C', 'cop')
         self.attacks = []
@@ -188,7 +205,13 @@ class Cop(Creature):
         2) If within 30 steps of the hero, move towards her.
         3) Otherwise, move randomly."""
         super(Cop, self).act()
-        return 6
+        return ai_act(self)
+
+
+# The actions the monsters' decision trees choose between.
+PARK, ATTACK, CHASE, WANDER, STAND = range(5)
+# Batches at least this big have their decisions worked out with NumPy.
+VECTORIZED_BATCH = 32
 
 
 def ai_act(creature):
@@ -196,31 +219,88 @@ def ai_act(creature):
 
     Creatures use the following decision tree:
 
+    0) If too far from the hero to matter, sleep until she comes near.
     1) If adjacent to the hero, bite her.
-    2) If within 15 steps of the hero, move towards her.
+    2) If within sensing range of the hero, move towards her, around
+       whatever is in the way.
     3) Otherwise, move randomly.
     """
     assert creature.loc
-
-    dist = creature.loc.distance_to(the.world.hero_location)
-
-    LOG.info("%r is %r from the hero.", creature.name, dist)
-
-    # 1) If adjacent to the hero, bite her.
-    if dist < 2:
+    decision = _decide([creature])[0]
+    LOG.info("%r decided on action %r.", creature.name, decision)
+    return _carry_out(creature, decision)
+
+
+def ai_act_batch(creatures):
+    """Decide the actions of monsters due at the same tick together, and
+    return a list of functions, one for each monster, that carry out its
+    action and return its cost.
+
+    The actions are carried out in order, so a monster that moves into the
+    cell another monster moved into first stands around instead."""
+    return [functools.partial(_act_decided, creature, decision)
+            for creature, decision in zip(creatures, _decide(creatures))]
+
+
+def _act_decided(creature, decision):
+    """Start a monster's turn and carry out the action decided for it."""
+    Creature.act(creature)
+    return _carry_out(creature, decision)
+
+
+def _decide(creatures):
+    """Return a list of the actions the decision trees of monsters choose.
+
+    Monsters that can attack follow the tree of ai_act(); the others stand
+    around unless they are too far from the hero to matter."""
+    hero_loc = the.world.hero_location
+    dormant_squared = the.world.dormant_radius * the.world.dormant_radius
+    if numpy is not None and len(creatures) >= VECTORIZED_BATCH:
+        coords = numpy.array([(creature.loc.row, creature.loc.col)
+                              for creature in creatures])
+        dist_squared = ((coords - (hero_loc.row, hero_loc.col)) ** 2).sum(1)
+        harmless = numpy.array([not creature.attacks
+                                for creature in creatures])
+        senses = numpy.array([creature.sense_range
+                              for creature in creatures])
+        # The same tests in the same order as below, so a monster decides
+        # the same however big its batch is.
+        return numpy.select(
+            [dist_squared > dormant_squared, harmless, dist_squared < 4,
+             dist_squared < senses * senses],
+            [PARK, STAND, ATTACK, CHASE], WANDER).tolist()
+    decisions = []
+    for creature in creatures:
+        dist_squared = creature.loc.distance_squared_to(hero_loc)
+        if dist_squared > dormant_squared:
+            decisions.append(PARK)
+        elif not creature.attacks:
+            decisions.append(STAND)
+        elif dist_squared < 4:
+            decisions.append(ATTACK)
+        elif dist_squared < creature.sense_range * creature.sense_range:
+            decisions.append(CHASE)
+        else:
+            decisions.append(WANDER)
+    return decisions
+
+
+def _carry_out(creature, decision):
+    """Carry out the action decided for a monster, and return its cost."""
+    if decision == PARK:
+        the.world.park(creature)
+        return creature.DONE
+    if decision == STAND:
+        return 6
+    if decision == ATTACK:
         return combat.attack(creature, the.hero,
                              random.choice(creature.attacks))
-
-    # 2) If within 15 steps of the hero, move towards her.
-    elif dist < creature.sense_range:
-        delta = creature.loc.delta_to(the.world.hero_location)
-
-    # 3) Otherwise, move randomly.
+    if decision == CHASE:
+        delta = the.world.flow_step(creature.loc, creature.sense_range)
+        if delta is None:
+            delta = creature.loc.delta_to(the.world.hero_location)
     else:
         delta = world.random_delta()
-
-    LOG.info("%r wants to move from %r by %r.", creature.name,
-             creature.loc, delta)
     cost = the.world.move_creature(creature.loc, delta)
     if not cost == 0:
         return cost
@@ -25,16 +25,11 @@ import logging
 import random
 import the
 import actor
-import creature
 import item
+from movement import DIAGONAL_COST, ORTHOGONAL_COST, movement_cost
 
 LOG = logging.getLogger(__name__)
 
-# When determining the movement cost, diagonal and orthogonal squares do not
-# cost the same.
-DIAGONAL_COST = 3
-ORTHOGONAL_COST = 2
-
 # When determining action point cost of actions for high- or low- dexterity
 # actors we apply a modifier, giving a bonus to high-dexterity actors and a
 # penalty to low-dexterity actors.
@@ -44,19 +39,6 @@ HIGHDEX_THRESHHOLD = 2
 LOWDEX_THRESHHOLD = 2
 
 
-def movement_cost(delta_y, delta_x):
-    """Looks up the movement cost for a particular movement.
-
-    Each diagonal movement costs 3 AP and each orthogonal movement costs 2 AP.
-    """
-    normal_y = abs(delta_y)
-    normal_x = abs(delta_x)
-    orthogonal_squares = abs(normal_y - normal_x)
-    diaganol_squares = min(normal_y, normal_x)
-    return orthogonal_squares * ORTHOGONAL_COST \
-        + diaganol_squares * DIAGONAL_COST
-
-
 def ap_mod(original_ap, dexterity):
     """Applies dexterity modifier to action point cost for one action."""
     modified_ap = original_ap
@@ -82,6 +64,8 @@ def is_valid_attribute(attribute):
 
 def random_monster():
     """Return a random monster."""
+    # Imported here, as creatures import the world, which imports the engine.
+    import creature
     die_roll = random.randint(1, 6)
     if die_roll >= 6:
         return creature.Cop()
@@ -158,31 +142,68 @@ class LootPlacer(object):
             self.rarity_max += rarity
             self.loot_table.append((self.rarity_max, factory))
         LOG.debug("Created loot table: %r", self.loot_table)
-        # Create a list of indoor and outdoor locations.
-        self.indoor_locations = world.indoor_walkable_locations()
-        LOG.debug("Indoor locations are: %r", self.indoor_locations)
-        self.outdoor_locations = world.outdoor_walkable_locations()
-        LOG.debug("Outdoor locations are: %r", self.indoor_locations)
+        self.indoor_locations = []
+        self.outdoor_locations = []
         self._world = world
 
     def populate(self):
         """Place a random assortment of loot items into the world."""
-        loot_count = self._world.size_in_tiles() / LOOT_SPARSENESS
+        self._place_loot(self._world.size_in_tiles() / LOOT_SPARSENESS,
+                         self._world.random_free_location)
+
+    def populate_area(self, top, bottom, left, right):
+        """Place a random assortment of loot items into an area of the world,
+        given as half-open ranges of rows and columns.
+
+        Areas smaller than the loot sparseness get an item by chance, so that
+        populating a world area by area gives it as much loot on average as
+        populating it all at once."""
+        area = (top, bottom, left, right)
+        self.indoor_locations = self._world.indoor_walkable_locations(area)
+        LOG.debug("Indoor locations are: %r", self.indoor_locations)
+        self.outdoor_locations = self._world.outdoor_walkable_locations(area)
+        LOG.debug("Outdoor locations are: %r", self.outdoor_locations)
+        loot_count, remainder = divmod((bottom - top) * (right - left),
+                                       LOOT_SPARSENESS)
+        if random.randint(1, LOOT_SPARSENESS) <= remainder:
+            loot_count += 1
+        self._place_loot(loot_count, self._area_location)
+
+    def _area_location(self, indoor):
+        """Return a random indoor or outdoor location in the area being
+        populated, or None if there are none."""
+        locations = self.indoor_locations if indoor else \
+            self.outdoor_locations
+        return random.choice(locations) if locations else None
+
+    def _place_loot(self, loot_count, pick_location):
+        """Place a number of random loot items at locations picked by a
+        function taking whether the location should be indoors."""
         for item_id in xrange(loot_count):
             roll = random.randint(1, self.rarity_max)
             LOG.debug("Loot item %d, rolled %d.", item_id, roll)
             for (target, factory) in self.loot_table:
                 if roll < target:
-                    self.place_item(factory())
+                    self.place_item(factory(), pick_location)
                     break
 
-    def place_item(self, loot):
-        """Place an item in the world."""
-        loc = None
-        if random.randint(1, 100) < LOOT_INDOOR_BIAS:
-            loc = random.choice(self.indoor_locations)
-        else:
-            loc = random.choice(self.outdoor_locations)
+    def place_item(self, loot, pick_location=None):
+        """Place an item in the world, indoors or outdoors by the loot's
+        indoor bias.
+
+        pick_location -- a function taking whether the location should be
+                         indoors and returning a random one, or None if there
+                         are none; by default, anywhere in the world
+        """
+        if pick_location is None:
+            pick_location = self._world.random_free_location
+        indoor = random.randint(1, 100) < LOOT_INDOOR_BIAS
+        loc = pick_location(indoor)
+        if loc is None:
+            loc = pick_location(not indoor)
+        if loc is None:
+            LOG.info("Nowhere to place loot %r", loot)
+            return
         self._world.add_item(loc, loot)
         LOG.info("Placed loot %r at %r", loot, loc)
 
@@ -177,7 +177,22 @@ def _make_list(words, conjunction, no_space=False):
                              conjunction, words[-1])
 
 
+# Epithets already made, by attributes and conjunction. Without a
+# conjunction, the one picked at random the first time is kept, so the same
+# attributes always get the same epithet.
+_EPITHETS = {}
+
+
 def epithet(str, dex, con, conjunction=None):
+    """Return the epithet for the specified attributes, as made by
+    make_epithet() the first time it is asked for."""
+    key = (str, dex, con, conjunction)
+    if key not in _EPITHETS:
+        _EPITHETS[key] = make_epithet(str, dex, con, conjunction)
+    return _EPITHETS[key]
+
+
+def make_epithet(str, dex, con, conjunction=None):
     """Create an epithet string for the specified attributes.
 
     [Good] {but, yet} [Bad]
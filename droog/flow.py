@@ -0,0 +1,139 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Droog - Flow Fields
+
+A flow field holds the cost of the cheapest walk from every cell near a
+goal to the goal, so that anything chasing the goal only has to step to the
+neighbouring cell with the lowest cost."""
+
+from . import movement
+from . import tile
+
+# The (row, col) offsets of the neighbouring cells and the cost of stepping
+# to each.
+STEPS = tuple((drow, dcol, movement.movement_cost(drow, dcol))
+              for drow in (-1, 0, 1) for dcol in (-1, 0, 1)
+              if drow or dcol)
+
+
+class FlowField(object):
+    """The costs of walking to a goal cell from the cells around it."""
+
+    def __init__(self, terrain, rows, cols, goal, radius):
+        """Work out the costs of walking to the goal.
+
+        terrain -- the row-major plane of terrain codes of the map
+        goal -- the index of the goal cell
+        radius -- only cells within this many rows and columns of the goal
+                  are walked through
+        """
+        self.goal = goal
+        self.radius = radius
+        self._cols = cols
+        goal_row, goal_col = divmod(goal, cols)
+        self.costs = walk_costs(terrain, cols, goal,
+                                (max(goal_row - radius, 0),
+                                 min(goal_row + radius + 1, rows),
+                                 max(goal_col - radius, 0),
+                                 min(goal_col + radius + 1, cols)))
+
+    def step(self, row, col, is_open):
+        """Return the (row, col) offset of the best open step toward the goal
+        from a cell, or None if the cell is out of reach or no open step gets
+        closer.
+
+        is_open -- a function taking a cell index that returns True if the
+                   cell can be stepped into now
+        """
+        costs = self.costs
+        here = costs.get(row * self._cols + col)
+        if here is None:
+            return None
+        best, best_cost = None, None
+        # The map is ringed by an unwalkable shield, so a walkable cell's
+        # neighbours never wrap around onto another row.
+        for drow, dcol, step_cost in STEPS:
+            index = (row + drow) * self._cols + col + dcol
+            cost = costs.get(index)
+            if cost is None or cost >= here:
+                continue
+            if (best_cost is None or cost + step_cost < best_cost) and \
+                    is_open(index):
+                best, best_cost = (drow, dcol), cost + step_cost
+        return best
+
+
+def walk_costs(terrain, cols, goal, area):
+    """Return a dictionary mapping the index of each walkable cell in an area,
+    and connected to the goal within it, to the cost of the cheapest walk
+    from it to the goal.
+
+    area -- the (top, bottom, left, right) half-open bounds of the rows and
+            columns walked through
+    """
+    top, bottom, left, right = area
+    walkable = tile.WALKABLE
+    steps = [(drow * cols + dcol, drow, dcol, step_cost)
+             for drow, dcol, step_cost in STEPS]
+    inner_steps = [(offset, step_cost) for offset, _, _, step_cost in steps]
+    costs = {goal: 0}
+    # Step costs are small whole numbers, so the frontier is kept as a list
+    # of the cells reached at each cost rather than as a heap.
+    frontier = [[goal]]
+    cost = 0
+    while cost < len(frontier):
+        for index in frontier[cost]:
+            if costs[index] != cost:
+                continue  # A cheaper walk here was already taken.
+            row, col = divmod(index, cols)
+            if top < row < bottom - 1 and left < col < right - 1:
+                neighbours = [(index + offset, step_cost)
+                              for offset, step_cost in inner_steps]
+            else:
+                neighbours = [(index + offset, step_cost)
+                              for offset, drow, dcol, step_cost in steps
+                              if top <= row + drow < bottom and
+                              left <= col + dcol < right]
+            for next_index, step_cost in neighbours:
+                next_cost = cost + step_cost
+                if next_cost < costs.get(next_index, next_cost + 1) and \
+                        walkable[terrain[next_index]]:
+                    costs[next_index] = next_cost
+                    while len(frontier) <= next_cost:
+                        frontier.append([])
+                    frontier[next_cost].append(next_index)
+        cost += 1
+    return costs
+
+
+def descend(costs, cols, index):
+    """Return the list of cell indices along the cheapest walk from a cell to
+    the goal of the costs returned by walk_costs(), leaving out the cell
+    itself."""
+    walk = []
+    cost = costs[index]
+    while cost:
+        row, col = divmod(index, cols)
+        for drow, dcol, step_cost in STEPS:
+            next_index = (row + drow) * cols + col + dcol
+            if 0 <= col + dcol < cols and \
+                    costs.get(next_index) == cost - step_cost:
+                break
+        index, cost = next_index, cost - step_cost
+        walk.append(index)
+    return walk
@@ -0,0 +1,180 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Droog - Field of View
+
+This module computes the field of view by shadowcasting over a transparency
+bitmap: a row-major sequence with a true value for every cell that does not
+block sight.
+
+The scan of each octant only depends on the view radius, so the cell offsets
+and slopes it visits are calculated once per radius and kept in a table. The
+octants are then scanned with an explicit stack of pending sub-scans instead
+of recursion.
+
+Since a field of view only depends on the cells around its origin, FovCache
+keeps recent results keyed by the origin and the transparency of the window
+around it.
+"""
+
+import collections
+
+FOV_CACHE_SIZE = 128
+
+# Transforms (xx, xy, yx, yy) from octant coordinates to map coordinates.
+OCTANTS = ((1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+           (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1))
+
+_scan_tables = {}
+
+
+def scan_table(radius):
+    """Return the octant scan tables for a view radius.
+
+    The result has one table per octant. Each table is indexed by scan row
+    (distance from the origin, 1 to radius) and holds, for every cell of that
+    row in scan order, a tuple of:
+
+    (row offset, column offset, left slope, right slope, within radius)
+    """
+    if radius in _scan_tables:
+        return _scan_tables[radius]
+    radius_squared = radius * radius
+    tables = []
+    for xx, xy, yx, yy in OCTANTS:
+        table = [()]
+        for j in xrange(1, radius + 1):
+            dy = -j
+            cells = []
+            for dx in xrange(-j, 1):
+                cells.append((dx * yx + dy * yy, dx * xx + dy * xy,
+                              (dx - 0.5) / (dy + 0.5),
+                              (dx + 0.5) / (dy - 0.5),
+                              dx * dx + dy * dy < radius_squared))
+            table.append(tuple(cells))
+        tables.append(tuple(table))
+    _scan_tables[radius] = tables = tuple(tables)
+    return tables
+
+
+def shadowcast(transparent, rows, cols, row, col, radius):
+    """Return the set of cell indices lit from (row, col).
+
+    transparent -- row-major transparency bitmap of rows * cols cells
+    radius -- how far the light reaches
+
+    The origin itself is not included. A scan that reaches the edge of the
+    map stops there.
+    """
+    lit = set()
+    origin = row * cols + col
+    # Only check the bounds if the light can reach past an edge of the map.
+    bounded = row - radius < 0 or row + radius >= rows \
+        or col - radius < 0 or col + radius >= cols
+    for table in scan_table(radius):
+        pending = [(1, 1.0, 0.0)]
+        while pending:
+            first_row, start, end = pending.pop()
+            if start < end:
+                continue
+            new_start = start
+            for j in xrange(first_row, radius + 1):
+                blocked = False
+                for drow, dcol, l_slope, r_slope, in_radius in table[j]:
+                    if bounded and not (0 <= row + drow < rows and
+                                        0 <= col + dcol < cols):
+                        # Stop this scan entirely at the edge of the map.
+                        blocked = True
+                        break
+                    if start < r_slope:
+                        continue
+                    elif end > l_slope:
+                        break
+                    # The light beam is touching this cell; light it.
+                    index = origin + drow * cols + dcol
+                    if in_radius:
+                        lit.add(index)
+                    if blocked:
+                        # Scanning a run of blocking cells.
+                        if not transparent[index]:
+                            new_start = r_slope
+                        else:
+                            blocked = False
+                            start = new_start
+                    elif not transparent[index] and j < radius:
+                        # A blocking cell; scan the rest of the beam beyond it
+                        # later.
+                        blocked = True
+                        pending.append((j + 1, start, l_slope))
+                        new_start = r_slope
+                # Scan the next row unless the last cell was blocked.
+                if blocked:
+                    break
+    return lit
+
+
+def window(transparent, rows, cols, row, col, radius):
+    """Return the transparency of the cells within radius of (row, col), as a
+    string, clipped to the map."""
+    left = max(col - radius, 0)
+    right = min(col + radius + 1, cols)
+    cells = bytearray()
+    for window_row in xrange(max(row - radius, 0), min(row + radius + 1,
+                                                       rows)):
+        start = window_row * cols
+        cells += transparent[start + left:start + right]
+    return str(cells)
+
+
+class FovCache(object):
+    """A bounded, least-recently-used cache of fields of view.
+
+    Results are keyed by the origin, the radius and the transparency of every
+    cell the light could reach, so a change to the terrain around an origin
+    is never answered from the cache. The hits and misses attributes count
+    how lookups went."""
+
+    def __init__(self, size=FOV_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def shadowcast(self, transparent, rows, cols, row, col, radius):
+        """Return the frozenset of cell indices lit from (row, col), from the
+        cache if possible. The arguments are as for shadowcast()."""
+        key = (row * cols + col, radius,
+               window(transparent, rows, cols, row, col, radius))
+        lit = self._entries.pop(key, None)
+        if lit is None:
+            self.misses += 1
+            lit = frozenset(shadowcast(transparent, rows, cols, row, col,
+                                       radius))
+            if len(self._entries) >= self.size:
+                self._entries.popitem(last=False)
+        else:
+            self.hits += 1
+        self._entries[key] = lit
+        return lit
+
+    def clear(self):
+        """Forget every cached field of view."""
+        self._entries.clear()
@@ -18,9 +18,12 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 """Droog - a present-perfect post-apocalyptic roguelike"""
+import os.path
 import sys
+import functools
 import getopt
 import logging
+import threading
 import ui as _ui
 import world as _world
 import hero as _hero
@@ -30,31 +33,95 @@ import the
 import english
 from . import engine
 from . import score
+from . import chunk
+from . import pool
 
 logging.basicConfig(filename="droog.log", level=logging.DEBUG)
 LOG = logging.getLogger(__name__)
 
 EMPTY_STATUS = ""
+# The number of rows and columns in the world map.
+WORLD_SIZE = 240
+# Where the maps of worlds with a chosen seed are saved, to be loaded when the
+# seed is chosen again.
+MAP_CACHE_DIR = os.path.expanduser("~/.droog_maps")
+# Where games for worlds of each size are created ahead of time.
+POOL_DIR = os.path.expanduser("~/.droog_pool")
 
 
-def new_game(ui_object, hero_name):
+def new_game(ui_object, hero_name, size=WORLD_SIZE, seed=None,
+             world_pool=None):
     """Creates a new game: the.turn, the.hero and the.world will be
-    re-created."""
+    re-created.
+
+    Worlds too big to generate at once are generated a chunk at a time, as
+    they are explored, and their loot is placed as each chunk is generated.
+    The maps of other worlds are cached when a seed is given, as the same
+    seed is likely to be played again.
+
+    world_pool -- a pool of games to take the new game from, if it has one
+                  ready
+    """
+    if world_pool is not None and world_pool.take():
+        the.hero.ui = ui_object
+        the.hero.name = hero_name[:10]
+        return
     the.turn = turn.Turn()
     the.hero = _hero.Hero(hero_name[:10], ui_object)
     the.turn.add_actor(the.hero)
     the.messages = message.Messages(turn=the.turn)
-    the.world = _world.World(240, 240)
+    chunked = size * size > chunk.EAGER_WORLD_LIMIT
+    if chunked:
+        the.world = chunk.ChunkedWorld(size, size, seed=seed)
+    elif seed is not None:
+        the.world = _world.World(size, size, seed=seed,
+                                 cache_dir=MAP_CACHE_DIR)
+    else:
+        the.world = _world.World(size, size)
     the.world._log()
     monster_spawner = engine.MonsterSpawner(the.world)
     the.turn.add_actor(monster_spawner)
     monster_spawner.populate()
     loot_placer = engine.LootPlacer(the.world)
-    loot_placer.populate()
+    if chunked:
+        the.world.chunk_populators.append(loot_placer.populate_area)
+    else:
+        loot_placer.populate()
+
+
+class NewGame(threading.Thread):
+    """Creates a new game in the background, so that the world is generated
+    while the player reads the story and creates a character."""
+
+    def __init__(self, *args):
+        """Start creating a new game, with the arguments to new_game."""
+        threading.Thread.__init__(self, name="new game")
+        # Do not keep the program running if the player quits first.
+        self.daemon = True
+        self._args = args
+        self._error = None
+        self.start()
+
+    def run(self):
+        try:
+            new_game(*self._args)
+        except Exception:
+            LOG.exception("Failed to create a new game.")
+            self._error = sys.exc_info()
+
+    def wait(self):
+        """Wait for the new game to be created, raising any error creating
+        it."""
+        self.join()
+        if self._error:
+            raise self._error[0], self._error[1], self._error[2]
 
 
 def end_game(ui_object):
-    """Display the ending, calculate the score and display to top scores."""
+    """Display the ending, calculate the score and display to top scores.
+
+    The score is only recorded, and the top scores shown, if the user
+    interface records scores."""
     if the.hero.is_dead:
         ui_object.draw_messages(the.messages)
         ui_object.input()
@@ -66,6 +133,8 @@ def end_game(ui_object):
     kill_score = score.calculate_kill_score(the.world.dead_monsters)
     victory_score = score.calculate_victory_score(not the.hero.is_dead)
     ui_object.score_screen(time_score, map_score, kill_score, victory_score)
+    if not ui_object.records_scores:
+        return
     total_score = time_score + map_score + kill_score + victory_score
     high_scores = score.record_score(the.hero.name, the.hero.end_reason,
                                      total_score)
@@ -73,37 +142,88 @@ def end_game(ui_object):
 
 
 def refresh(ui_object):
-    """Redraw the entire screen."""
-    ui_object.draw_area(the.world)
+    """Redraw the entire screen, updating the terminal once."""
+    ui_object.draw_area(the.world, update=False)
     ui_object.draw_status(time=the.turn.current_time())
+    ui_object.update()
+
+
+def play(ui_object, animate=False):
+    """Run the game until it is won or the hero dies.
+
+    The screen is redrawn once before each of the hero's turns, rather than
+    after every turn, as the monsters' turns in between are not seen.
+
+    animate -- also redraw the screen after any other turn that changed what
+               is in view
+    """
+    refresh(ui_object)
+    view_changes = the.world.view_changes
+    while the.world.generator.active() and not the.hero.is_dead:
+        the.turn.next()
+        if the.turn.next_actor() is the.hero or \
+                (animate and the.world.view_changes != view_changes):
+            view_changes = the.world.view_changes
+            refresh(ui_object)
+    refresh(ui_object)
 
 
 def main(argv):
     """Bootstraps a new game and cleans up after the game."""
     hero_name = 'Snaugh'
+    size = WORLD_SIZE
+    seed = None
+    animate = False
+    keys = None
     try:
-        opts, args = getopt.getopt(argv, "n:")
-    except getopt.GetoptError:
-        print 'python -m droog.main'
-        system.exit(2)
-    for opt, arg in opts:
-        if opt == '-n':
-            hero_name = arg
-    with _ui.Curses() as ui_object:
-        new_game(ui_object, hero_name)
+        opts, args = getopt.getopt(argv, "ak:n:s:S:")
+        for opt, arg in opts:
+            if opt == '-a':
+                animate = True
+            elif opt == '-k':
+                keys = arg
+            elif opt == '-n':
+                hero_name = arg
+            elif opt == '-s':
+                size = int(arg)
+            elif opt == '-S':
+                seed = int(arg)
+    except (getopt.GetoptError, ValueError):
+        print 'python -m droog.main [-a] [-k keys] [-n name] [-s size]' \
+            ' [-S seed]'
+        sys.exit(2)
+    world_pool = None
+    # Headless games are for profiling and testing, so they leave the pool
+    # of games to the players.
+    if keys is None and seed is None and \
+            size * size <= chunk.EAGER_WORLD_LIMIT:
+        world_pool = pool.WorldPool(os.path.join(POOL_DIR, str(size)),
+                                    functools.partial(new_game, None,
+                                                      hero_name, size))
+    if keys is None:
+        ui_object = _ui.Curses()
+    else:
+        # Play without a terminal, typing the keys given.
+        ui_object = _ui.Headless(keys)
+    with ui_object:
+        creating = NewGame(ui_object, hero_name, size, seed, world_pool)
         selected_build = ui_object.character_creation(
             english.CREATION_STORY, _hero.attrib_choices(),
             _hero.weapon_choices(), _hero.gear_choices())
         if selected_build[0] == None:
             return
+        creating.wait()
+        if world_pool is not None:
+            # Replace the game just taken while this one is played. Only fork
+            # from this thread, once the other has finished.
+            world_pool.refill()
         the.hero.build(selected_build)
         the.messages.add("Welcome to Droog.")
         the.messages.add("Press ? for help.")
-        refresh(ui_object)
-        while the.world.generator.active() and not the.hero.is_dead:
-            the.turn.next()
-            refresh(ui_object)
+        play(ui_object, animate)
         end_game(ui_object)
+    if keys is not None:
+        print '\n'.join(ui_object.screen())
 
 if __name__ == "__main__":
     main(sys.argv[1:])
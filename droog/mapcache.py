@@ -0,0 +1,102 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Droog - Map Cache
+
+Generated maps are saved to files named for their seed and size, so a world
+with a seed that has been played before can be loaded instead of generated.
+
+A map file is a fixed-size header followed by the terrain codes of the map,
+one byte per cell in row-major order. A map is read straight into the
+terrain plane of its world with a single read."""
+
+import os
+import struct
+import logging
+import tempfile
+from . import tile
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = 'DROOGMAP'
+VERSION = 1
+# Magic, version, rows, cols, seed, then the generator's row and column.
+HEADER = struct.Struct('<8sIIIQII')
+# Seeds may be any integer, so only their low 64 bits go in the header.
+_SEED_MASK = 0xffffffffffffffff
+
+# Maps each terrain code to whether it is transparent.
+_TRANSPARENCY = bytearray(tile.TRANSPARENT) + \
+    bytearray(256 - len(tile.TRANSPARENT))
+
+
+def path_for(directory, seed, rows, cols, vectorized):
+    """Return the path of the map file for a seed and size.
+
+    Maps generated with and without NumPy differ, so they are kept apart."""
+    return os.path.join(directory, "%d-%dx%d-%s.map" % (
+        seed, rows, cols, "vectorized" if vectorized else "grid"))
+
+
+def save(path, world):
+    """Save a world's map to a file.
+
+    The file is written under a temporary name and renamed into place, so a
+    partly written map is never loaded."""
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    header = HEADER.pack(MAGIC, VERSION, world.rows, world.cols,
+                         world.seed & _SEED_MASK,
+                         world.generator_location.row,
+                         world.generator_location.col)
+    handle, temp_path = tempfile.mkstemp(dir=directory or None)
+    with os.fdopen(handle, 'wb') as map_file:
+        map_file.write(header)
+        map_file.write(world._terrain)
+    os.rename(temp_path, path)
+    LOG.info("Saved map to %s", path)
+
+
+def load(path, world):
+    """Load a world's map from a file, returning False if there is no map for
+    the world's seed and size in it."""
+    try:
+        map_file = open(path, 'rb')
+    except IOError:
+        return False
+    with map_file:
+        size = os.fstat(map_file.fileno()).st_size
+        if size != HEADER.size + world.rows * world.cols:
+            LOG.warning("Map %s is the wrong size", path)
+            return False
+        (magic, version, rows, cols, seed, generator_row,
+         generator_col) = HEADER.unpack(map_file.read(HEADER.size))
+        if (magic, version, rows, cols, seed) != \
+                (MAGIC, VERSION, world.rows, world.cols,
+                 world.seed & _SEED_MASK):
+            LOG.warning("Map %s is not for this world", path)
+            return False
+        terrain = bytearray(world.rows * world.cols)
+        if map_file.readinto(terrain) != len(terrain):
+            LOG.warning("Map %s was cut short", path)
+            return False
+        world._terrain = terrain
+    world._transparent = world._terrain.translate(_TRANSPARENCY)
+    world.generator_location = world.location(generator_row, generator_col)
+    LOG.info("Loaded map from %s", path)
+    return True
@@ -39,6 +39,19 @@ class Messages(object):
         self._history_size = history_size
         self._turn = turn
 
+    def __getstate__(self):
+        """Pickle the queued messages as a list, as queues hold locks."""
+        state = self.__dict__.copy()
+        state['_queue'] = list(self._queue.queue)
+        return state
+
+    def __setstate__(self, state):
+        queued = state.pop('_queue')
+        self.__dict__.update(state)
+        self._queue = Queue.Queue()
+        for message in queued:
+            self._queue.put(message)
+
     def add(self, message, clean=True):
         """Add a message to the message queue.
 
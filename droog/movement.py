@@ -0,0 +1,38 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""Droog - Movement
+
+The action point costs of moving, kept apart from the game rules in the
+engine so that map code can use them without importing the creatures."""
+
+# When determining the movement cost, diagonal and orthogonal squares do not
+# cost the same.
+DIAGONAL_COST = 3
+ORTHOGONAL_COST = 2
+
+
+def movement_cost(delta_y, delta_x):
+    """Looks up the movement cost for a particular movement.
+
+    Each diagonal movement costs 3 AP and each orthogonal movement costs 2 AP.
+    """
+    normal_y = abs(delta_y)
+    normal_x = abs(delta_x)
+    orthogonal_squares = abs(normal_y - normal_x)
+    diaganol_squares = min(normal_y, normal_x)
+    return orthogonal_squares * ORTHOGONAL_COST \
+        + diaganol_squares * DIAGONAL_COST
@@ -0,0 +1,498 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Droog - Pathing
+
+The cheapest walks between nearby cells, found with jump point search, and
+routes across the whole map, planned at two levels.
+
+The map is divided into square clusters. Wherever the edge of a cluster can
+be walked across into the next one there is an entrance, and the walks
+between the entrances of a cluster are worked out the first time a route
+passes through it. A route is planned over the entrances, and then filled
+in with the walks already worked out inside each cluster."""
+
+import array
+import heapq
+from . import flow
+from . import tile
+
+# Stretches of open border at least this long get an entrance at each end,
+# rather than one in the middle.
+LONG_ENTRANCE = 6
+# Search stamps are kept in signed 32-bit arrays.
+_LAST_STAMP = 2 ** 31 - 1
+
+
+def _estimate(cols, index, goal):
+    """Return the cost of the cheapest walk between two cells if nothing is
+    in the way."""
+    row, col = divmod(index, cols)
+    goal_row, goal_col = divmod(goal, cols)
+    rows_apart, cols_apart = abs(row - goal_row), abs(col - goal_col)
+    # Orthogonal steps cost two and diagonal steps three.
+    return 2 * max(rows_apart, cols_apart) + min(rows_apart, cols_apart)
+
+
+class _Cluster(object):
+    """The entrances of a cluster and the walks between them."""
+
+    def __init__(self, area, entrances):
+        self.area = area
+        self.entrances = entrances
+        # Maps each entrance to a list of (entrance, cost) pairs for the
+        # entrances it can walk to without leaving the cluster.
+        self.edges = dict((entrance, []) for entrance in entrances)
+        # Maps (from entrance, to entrance) to the list of cells walked
+        # through, leaving out the first.
+        self.walks = {}
+
+
+class RoutePlanner(object):
+    """Plans routes over a map whose terrain does not change."""
+
+    def __init__(self, terrain, rows, cols, cluster_size):
+        """Creates a route planner.
+
+        terrain -- the row-major plane of terrain codes of the map
+        cluster_size -- the number of rows and columns in a cluster
+        """
+        self._terrain = terrain
+        self.rows = rows
+        self.cols = cols
+        self.cluster_size = cluster_size
+        self._clusters = {}
+        # Maps (cluster row, cluster col, vertical) to a list of the (inside,
+        # outside) pairs of entrances on the southern or, if vertical, the
+        # eastern border of a cluster. The southern borders also hold the
+        # diagonal crossings over the corners at their ends.
+        self._borders = {}
+        # Maps each entrance found so far to the entrances across the border
+        # from it.
+        self._crossings = {}
+
+    def cluster_count(self):
+        """Return the number of clusters whose walks have been worked out."""
+        return len(self._clusters)
+
+    def _cluster_of(self, index):
+        """Return the (row, col) key of the cluster holding a cell."""
+        row, col = divmod(index, self.cols)
+        return (row // self.cluster_size, col // self.cluster_size)
+
+    def _border(self, cluster_row, cluster_col, vertical):
+        """Return the (inside, outside) pairs of entrances on the southern or
+        eastern border of a cluster, finding them if need be."""
+        if cluster_row < 0 or cluster_col < 0:
+            return []
+        key = (cluster_row, cluster_col, vertical)
+        pairs = self._borders.get(key)
+        if pairs is not None:
+            return pairs
+        size, cols, terrain = self.cluster_size, self.cols, self._terrain
+        walkable = tile.WALKABLE
+        # Cells are named by their position along the border and their side
+        # of it, 0 inside and 1 outside.
+        if vertical:
+            line = min((cluster_col + 1) * size, cols) - 1
+            first = cluster_row * size
+            end = min((cluster_row + 1) * size, self.rows)
+            # Diagonal crossings past the ends of an eastern border are over
+            # the corners, and are found with the southern borders.
+            low, high = first, end
+            if line + 1 >= cols:
+                end = first
+
+            def cell(position, side):
+                return position * cols + line + side
+        else:
+            line = min((cluster_row + 1) * size, self.rows) - 1
+            first = cluster_col * size
+            end = min((cluster_col + 1) * size, cols)
+            low, high = 0, cols
+            if line + 1 >= self.rows:
+                end = first
+
+            def cell(position, side):
+                return (line + side) * cols + position
+
+        def is_open(position, side):
+            return low <= position < high and \
+                walkable[terrain[cell(position, side)]]
+
+        def straight(position):
+            return is_open(position, 0) and is_open(position, 1)
+        pairs = []
+        run = []
+        for position in xrange(first, end + 1):
+            if position < end and straight(position):
+                run.append((cell(position, 0), cell(position, 1)))
+                continue
+            if len(run) >= LONG_ENTRANCE:
+                pairs.extend((run[0], run[-1]))
+            elif run:
+                pairs.append(run[(len(run) - 1) // 2])
+            run = []
+        # A diagonal step across the border is only needed where neither of
+        # the cells it starts and ends at can be crossed straight from.
+        for position in xrange(first, end):
+            if not is_open(position, 0) or straight(position):
+                continue
+            for offset in (-1, 1):
+                if is_open(position + offset, 1) and \
+                        not straight(position + offset):
+                    pairs.append((cell(position, 0),
+                                  cell(position + offset, 1)))
+        for inside, outside in pairs:
+            self._crossings.setdefault(inside, set()).add(outside)
+            self._crossings.setdefault(outside, set()).add(inside)
+        self._borders[key] = pairs
+        return pairs
+
+    def _cluster(self, key):
+        """Return a cluster, working out the walks between its entrances if
+        need be."""
+        cluster = self._clusters.get(key)
+        if cluster is not None:
+            return cluster
+        cluster_row, cluster_col = key
+        size = self.cluster_size
+        area = (cluster_row * size, min((cluster_row + 1) * size, self.rows),
+                cluster_col * size, min((cluster_col + 1) * size, self.cols))
+        entrances = set()
+        # Crossings over a corner join clusters diagonally apart, so the
+        # southern borders of the clusters to the north-west and north-east
+        # may end in this one too.
+        for border in ((cluster_row, cluster_col, False),
+                       (cluster_row, cluster_col, True),
+                       (cluster_row - 1, cluster_col, False),
+                       (cluster_row, cluster_col - 1, True),
+                       (cluster_row - 1, cluster_col - 1, False),
+                       (cluster_row - 1, cluster_col + 1, False)):
+            for pair in self._border(*border):
+                entrances.update(index for index in pair
+                                 if self._cluster_of(index) == key)
+        cluster = _Cluster(area, sorted(entrances))
+        for entrance in cluster.entrances:
+            costs = flow.walk_costs(self._terrain, self.cols, entrance, area)
+            for other in cluster.entrances:
+                if other != entrance and other in costs:
+                    cluster.edges[other].append((entrance, costs[other]))
+                    cluster.walks[(other, entrance)] = flow.descend(
+                        costs, self.cols, other)
+        self._clusters[key] = cluster
+        return cluster
+
+    def route(self, start, goal):
+        """Return the list of the indices of the cells along a short walk from
+        one cell to another, leaving out the first, or None if there is no
+        walk between them."""
+        if start == goal:
+            return []
+        walkable = tile.WALKABLE
+        if not (walkable[self._terrain[start]] and
+                walkable[self._terrain[goal]]):
+            return None
+        start_cluster = self._cluster(self._cluster_of(start))
+        goal_cluster = self._cluster(self._cluster_of(goal))
+        goal_costs = flow.walk_costs(self._terrain, self.cols, goal,
+                                     goal_cluster.area)
+        if start_cluster is goal_cluster and start in goal_costs:
+            return flow.descend(goal_costs, self.cols, start)
+        start_costs = flow.walk_costs(self._terrain, self.cols, start,
+                                      start_cluster.area)
+        hops = self._plan(start_cluster, start_costs, goal_cluster,
+                          goal_costs, goal)
+        if hops is None:
+            return None
+        walk = flow.descend(start_costs, self.cols, hops[0])[::-1][1:]
+        if hops[0] != start:
+            walk.append(hops[0])
+        for here, there in zip(hops, hops[1:]):
+            if there in self._crossings.get(here, ()):
+                walk.append(there)
+            else:
+                cluster = self._clusters[self._cluster_of(here)]
+                walk.extend(cluster.walks[(here, there)])
+        walk.extend(flow.descend(goal_costs, self.cols, hops[-1]))
+        return walk
+
+    def _plan(self, start_cluster, start_costs, goal_cluster, goal_costs,
+              goal):
+        """Return the list of entrances along the cheapest route over the
+        entrances from the start to the goal, or None if there is none."""
+        cols = self.cols
+        # The goal is reached from the entrances of its cluster that can walk
+        # to it; None stands for the goal in the search.
+        finishes = dict((entrance, goal_costs[entrance])
+                        for entrance in goal_cluster.entrances
+                        if entrance in goal_costs)
+        if not finishes:
+            return None
+        costs = {}
+        previous = {}
+        done = set()
+        frontier = []
+        for entrance in start_cluster.entrances:
+            if entrance in start_costs:
+                costs[entrance] = start_costs[entrance]
+                previous[entrance] = None
+                heapq.heappush(frontier, (costs[entrance] +
+                                          _estimate(cols, entrance, goal),
+                                          entrance))
+        while frontier:
+            _, here = heapq.heappop(frontier)
+            if here is None:
+                break
+            if here in done:
+                continue
+            done.add(here)
+            cost = costs[here]
+            cluster = self._cluster(self._cluster_of(here))
+            steps = [(there, cost + step_cost)
+                     for there, step_cost in cluster.edges[here]]
+            steps.extend((there, cost + _estimate(cols, here, there))
+                         for there in self._crossings.get(here, ()))
+            if here in finishes:
+                steps.append((None, cost + finishes[here]))
+            for there, there_cost in steps:
+                if there_cost < costs.get(there, there_cost + 1):
+                    costs[there] = there_cost
+                    previous[there] = here
+                    heapq.heappush(frontier, (
+                        there_cost if there is None else
+                        there_cost + _estimate(cols, there, goal), there))
+        if None not in costs:
+            return None
+        hops = []
+        here = previous[None]
+        while here is not None:
+            hops.append(here)
+            here = previous[here]
+        return hops[::-1]
+
+
+class _Unstamped(dict):
+    """Search stamps of cells over a map too big to hold one for every
+    cell."""
+
+    def __missing__(self, index):
+        return 0
+
+
+class _Scratch(object):
+    """Per-cell buffers for searches, reused from one search to the next.
+
+    An entry is only meaningful if the cell's stamp is that of the current
+    search, so the buffers never need clearing."""
+
+    def __init__(self, size=None):
+        """Creates the buffers.
+
+        size -- the number of cells on the map; without it, the buffers are
+                dictionaries emptied before each search, for maps too big for
+                arrays of them
+        """
+        if size is None:
+            self.costs, self.parents, self.stamps = {}, {}, _Unstamped()
+        else:
+            self.costs = array.array('i', [0]) * size
+            self.parents = array.array('i', [0]) * size
+            self.stamps = array.array('i', [0]) * size
+        self.stamp = 0
+
+    def start(self):
+        """Begin a new search."""
+        if isinstance(self.stamps, dict):
+            self.costs.clear()
+            self.parents.clear()
+            self.stamps.clear()
+        elif self.stamp == _LAST_STAMP:
+            self.stamps[:] = array.array('i', [0]) * len(self.stamps)
+            self.stamp = 0
+        self.stamp += 1
+
+
+class PathFinder(object):
+    """Finds the cheapest walks between cells with jump point search.
+
+    Rather than adding every neighbour of a cell to the search, jump point
+    search runs in straight lines until something forces a turn, so open
+    ground costs a few lines scanned instead of a cell pushed at a time."""
+
+    def __init__(self, terrain, rows, cols, size=None):
+        """Creates a path finder.
+
+        terrain -- the row-major plane of terrain codes of the map
+        size -- the number of cells on the map, to keep the search buffers in
+                arrays; without it they are kept in dictionaries
+        """
+        self._terrain = terrain
+        self.rows = rows
+        self.cols = cols
+        self._scratch = _Scratch(size)
+
+    def path(self, start, goal, radius=None):
+        """Return the list of the indices of the cells along the cheapest walk
+        from one cell to another, leaving out the first, or None if there is
+        no walk between them.
+
+        radius -- if given, only walk through cells within this many rows and
+                  columns of the start
+        """
+        cols = self.cols
+        start_row, start_col = divmod(start, cols)
+        goal_row, goal_col = divmod(goal, cols)
+        if radius is None:
+            bounds = (0, self.rows, 0, cols)
+        else:
+            bounds = (max(start_row - radius, 0),
+                      min(start_row + radius + 1, self.rows),
+                      max(start_col - radius, 0),
+                      min(start_col + radius + 1, cols))
+        if start == goal:
+            return []
+        is_open = self._opener(bounds)
+        if not (is_open(start_row, start_col) and
+                is_open(goal_row, goal_col)):
+            return None
+        scratch = self._scratch
+        scratch.start()
+        stamp = scratch.stamp
+        costs, parents, stamps = scratch.costs, scratch.parents, scratch.stamps
+        costs[start], parents[start], stamps[start] = 0, start, stamp
+        frontier = [(_estimate(cols, start, goal), 0, start)]
+        while frontier:
+            _, cost, index = heapq.heappop(frontier)
+            if cost > costs[index]:
+                continue  # A cheaper walk here was already taken.
+            if index == goal:
+                return self._walk(goal)
+            row, col = divmod(index, cols)
+            for drow, dcol in self._directions(is_open, index):
+                jump = _jump(is_open, row, col, drow, dcol, goal_row,
+                             goal_col)
+                if jump is None:
+                    continue
+                jump_index = jump[0] * cols + jump[1]
+                jump_cost = cost + _estimate(cols, index, jump_index)
+                if stamps[jump_index] != stamp or \
+                        jump_cost < costs[jump_index]:
+                    costs[jump_index] = jump_cost
+                    parents[jump_index] = index
+                    stamps[jump_index] = stamp
+                    heapq.heappush(frontier, (
+                        jump_cost + _estimate(cols, jump_index, goal),
+                        jump_cost, jump_index))
+        return None
+
+    def _opener(self, bounds):
+        """Return a function taking a row and a column that returns True if
+        the cell is in bounds and walkable."""
+        top, bottom, left, right = bounds
+        terrain, cols, walkable = self._terrain, self.cols, tile.WALKABLE
+
+        def is_open(row, col):
+            return top <= row < bottom and left <= col < right and \
+                walkable[terrain[row * cols + col]]
+        return is_open
+
+    def _directions(self, is_open, index):
+        """Return the (row, col) directions worth searching from a jump
+        point, given the direction the search reached it from."""
+        scratch = self._scratch
+        parent = scratch.parents[index]
+        if parent == index:
+            return [(drow, dcol) for drow, dcol, _ in flow.STEPS]
+        row, col = divmod(index, self.cols)
+        parent_row, parent_col = divmod(parent, self.cols)
+        drow = cmp(row, parent_row)
+        dcol = cmp(col, parent_col)
+        if drow and dcol:
+            directions = [(drow, 0), (0, dcol), (drow, dcol)]
+            if not is_open(row, col - dcol):
+                directions.append((drow, -dcol))
+            if not is_open(row - drow, col):
+                directions.append((-drow, dcol))
+        elif drow:
+            directions = [(drow, 0)]
+            if not is_open(row, col + 1):
+                directions.append((drow, 1))
+            if not is_open(row, col - 1):
+                directions.append((drow, -1))
+        else:
+            directions = [(0, dcol)]
+            if not is_open(row + 1, col):
+                directions.append((1, dcol))
+            if not is_open(row - 1, col):
+                directions.append((-1, dcol))
+        return directions
+
+    def _walk(self, goal):
+        """Return the cells from the start of the search to the goal, filling
+        in the straight lines between jump points."""
+        cols = self.cols
+        parents = self._scratch.parents
+        walk = []
+        index = goal
+        while parents[index] != index:
+            parent = parents[index]
+            row, col = divmod(index, cols)
+            parent_row, parent_col = divmod(parent, cols)
+            drow = cmp(parent_row, row)
+            dcol = cmp(parent_col, col)
+            while index != parent:
+                walk.append(index)
+                row += drow
+                col += dcol
+                index = row * cols + col
+        walk.reverse()
+        return walk
+
+
+def _jump(is_open, row, col, drow, dcol, goal_row, goal_col):
+    """Return the (row, col) of the next jump point from a cell in a
+    direction, or None if the search in that direction comes to nothing.
+
+    A jump point is the goal, or a cell where a wall beside the line of the
+    search opens up a cheaper way to somewhere."""
+    while True:
+        row += drow
+        col += dcol
+        if not is_open(row, col):
+            return None
+        if row == goal_row and col == goal_col:
+            return (row, col)
+        if drow and dcol:
+            if (is_open(row - drow, col + dcol) and
+                    not is_open(row - drow, col)) or \
+                    (is_open(row + drow, col - dcol) and
+                     not is_open(row, col - dcol)):
+                return (row, col)
+            # A diagonal search stops where a straight one from it would.
+            if _jump(is_open, row, col, drow, 0, goal_row, goal_col) or \
+                    _jump(is_open, row, col, 0, dcol, goal_row, goal_col):
+                return (row, col)
+        elif drow:
+            if (is_open(row + drow, col + 1) and
+                    not is_open(row, col + 1)) or \
+                    (is_open(row + drow, col - 1) and
+                     not is_open(row, col - 1)):
+                return (row, col)
+        elif (is_open(row + 1, col + dcol) and not is_open(row + 1, col)) or \
+                (is_open(row - 1, col + dcol) and not is_open(row - 1, col)):
+            return (row, col)
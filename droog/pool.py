@@ -0,0 +1,169 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Droog - World Pool
+
+A pool of new games created ahead of time, so that starting a game only
+loads one.
+
+Games are created by worker processes and saved in a directory, as
+compressed pickles of the turn, the hero, the messages and the world.
+Loading a pickle can run any code, so the directory is kept private to the
+player: it is only readable and writable by its owner, and games in a
+directory or file owned by anyone else are never loaded. A game is claimed
+by renaming its file, so games started at the same time never get the same
+one."""
+
+import os
+import glob
+import stat
+import random
+import logging
+import tempfile
+import multiprocessing
+import cPickle as pickle
+import zlib
+from . import the
+
+LOG = logging.getLogger(__name__)
+
+POOL_SIZE = 3
+# Workers only use the processor when the players do not need it.
+WORKER_NICENESS = 10
+_GAME_SUFFIX = '.game'
+_CLAIMED_SUFFIX = '.claimed'
+# The permissions of a pool directory, which only its owner may use.
+_PRIVATE_MODE = 0700
+
+
+def snapshot():
+    """Return the current game as a compressed pickle. The hero's user
+    interface is left out."""
+    user_interface = the.hero.ui
+    the.hero.ui = None
+    try:
+        return zlib.compress(pickle.dumps(
+            (the.turn, the.hero, the.messages, the.world),
+            pickle.HIGHEST_PROTOCOL))
+    finally:
+        the.hero.ui = user_interface
+
+
+def restore(data):
+    """Make a game saved by snapshot() the current game."""
+    the.turn, the.hero, the.messages, the.world = pickle.loads(
+        zlib.decompress(data))
+
+
+def _create_game(directory, create):
+    """Create a new game in a worker process and save it to the pool."""
+    os.nice(WORKER_NICENESS)
+    # Forked workers start with the random state of the process that forked
+    # them, and would otherwise all create the same game.
+    random.seed()
+    create()
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'wb') as game_file:
+        game_file.write(snapshot())
+    os.rename(temp_path, temp_path[:-len('.tmp')] + _GAME_SUFFIX)
+
+
+def _owned(status):
+    """Return True if a file's status says it belongs to the player."""
+    return status.st_uid == os.getuid()
+
+
+class WorldPool(object):
+    """A pool of new games, kept in a directory."""
+
+    def __init__(self, directory, create, size=POOL_SIZE):
+        """Creates a pool of games.
+
+        directory -- where the games are saved; it is created if need be,
+                     and made private to its owner
+        create -- a function that creates a new game, setting the.turn,
+                  the.hero, the.messages and the.world
+        size -- the number of games to keep ready
+        """
+        self.directory = directory
+        self.size = size
+        self._create = create
+        self._workers = []
+        if not os.path.isdir(directory):
+            os.makedirs(directory, _PRIVATE_MODE)
+        elif _owned(os.stat(directory)):
+            os.chmod(directory, _PRIVATE_MODE)
+
+    def is_private(self):
+        """Return True if only the player can put games in the pool."""
+        status = os.stat(self.directory)
+        return _owned(status) and \
+            not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+    def ready_count(self):
+        """Return the number of games ready in the pool."""
+        return len(glob.glob(os.path.join(self.directory,
+                                          '*' + _GAME_SUFFIX)))
+
+    def take(self):
+        """Make a game from the pool the current game, returning False if
+        there are none ready or the pool is not private."""
+        if not self.is_private():
+            LOG.warning("Not taking games from %s, which others can write to",
+                        self.directory)
+            return False
+        for path in sorted(glob.glob(os.path.join(self.directory,
+                                                  '*' + _GAME_SUFFIX))):
+            claimed_path = path[:-len(_GAME_SUFFIX)] + _CLAIMED_SUFFIX
+            try:
+                os.rename(path, claimed_path)
+            except OSError:
+                continue  # Another player took it first.
+            try:
+                with open(claimed_path, 'rb') as game_file:
+                    if not _owned(os.fstat(game_file.fileno())):
+                        raise ValueError("the game belongs to someone else")
+                    restore(game_file.read())
+            except Exception:
+                LOG.exception("Discarding pooled game %s", path)
+                continue
+            finally:
+                os.remove(claimed_path)
+            LOG.info("Took pooled game %s", path)
+            return True
+        return False
+
+    def refill(self):
+        """Start workers creating games until the pool is full, counting the
+        games being created by workers already running."""
+        self._workers = [worker for worker in self._workers
+                         if worker.is_alive()]
+        missing = self.size - self.ready_count() - len(self._workers)
+        for _ in xrange(missing):
+            worker = multiprocessing.Process(
+                target=_create_game, args=(self.directory, self._create),
+                name="world pool")
+            worker.start()
+            self._workers.append(worker)
+        if missing > 0:
+            LOG.info("Refilling the world pool with %d games", missing)
+
+    def join(self):
+        """Wait for the running workers to finish."""
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
@@ -0,0 +1,114 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Droog - Sampling
+
+Sets of cell indices that a random member can be drawn from in constant
+time, for placing monsters and loot."""
+
+import array
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class _SparsePositions(dict):
+    """Positions of the members of a set over a map too big to hold a
+    position for every cell."""
+
+    def __missing__(self, index):
+        return -1
+
+
+class IndexSet(object):
+    """A set of cell indices with constant-time add, discard and random
+    choice.
+
+    The members are kept packed in an array, and the position of each member
+    in that array is kept by cell index. A member is discarded by moving the
+    last member into its place."""
+
+    def __init__(self, size=None, indices=()):
+        """Creates a set of cell indices.
+
+        size -- the number of cells on the map; without it, positions are
+                kept in a dictionary, for maps too big for an array of them
+        indices -- the first members, which must not repeat; a NumPy array
+                   of them is quickest
+        """
+        if size is not None and numpy is not None:
+            # Lay out big sets with NumPy rather than one member at a time.
+            members = numpy.asarray(indices, numpy.intc)
+            positions = numpy.empty(size, numpy.intc)
+            positions.fill(-1)
+            positions[members] = numpy.arange(len(members))
+            self._members = array.array('i', members.tobytes())
+            self._positions = array.array('i', positions.tobytes())
+            return
+        self._members = array.array('i', indices)
+        if size is None:
+            self._positions = _SparsePositions()
+        else:
+            self._positions = array.array('i', [-1]) * size
+        for position, index in enumerate(self._members):
+            self._positions[index] = position
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, index):
+        return self._positions[index] >= 0
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def add(self, index):
+        """Add a cell index, if it is not a member already."""
+        if self._positions[index] < 0:
+            self._positions[index] = len(self._members)
+            self._members.append(index)
+
+    def discard(self, index):
+        """Remove a cell index, if it is a member."""
+        position = self._positions[index]
+        if position < 0:
+            return
+        last = self._members.pop()
+        if last != index:
+            self._members[position] = last
+            self._positions[last] = position
+        self._positions[index] = -1
+
+    def choice(self, rng=random):
+        """Return a random member, or None if there are none."""
+        if not self._members:
+            return None
+        return self._members[rng.randrange(len(self._members))]
+
+
+def choice(sets, rng=random):
+    """Return a random member of the union of disjoint sets, each member
+    being equally likely, or None if they are all empty."""
+    pick = rng.randrange(sum(len(index_set) for index_set in sets) or 1)
+    for index_set in sets:
+        if pick < len(index_set):
+            return index_set._members[pick]
+        pick -= len(index_set)
+    return None
@@ -41,12 +41,7 @@ def calculate_time_score(turn, victorious):
 
 def calculate_map_score(world):
     """Calculate the score portion based on amount of the map explored."""
-    seen_tiles = 0
-    for rows in world.tiles:
-        for tile in rows:
-            if tile.seen:
-                seen_tiles += 1
-    return seen_tiles
+    return world.seen_tile_count()
 
 
 def calculate_victory_score(victorious):
@@ -0,0 +1,165 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Droog - Spatial Hash
+
+An index of things on the map, such as creatures, by where they are. The map
+is divided into square buckets, so the things near a location are found by
+looking in the few buckets around it instead of at every cell."""
+
+# The number of rows and columns of cells in a bucket.
+BUCKET_SIZE = 16
+
+
+class SpatialHash(object):
+    """An index of things by their Location."""
+
+    def __init__(self, bucket_size=BUCKET_SIZE):
+        self._bucket_size = bucket_size
+        # Maps (bucket row, bucket col) to a dictionary of the things in the
+        # bucket and their Locations.
+        self._buckets = {}
+        self._locations = {}
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __contains__(self, thing):
+        return thing in self._locations
+
+    def location_of(self, thing):
+        """Return the Location of a thing, or None if it is not indexed."""
+        return self._locations.get(thing)
+
+    def _bucket_of(self, loc):
+        """Return the key of the bucket holding a location."""
+        return (loc.row // self._bucket_size, loc.col // self._bucket_size)
+
+    def add(self, thing, loc):
+        """Index a thing at a location, moving it there if it is already
+        indexed."""
+        if thing in self._locations:
+            self.move(thing, loc)
+            return
+        self._locations[thing] = loc
+        self._buckets.setdefault(self._bucket_of(loc), {})[thing] = loc
+
+    def remove(self, thing):
+        """Remove a thing from the index, if it is there."""
+        loc = self._locations.pop(thing, None)
+        if loc is None:
+            return
+        key = self._bucket_of(loc)
+        bucket = self._buckets[key]
+        del bucket[thing]
+        if not bucket:
+            del self._buckets[key]
+
+    def move(self, thing, loc):
+        """Move an indexed thing to a new location."""
+        old_key = self._bucket_of(self._locations[thing])
+        new_key = self._bucket_of(loc)
+        self._locations[thing] = loc
+        if old_key == new_key:
+            self._buckets[old_key][thing] = loc
+            return
+        bucket = self._buckets[old_key]
+        del bucket[thing]
+        if not bucket:
+            del self._buckets[old_key]
+        self._buckets.setdefault(new_key, {})[thing] = loc
+
+    def in_rect(self, top, bottom, left, right):
+        """Return a list of (thing, Location) pairs for the things in the
+        half-open ranges of rows from top to bottom and columns from left to
+        right."""
+        size = self._bucket_size
+        first_row, last_row = top // size, (bottom - 1) // size
+        first_col, last_col = left // size, (right - 1) // size
+        if (last_row - first_row + 1) * (last_col - first_col + 1) > \
+                len(self._buckets):
+            # A big area is quicker to check by the buckets there are.
+            buckets = [bucket for (row, col), bucket
+                       in self._buckets.iteritems()
+                       if first_row <= row <= last_row
+                       and first_col <= col <= last_col]
+        else:
+            buckets = [self._buckets[key] for key in
+                       ((row, col)
+                        for row in xrange(first_row, last_row + 1)
+                        for col in xrange(first_col, last_col + 1))
+                       if key in self._buckets]
+        return [(thing, loc) for bucket in buckets
+                for thing, loc in bucket.iteritems()
+                if top <= loc.row < bottom and left <= loc.col < right]
+
+    def within(self, center, radius):
+        """Return a list of (thing, Location) pairs for the things no further
+        than radius from the center."""
+        radius_squared = radius * radius
+        return [(thing, loc) for thing, loc in
+                self.in_rect(center.row - radius, center.row + radius + 1,
+                             center.col - radius, center.col + radius + 1)
+                if center.distance_squared_to(loc) <= radius_squared]
+
+    def nearest(self, center, count, radius=None):
+        """Return a list of (thing, Location) pairs for the count things
+        closest to the center, nearest first.
+
+        radius -- if given, leave out things further away than this
+        """
+        if count <= 0:
+            return []
+        size = self._bucket_size
+        center_row, center_col = self._bucket_of(center)
+        found = []
+        seen = 0
+        ring = 0
+        while seen < len(self._locations):
+            # Every bucket beyond this ring is more than ring * size away.
+            reach = ring * size
+            if radius is not None and reach > radius + size:
+                break
+            for key in _ring(center_row, center_col, ring):
+                bucket = self._buckets.get(key)
+                if bucket:
+                    seen += len(bucket)
+                    found.extend((center.distance_squared_to(loc), thing, loc)
+                                 for thing, loc in bucket.iteritems())
+            if len(found) >= count:
+                found.sort(key=lambda entry: entry[0])
+                if found[count - 1][0] <= reach * reach:
+                    break
+            ring += 1
+        found.sort(key=lambda entry: entry[0])
+        if radius is not None:
+            found = [entry for entry in found
+                     if entry[0] <= radius * radius]
+        return [(thing, loc) for _, thing, loc in found[:count]]
+
+
+def _ring(center_row, center_col, ring):
+    """Yield the keys of the buckets on the square ring around a bucket."""
+    if ring == 0:
+        yield (center_row, center_col)
+        return
+    for col in xrange(center_col - ring, center_col + ring + 1):
+        yield (center_row - ring, col)
+        yield (center_row + ring, col)
+    for row in xrange(center_row - ring + 1, center_row + ring):
+        yield (row, center_col - ring)
+        yield (row, center_col + ring)
@@ -0,0 +1,149 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Unittests for chunked worlds."""
+
+import cPickle as pickle
+import mock
+from .. import chunk
+from .. import the
+from ..chunk import CHUNK_SIZE
+from ..world import Location
+
+the.hero = mock.Mock()
+
+
+def _terrain(sut, top, left):
+    """Return the terrain codes of a chunk-sized area of a world."""
+    return [sut._terrain_at(row, col)
+            for row in xrange(top, top + CHUNK_SIZE)
+            for col in xrange(left, left + CHUNK_SIZE)]
+
+
+def test_chunks_generated_lazily():
+    """Test that only the chunks around the hero are generated."""
+    sut = chunk.ChunkedWorld(2400, 2400, seed=3)
+    assert 0 < sut.loaded_chunk_count() <= 4
+    assert sut.seen_tile_count() > 0
+
+
+def test_chunks_same_in_any_order():
+    """Test that chunks do not depend on the order they are generated in."""
+    first = chunk.ChunkedWorld(960, 960, seed=7)
+    second = chunk.ChunkedWorld(960, 960, seed=7)
+    areas = [(0, 0), (CHUNK_SIZE * 3, CHUNK_SIZE), (480, 480)]
+    expected = [_terrain(first, top, left) for top, left in areas]
+    actual = [_terrain(second, top, left) for top, left in reversed(areas)]
+    assert expected == list(reversed(actual))
+    assert first.glyph_at(first.generator_location) == 'G'
+
+
+def test_evicted_chunks_regenerate():
+    """Test that chunks thrown out of memory come back the same."""
+    sut = chunk.ChunkedWorld(960, 960, seed=11, capacity=4)
+    expected = _terrain(sut, 0, 0)
+    for offset in xrange(0, 960, CHUNK_SIZE):
+        _terrain(sut, offset, 960 - CHUNK_SIZE)
+    assert sut.loaded_chunk_count() <= 4
+    assert _terrain(sut, 0, 0) == expected
+
+
+class _Hero(object):
+    """A hero that, unlike a mock, can be pickled along with the world."""
+
+
+def test_pickled_world_keeps_free_cells():
+    """Test that an unpickled world still has the free cells of every chunk
+    generated, including those no longer in memory."""
+    with mock.patch.object(the, 'hero', _Hero()):
+        sut = chunk.ChunkedWorld(960, 960, seed=13, capacity=4)
+    for offset in xrange(0, 960, CHUNK_SIZE):
+        _terrain(sut, offset, 960 - CHUNK_SIZE)
+    restored = pickle.loads(pickle.dumps(sut, pickle.HIGHEST_PROTOCOL))
+    assert len(restored._free_outdoor) == len(sut._free_outdoor) > 0
+    assert len(restored._free_indoor) == len(sut._free_indoor)
+    assert len(restored._hidden) == len(sut._hidden)
+    assert restored.random_free_location(False) is not None
+
+
+def test_roads_cross_chunk_borders():
+    """Test that roads running from one chunk into the next line up."""
+    sut = chunk.ChunkedWorld(480, 480, seed=5)
+    street = 0
+    for junction_col in xrange(480 / 24):
+        col = (junction_col + 1) * 24 - 2
+        if sut._junction(CHUNK_SIZE / 24, junction_col)[0]:
+            street += 1
+            assert sut.cell(Location(CHUNK_SIZE - 1, col)).glyph == '*'
+            assert sut.cell(Location(CHUNK_SIZE, col)).glyph == '*'
+    assert street
+
+
+def test_junctions_agree():
+    """Test that neighbouring junctions agree on the roads between them."""
+    sut = chunk.ChunkedWorld(480, 480, seed=5)
+    for row in xrange(5):
+        for col in xrange(5):
+            junction = sut._junction(row, col)
+            assert junction[1] == sut._junction(row + 1, col)[0]
+            assert junction[2] == sut._junction(row, col + 1)[3]
+
+
+def test_no_junction_has_one_road():
+    """Test that no junction has just one road, as in the junction grid of
+    a whole world, and that roads carried on through junctions still line
+    up."""
+    sut = chunk.ChunkedWorld(960, 960, seed=5)
+    carried = 0
+    for row in xrange(960 / 24):
+        for col in xrange(960 / 24):
+            junction = sut._junction(row, col)
+            assert sum(junction) != 1
+            if row + 1 < 960 / 24:
+                assert junction[1] == sut._junction(row + 1, col)[0]
+            if col + 1 < 960 / 24:
+                assert junction[2] == sut._junction(row, col + 1)[3]
+            carried += junction != [sut._drawn_road(row, col, -1, 0),
+                                    sut._drawn_road(row, col, 1, 0),
+                                    sut._drawn_road(row, col, 0, 1),
+                                    sut._drawn_road(row, col, 0, -1)]
+    assert carried
+
+
+def test_chunk_populators_called_once():
+    """Test that each chunk is populated once, however often it is
+    generated."""
+    sut = chunk.ChunkedWorld(960, 960, seed=13, capacity=1)
+    populate = mock.Mock()
+    sut.chunk_populators.append(populate)
+    _terrain(sut, 0, 0)
+    _terrain(sut, 960 - CHUNK_SIZE, 960 - CHUNK_SIZE)
+    call_count = populate.call_count
+    assert call_count >= 1
+    _terrain(sut, 0, 0)
+    assert populate.call_count == call_count
+    areas = [call[0] for call in populate.call_args_list]
+    assert len(set(areas)) == len(areas)
+
+
+def test_was_seen_survives_eviction():
+    """Test that the fog of war is remembered for evicted chunks."""
+    sut = chunk.ChunkedWorld(960, 960, seed=17, capacity=1)
+    hero = sut.hero_location
+    _terrain(sut, 0, 0)
+    _terrain(sut, 960 - CHUNK_SIZE, 960 - CHUNK_SIZE)
+    assert sut.cell(hero.offset(1, 0)).was_seen
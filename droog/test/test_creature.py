@@ -15,8 +15,10 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import mock
 import unittest
 from .. import creature
+from ..world import Location
 
 
 class CreatureChecks(unittest.TestCase):
@@ -40,5 +42,67 @@ class CreatureChecks(unittest.TestCase):
         self.assertRaises(AssertionError, creature.Creature, 'ZZ', 'zombie',
                           False)
 
+class DecisionChecks(unittest.TestCase):
+    """Unit tests for the monsters' decision trees."""
+
+    def setUp(self):
+        patcher = mock.patch.object(creature.the, 'world')
+        self.world = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.world.hero_location = Location(50, 50)
+        self.world.dormant_radius = 50
+
+    def _monster(self, monster, col):
+        """Put a monster in the hero's row."""
+        monster.loc = Location(50, col)
+        return monster
+
+    def test_decisions(self):
+        """Monsters should attack, chase, wander, stand or park depending on
+        how far they are from the hero, with or without NumPy."""
+        monsters = [self._monster(creature.Zombie(), 51),
+                    self._monster(creature.Zombie(), 60),
+                    self._monster(creature.ZombieDog(), 75),
+                    self._monster(creature.Zombie(), 75),
+                    self._monster(creature.Zombie(), 101),
+                    self._monster(creature.Cop(), 51),
+                    self._monster(creature.Cop(), 101)]
+        expected = [creature.ATTACK, creature.CHASE, creature.CHASE,
+                    creature.WANDER, creature.PARK, creature.STAND,
+                    creature.PARK]
+        self.assertEqual(creature._decide(monsters), expected)
+        many = monsters * creature.VECTORIZED_BATCH
+        self.assertEqual(creature._decide(many),
+                         expected * creature.VECTORIZED_BATCH)
+
+    def test_decisions_batched_alike(self):
+        """Monsters should decide the same alone as in a batch big enough to
+        be decided with NumPy, even if they cannot sense the hero."""
+        monsters = []
+        for col in (49, 51, 53, 60, 75, 101):
+            for make in (creature.Zombie, creature.ZombieDog, creature.Cop):
+                for sense_range in (0, 1, 5, 30):
+                    monster = self._monster(make(), col)
+                    monster.sense_range = sense_range
+                    monsters.append(monster)
+        self.assertTrue(len(monsters) >= creature.VECTORIZED_BATCH)
+        alone = [creature._decide([monster])[0] for monster in monsters]
+        self.assertEqual(creature._decide(monsters), alone)
+        self.assertEqual(alone[:4], [creature.ATTACK] * 4)
+
+    def test_batch(self):
+        """A batch should start each monster's turn and carry out its
+        action."""
+        zombie = self._monster(creature.Zombie(), 101)
+        cop = self._monster(creature.Cop(), 52)
+        zombie.is_stunned = True
+        self.assertTrue(zombie.batched)
+        self.assertIs(zombie.act_batch, cop.act_batch)
+        actions = zombie.act_batch([zombie, cop])
+        self.assertEqual(actions[0](), zombie.DONE)
+        self.assertFalse(zombie.is_stunned)
+        self.world.park.assert_called_once_with(zombie)
+        self.assertEqual(actions[1](), 6)
+
 if __name__ == "__main__":
     unittest.main()
@@ -39,3 +39,27 @@ def test_generator_deactivate():
     generator.deactivate()
     assert generator.health == 0
     assert the.hero.is_dead
+
+
+def test_loot_placer_populate_area():
+    """Test that loot placed in an area of the map stays inside it."""
+    world = mock.Mock()
+    world.indoor_walkable_locations.return_value = ['indoors']
+    world.outdoor_walkable_locations.return_value = ['outdoors']
+    placer = engine.LootPlacer(world)
+    placer.populate_area(0, 100, 0, 200)
+    world.indoor_walkable_locations.assert_called_with((0, 100, 0, 200))
+    # Some rolls on the loot table come up empty.
+    assert 0 < world.add_item.call_count <= 100 * 200 / engine.LOOT_SPARSENESS
+    for call in world.add_item.call_args_list:
+        assert call[0][0] in ('indoors', 'outdoors')
+
+
+def test_loot_placer_nowhere():
+    """Test that an area with nowhere to put loot is left empty."""
+    world = mock.Mock()
+    world.indoor_walkable_locations.return_value = []
+    world.outdoor_walkable_locations.return_value = []
+    placer = engine.LootPlacer(world)
+    placer.populate_area(0, 100, 0, 200)
+    assert not world.add_item.called
@@ -164,6 +164,12 @@ class EpithetTest(unittest.TestCase):
         self.assertEqual("nimble and hale yet weak",
                          english.epithet(1, 3, 3, 'yet'))
 
+    def test_same_conjunction(self):
+        """Test that the conjunction picked at random stays the same."""
+        first = english.epithet(3, 2, 1)
+        for _ in range(20):
+            self.assertEqual(first, english.epithet(3, 2, 1))
+
 
 class WrapTestCase(unittest.TestCase):
     def test_empty(self):
@@ -0,0 +1,112 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Unittests for flow fields."""
+
+import os
+import subprocess
+import sys
+from .. import flow
+from .. import tile
+
+WALL = tile.make_wall().code
+FLOOR = tile.make_empty().code
+
+
+def _terrain(lines):
+    """Return a terrain plane and its size from lines of '#' and '.'."""
+    terrain = bytearray(WALL if glyph == '#' else FLOOR
+                        for line in lines for glyph in line)
+    return terrain, len(lines), len(lines[0])
+
+
+def _always_open(index):
+    """Every cell is open."""
+    return True
+
+
+def test_open_field_costs():
+    """Test that costs in the open follow the movement costs."""
+    terrain, rows, cols = _terrain(["#######",
+                                    "#.....#",
+                                    "#.....#",
+                                    "#.....#",
+                                    "#######"])
+    sut = flow.FlowField(terrain, rows, cols, 2 * cols + 3, 10)
+    assert sut.costs[2 * cols + 3] == 0
+    assert sut.costs[2 * cols + 4] == 2
+    assert sut.costs[1 * cols + 4] == 3
+    assert sut.costs[1 * cols + 1] == 5
+    assert sut.step(2, 5, _always_open) == (0, -1)
+
+
+def test_step_around_wall():
+    """Test that the best step leads around a wall, not into it."""
+    terrain, rows, cols = _terrain(["#######",
+                                    "#.....#",
+                                    "#.###.#",
+                                    "#..#..#",
+                                    "#######"])
+    sut = flow.FlowField(terrain, rows, cols, 3 * cols + 2, 10)
+    # Straight at the goal is the wall; the way round is up and over.
+    assert sut.step(3, 4, _always_open) == (-1, 1)
+    assert sut.step(1, 3, _always_open) == (0, -1)
+
+
+def test_blocked_and_out_of_reach():
+    """Test that there is no step from out of range, walled-off cells, or
+    when every closer cell is taken."""
+    terrain, rows, cols = _terrain(["########",
+                                    "#...#..#",
+                                    "#...#..#",
+                                    "########"])
+    sut = flow.FlowField(terrain, rows, cols, 1 * cols + 1, 10)
+    assert sut.step(1, 6, _always_open) is None
+    assert sut.step(2, 3, lambda index: False) is None
+    short = flow.FlowField(terrain, rows, cols, 1 * cols + 1, 1)
+    assert short.step(2, 3, _always_open) is None
+    assert short.step(2, 2, _always_open) == (-1, -1)
+
+
+def test_walk_costs_in_area_and_descend():
+    """Test that walks stay in their area and descend to the goal."""
+    terrain, rows, cols = _terrain(["#######",
+                                    "#.....#",
+                                    "#.###.#",
+                                    "#..#..#",
+                                    "#######"])
+    goal = 3 * cols + 2
+    costs = flow.walk_costs(terrain, cols, goal, (0, rows, 0, cols))
+    assert flow.descend(costs, cols, 3 * cols + 4) == [
+        2 * cols + 5, 1 * cols + 4, 1 * cols + 3, 1 * cols + 2,
+        2 * cols + 1, goal]
+    assert flow.descend(costs, cols, goal) == []
+    left = flow.walk_costs(terrain, cols, goal, (0, rows, 0, 3))
+    assert 3 * cols + 4 not in left
+    assert 1 * cols + 3 not in left
+    assert left[1 * cols + 1] == 5
+
+
+def test_imports_alone():
+    """Test that flow fields, and the modules built on them, can be imported
+    before anything else."""
+    package_parent = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    for module in ('flow', 'pathing', 'chunk', 'world'):
+        subprocess.check_call([sys.executable, '-c',
+                               'import droog.%s' % module],
+                              cwd=package_parent)
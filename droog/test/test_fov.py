@@ -0,0 +1,96 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the field of view."""
+
+from .. import fov
+
+
+def _open_map(rows, cols):
+    """Return a transparency bitmap with nothing blocking sight."""
+    return bytearray([1]) * (rows * cols)
+
+
+def test_scan_table_cached():
+    """Test that scan tables are only calculated once per radius."""
+    assert fov.scan_table(7) is fov.scan_table(7)
+    assert len(fov.scan_table(7)) == 8
+
+
+def test_open_field_is_a_disc():
+    """Test that an unobstructed view lights cells within the radius only."""
+    lit = fov.shadowcast(_open_map(41, 41), 41, 41, 20, 20, 10)
+    assert 20 * 41 + 20 not in lit  # The origin is not lit.
+    assert 20 * 41 + 29 in lit
+    assert 20 * 41 + 30 not in lit
+    for index in lit:
+        row, col = divmod(index, 41)
+        assert (row - 20) ** 2 + (col - 20) ** 2 < 100
+
+
+def test_wall_casts_shadow():
+    """Test that an opaque cell is lit but hides the cells behind it."""
+    transparent = _open_map(41, 41)
+    transparent[20 * 41 + 23] = 0
+    lit = fov.shadowcast(transparent, 41, 41, 20, 20, 10)
+    assert 20 * 41 + 23 in lit
+    assert 20 * 41 + 24 not in lit
+    assert 20 * 41 + 27 not in lit
+
+
+def test_map_edge():
+    """Test that a view reaching past the edge of the map stays in bounds."""
+    lit = fov.shadowcast(_open_map(12, 12), 12, 12, 1, 1, 10)
+    assert lit
+    assert all(0 <= index < 144 for index in lit)
+
+
+def test_cache_hits_and_misses():
+    """Test that repeating a field of view is answered from the cache."""
+    cache = fov.FovCache()
+    first = cache.shadowcast(_open_map(41, 41), 41, 41, 20, 20, 10)
+    second = cache.shadowcast(_open_map(41, 41), 41, 41, 20, 20, 10)
+    assert first == second
+    assert cache.misses == 1
+    assert cache.hits == 1
+
+
+def test_cache_terrain_change():
+    """Test that changing the terrain near the origin is not answered from
+    the cache, but changing it out of range is."""
+    transparent = _open_map(41, 41)
+    cache = fov.FovCache()
+    cache.shadowcast(transparent, 41, 41, 20, 20, 10)
+    transparent[40 * 41 + 40] = 0
+    cache.shadowcast(transparent, 41, 41, 20, 20, 10)
+    assert cache.hits == 1
+    transparent[20 * 41 + 23] = 0
+    lit = cache.shadowcast(transparent, 41, 41, 20, 20, 10)
+    assert cache.misses == 2
+    assert 20 * 41 + 27 not in lit
+
+
+def test_cache_size():
+    """Test that the cache forgets the least recently used results."""
+    cache = fov.FovCache(size=2)
+    transparent = _open_map(41, 41)
+    for col in (10, 20, 10, 30, 10):
+        cache.shadowcast(transparent, 41, 41, 20, col, 5)
+    assert len(cache) == 2
+    assert cache.hits == 2
+    assert cache.misses == 3
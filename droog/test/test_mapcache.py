@@ -0,0 +1,80 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Unittests for the map cache."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+from .. import mapcache
+from .. import world
+from .. import the
+
+the.hero = mock.Mock()
+
+
+class TestMapCache(unittest.TestCase):
+    """Test saving and loading maps."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cached_map_loaded(self):
+        """Test that a map is saved, then loaded instead of generated."""
+        first = world.World(96, 72, seed=9, cache_dir=self.directory)
+        assert len(os.listdir(self.directory)) == 1
+        with mock.patch.object(world.World, '_generate') as generate:
+            second = world.World(96, 72, seed=9, cache_dir=self.directory)
+        assert not generate.called
+        assert second._terrain == first._terrain
+        assert second._transparent == first._transparent
+        assert second.generator_location == first.generator_location
+        assert second.hero_location == first.hero_location
+
+    def test_other_seeds_not_loaded(self):
+        """Test that a map is only loaded for its own seed and size."""
+        world.World(96, 72, seed=9, cache_dir=self.directory)
+        world.World(96, 72, seed=10, cache_dir=self.directory)
+        world.World(72, 96, seed=9, cache_dir=self.directory)
+        assert len(os.listdir(self.directory)) == 3
+
+    def test_damaged_map_regenerated(self):
+        """Test that a map file that does not match is generated again."""
+        first = world.World(96, 72, seed=9, cache_dir=self.directory)
+        path = mapcache.path_for(self.directory, 9, 96, 72,
+                                 world.numpy is not None)
+        with open(path, 'r+b') as map_file:
+            map_file.write('NOTAMAP!')
+        second = world.World(96, 72, seed=9, cache_dir=self.directory)
+        assert second._terrain == first._terrain
+        assert not mapcache.load(os.path.join(self.directory, 'missing'),
+                                 second)
+
+    def test_any_seed_cached(self):
+        """Test that negative and huge seeds are saved and loaded."""
+        for seed in (-5, 2 ** 70 + 3):
+            first = world.World(96, 72, seed=seed, cache_dir=self.directory)
+            with mock.patch.object(world.World, '_generate') as generate:
+                second = world.World(96, 72, seed=seed,
+                                     cache_dir=self.directory)
+            assert not generate.called
+            assert second._terrain == first._terrain
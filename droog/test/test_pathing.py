@@ -0,0 +1,196 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Unittests for route planning."""
+
+import random
+from .. import flow
+from .. import pathing
+from .. import tile
+
+WALL = tile.make_wall().code
+FLOOR = tile.make_empty().code
+
+
+def _terrain(lines):
+    """Return a terrain plane and its size from lines of '#' and '.'."""
+    terrain = bytearray(WALL if glyph == '#' else FLOOR
+                        for line in lines for glyph in line)
+    return terrain, len(lines), len(lines[0])
+
+
+def _check_walk(terrain, cols, start, goal, walk):
+    """Check that a walk steps between open neighbouring cells to the goal,
+    and return its cost."""
+    assert walk[-1] == goal
+    cost = 0
+    for here, there in zip([start] + walk, walk):
+        rows_apart = abs(here // cols - there // cols)
+        cols_apart = abs(here % cols - there % cols)
+        assert max(rows_apart, cols_apart) == 1
+        assert tile.WALKABLE[terrain[there]]
+        cost += 3 if rows_apart and cols_apart else 2
+    return cost
+
+
+def test_route_in_the_open():
+    """Test that a route across clusters in the open is close to the
+    cheapest, which is five diagonal steps and two orthogonal ones."""
+    terrain, rows, cols = _terrain(["##########",
+                                    "#........#",
+                                    "#........#",
+                                    "#........#",
+                                    "#........#",
+                                    "#........#",
+                                    "#........#",
+                                    "##########"])
+    sut = pathing.RoutePlanner(terrain, rows, cols, 4)
+    start, goal = 1 * cols + 1, 6 * cols + 8
+    walk = sut.route(start, goal)
+    cheapest = 5 * 3 + 2 * 2
+    assert _check_walk(terrain, cols, start, goal, walk) <= cheapest * 5 // 4
+    assert sut.route(goal, goal) == []
+    assert sut.route(start, start + 1) == [start + 1]
+
+
+def test_route_around_walls():
+    """Test that a route finds the way through the gaps between clusters."""
+    terrain, rows, cols = _terrain(["##########",
+                                    "#...#....#",
+                                    "#...#....#",
+                                    "#...#.####",
+                                    "#...#....#",
+                                    "#........#",
+                                    "######...#",
+                                    "#........#",
+                                    "##########"])
+    sut = pathing.RoutePlanner(terrain, rows, cols, 4)
+    start, goal = 1 * cols + 1, 7 * cols + 1
+    walk = sut.route(start, goal)
+    _check_walk(terrain, cols, start, goal, walk)
+    assert 3 * cols + 5 in walk or 2 * cols + 5 in walk or \
+        6 * cols + 6 in walk
+    back = sut.route(goal, 1 * cols + 8)
+    _check_walk(terrain, cols, goal, 1 * cols + 8, back)
+    assert sut.cluster_count() > 1
+
+
+def test_no_route():
+    """Test that there is no route into a walled-off area or a wall."""
+    terrain, rows, cols = _terrain(["##########",
+                                    "#...#....#",
+                                    "#...#....#",
+                                    "#...#....#",
+                                    "##########"])
+    sut = pathing.RoutePlanner(terrain, rows, cols, 4)
+    assert sut.route(1 * cols + 1, 1 * cols + 8) is None
+    assert sut.route(1 * cols + 1, 1 * cols + 4) is None
+
+
+def test_route_through_diagonal_gaps():
+    """Test that a route crosses borders that can only be stepped over
+    diagonally, in a border and over the corners of clusters."""
+    for lines, start, goal in (
+            (["########",
+              "#......#",
+              "#......#",
+              "#.######",
+              "##.#####",
+              "#......#",
+              "#......#",
+              "########"], (1, 1), (6, 6)),
+            (["########",
+              "#...####",
+              "#...####",
+              "#...####",
+              "####...#",
+              "####...#",
+              "####...#",
+              "########"], (1, 1), (6, 6)),
+            (["########",
+              "####...#",
+              "####...#",
+              "####...#",
+              "#...####",
+              "#...####",
+              "#...####",
+              "########"], (1, 6), (6, 1))):
+        terrain, rows, cols = _terrain(lines)
+        sut = pathing.RoutePlanner(terrain, rows, cols, 4)
+        start_index = start[0] * cols + start[1]
+        goal_index = goal[0] * cols + goal[1]
+        _check_walk(terrain, cols, start_index, goal_index,
+                    sut.route(start_index, goal_index))
+        _check_walk(terrain, cols, goal_index, start_index,
+                    sut.route(goal_index, start_index))
+
+
+def test_route_whenever_path():
+    """Test that a route is found between any two cells with a walk between
+    them on a cluttered map."""
+    rng = random.Random(4)
+    rows, cols = 30, 30
+    terrain = bytearray(WALL if rng.random() < 0.4 else FLOOR
+                        for _ in xrange(rows * cols))
+    sut = pathing.RoutePlanner(terrain, rows, cols, 5)
+    finder = pathing.PathFinder(terrain, rows, cols, rows * cols)
+    open_cells = [index for index in xrange(rows * cols)
+                  if terrain[index] == FLOOR]
+    for _ in xrange(300):
+        start, goal = rng.choice(open_cells), rng.choice(open_cells)
+        walk = sut.route(start, goal)
+        assert (walk is None) == (finder.path(start, goal) is None)
+        if walk:
+            _check_walk(terrain, cols, start, goal, walk)
+
+
+def test_path_is_cheapest():
+    """Test that found paths are as cheap as walking the flow field, with
+    buffers in arrays or in dictionaries."""
+    terrain, rows, cols = _terrain(["############",
+                                    "#....#.....#",
+                                    "#.##.#.###.#",
+                                    "#..#...#...#",
+                                    "##.#####.#.#",
+                                    "#.........##",
+                                    "#.#.##.#...#",
+                                    "############"])
+    for size in (rows * cols, None):
+        sut = pathing.PathFinder(terrain, rows, cols, size)
+        for start, goal in ((1 * cols + 1, 6 * cols + 10),
+                            (6 * cols + 1, 1 * cols + 10),
+                            (3 * cols + 1, 3 * cols + 5)):
+            walk = sut.path(start, goal)
+            cheapest = flow.walk_costs(terrain, cols, goal,
+                                       (0, rows, 0, cols))[start]
+            assert _check_walk(terrain, cols, start, goal, walk) == cheapest
+
+
+def test_no_path():
+    """Test that there is no path into a walled-off area, or beyond the
+    radius."""
+    terrain, rows, cols = _terrain(["##########",
+                                    "#...#....#",
+                                    "#...#....#",
+                                    "#...#....#",
+                                    "##########"])
+    sut = pathing.PathFinder(terrain, rows, cols, rows * cols)
+    assert sut.path(1 * cols + 1, 1 * cols + 8) is None
+    assert sut.path(1 * cols + 1, 1 * cols + 4) is None
+    assert sut.path(1 * cols + 1, 3 * cols + 3, radius=1) is None
+    assert sut.path(1 * cols + 1, 3 * cols + 3, radius=2) == [
+        2 * cols + 2, 3 * cols + 3]
@@ -0,0 +1,120 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Unittests for the world pool."""
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+import mock
+from .. import hero
+from .. import message
+from .. import pool
+from .. import the
+from .. import turn
+from .. import world
+
+
+def _create_game():
+    """Create a small game."""
+    the.turn = turn.Turn()
+    the.hero = hero.Hero('Pooled', None)
+    the.turn.add_actor(the.hero)
+    the.messages = message.Messages(turn=the.turn)
+    the.world = world.World(40, 40)
+
+
+class TestWorldPool(unittest.TestCase):
+    """Test creating games ahead of time and taking them."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.sut = pool.WorldPool(self.directory, _create_game, size=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_refill_and_take(self):
+        """Test that games are created to fill the pool, and taken from
+        it."""
+        self.sut.refill()
+        self.sut.join()
+        self.assertEqual(self.sut.ready_count(), 2)
+        the.world = None
+        self.assertTrue(self.sut.take())
+        self.assertEqual(the.world.rows, 40)
+        self.assertTrue(the.world.cell(the.hero.loc).creature is the.hero)
+        self.assertEqual(self.sut.ready_count(), 1)
+        self.assertTrue(self.sut.take())
+        self.assertFalse(self.sut.take())
+
+    def test_refill_only_missing(self):
+        """Test that refilling a full pool does nothing."""
+        self.sut.refill()
+        self.sut.refill()
+        self.sut.join()
+        self.assertEqual(self.sut.ready_count(), 2)
+        self.sut.refill()
+        self.assertEqual(len(self.sut._workers), 0)
+
+    def test_damaged_game_discarded(self):
+        """Test that a game that cannot be loaded is thrown away."""
+        with open(os.path.join(self.directory, 'bad.game'), 'wb') as bad:
+            bad.write('not a game')
+        self.assertFalse(self.sut.take())
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_pool_kept_private(self):
+        """Test that the pool directory is made private, and that no games
+        are taken from it once others can write to it."""
+        self.assertEqual(stat.S_IMODE(os.stat(self.directory).st_mode), 0700)
+        self.sut.refill()
+        self.sut.join()
+        os.chmod(self.directory, 0777)
+        self.assertFalse(self.sut.take())
+        self.assertEqual(self.sut.ready_count(), 2)
+        pool.WorldPool(self.directory, _create_game)
+        self.assertTrue(self.sut.take())
+
+    def test_others_games_discarded(self):
+        """Test that a game file belonging to someone else is thrown away
+        without being loaded."""
+        self.sut.size = 1
+        self.sut.refill()
+        self.sut.join()
+        with mock.patch.object(pool, '_owned',
+                               lambda status: stat.S_ISDIR(status.st_mode)):
+            with mock.patch.object(pool, 'restore') as restore:
+                self.assertFalse(self.sut.take())
+        self.assertFalse(restore.called)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_snapshot_restore(self):
+        """Test that a game survives a snapshot with its messages, but
+        without its user interface."""
+        _create_game()
+        the.hero.ui = object()
+        the.messages.add("Hello.")
+        data = pool.snapshot()
+        self.assertTrue(the.hero.ui is not None)
+        pool.restore(data)
+        self.assertTrue(the.hero.ui is None)
+        self.assertEqual(the.messages.get(), "Hello.")
+        self.assertTrue(the.world.cell(the.world.hero_location).creature
+                        is the.hero)
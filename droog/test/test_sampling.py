@@ -0,0 +1,71 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Unittests for sampling sets."""
+
+import random
+from .. import sampling
+
+
+def test_index_set_add_discard():
+    """Test that an index set keeps track of its members."""
+    for size in (100, None):
+        sut = sampling.IndexSet(size, [5, 7, 9])
+        sut.add(7)
+        sut.add(11)
+        sut.discard(5)
+        sut.discard(50)
+        assert sorted(sut) == [7, 9, 11]
+        assert 9 in sut and 5 not in sut
+        assert len(sut) == 3
+
+
+def test_index_set_random_operations():
+    """Test that an index set matches a set over many operations."""
+    rng = random.Random(3)
+    sut = sampling.IndexSet(64)
+    expected = set()
+    for _ in xrange(2000):
+        index = rng.randrange(64)
+        if rng.random() < 0.5:
+            sut.add(index)
+            expected.add(index)
+        else:
+            sut.discard(index)
+            expected.discard(index)
+        assert len(sut) == len(expected)
+    assert set(sut) == expected
+    assert all((index in sut) == (index in expected) for index in xrange(64))
+
+
+def test_index_set_choice():
+    """Test that random choices are members, and None when empty."""
+    sut = sampling.IndexSet(10, [2, 4])
+    assert all(sut.choice() in (2, 4) for _ in xrange(20))
+    assert sampling.IndexSet(10).choice() is None
+
+
+def test_choice_across_sets():
+    """Test that choosing across sets covers all their members evenly."""
+    small = sampling.IndexSet(10, [1])
+    large = sampling.IndexSet(10, [2, 3, 4])
+    rng = random.Random(5)
+    counts = dict.fromkeys([1, 2, 3, 4], 0)
+    for _ in xrange(4000):
+        counts[sampling.choice([small, large], rng)] += 1
+    assert all(800 < count < 1200 for count in counts.values())
+    assert sampling.choice([sampling.IndexSet(10)]) is None
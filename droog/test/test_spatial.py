@@ -0,0 +1,101 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Unittests for the spatial hash."""
+
+import random
+from .. import spatial
+from ..world import Location
+
+
+def _scattered(count, seed=1):
+    """Return a spatial hash of things scattered over a 200 by 200 map, and
+    the things with their locations."""
+    rng = random.Random(seed)
+    sut = spatial.SpatialHash(bucket_size=8)
+    things = {}
+    for thing in xrange(count):
+        loc = Location(rng.randrange(200), rng.randrange(200))
+        sut.add(thing, loc)
+        things[thing] = loc
+    return sut, things
+
+
+def test_add_move_remove():
+    """Test that things can be indexed, moved and removed."""
+    sut = spatial.SpatialHash(bucket_size=8)
+    sut.add('a', Location(1, 1))
+    sut.add('a', Location(30, 30))
+    assert sut.location_of('a') == Location(30, 30)
+    assert sut.in_rect(0, 8, 0, 8) == []
+    assert sut.in_rect(24, 32, 24, 32) == [('a', Location(30, 30))]
+    sut.remove('a')
+    sut.remove('a')
+    assert 'a' not in sut
+    assert len(sut) == 0
+    assert sut._buckets == {}
+
+
+def test_in_rect():
+    """Test that rectangle queries find just the things inside."""
+    sut, things = _scattered(300)
+    for top, bottom, left, right in [(0, 200, 0, 200), (10, 11, 10, 190),
+                                     (33, 97, 5, 61), (-20, 3, 190, 250)]:
+        expected = set(thing for thing, loc in things.items()
+                       if top <= loc.row < bottom and left <= loc.col < right)
+        assert set(thing for thing, _ in
+                   sut.in_rect(top, bottom, left, right)) == expected
+
+
+def test_within():
+    """Test that radius queries find just the things in the circle."""
+    sut, things = _scattered(300)
+    center = Location(100, 50)
+    expected = set(thing for thing, loc in things.items()
+                   if center.distance_squared_to(loc) <= 25 * 25)
+    assert set(thing for thing, _ in sut.within(center, 25)) == expected
+
+
+def test_nearest():
+    """Test that nearest-k queries find the closest things, in order."""
+    sut, things = _scattered(300)
+    for center in [Location(0, 0), Location(120, 80), Location(250, 250)]:
+        distances = sorted(center.distance_squared_to(loc)
+                           for loc in things.values())
+        found = sut.nearest(center, 7)
+        assert [center.distance_squared_to(loc)
+                for _, loc in found] == distances[:7]
+        assert all(things[thing] == loc for thing, loc in found)
+
+
+def test_nearest_within_radius():
+    """Test that nearest-k queries leave out things beyond the radius, and
+    cope with fewer things than asked for."""
+    sut, things = _scattered(5)
+    center = Location(100, 100)
+    found = sut.nearest(center, 10, radius=60)
+    assert len(found) == len([loc for loc in things.values()
+                              if center.distance_squared_to(loc) <= 3600])
+    assert len(sut.nearest(center, 10)) == 5
+    assert spatial.SpatialHash().nearest(center, 3) == []
+
+
+def test_nearest_none():
+    """Test that asking for no things finds none."""
+    sut, _ = _scattered(30)
+    assert sut.nearest(Location(100, 100), 0) == []
+    assert sut.nearest(Location(100, 100), -1, radius=20) == []
@@ -0,0 +1,48 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit tests for the tile module."""
+
+import pickle
+from .. import tile
+
+
+def test_factories_share_tile_types():
+    """Test that tile factories return the one registered tile type."""
+    assert tile.make_street() is tile.make_street()
+    assert tile.make_street() is tile.tile_type('street')
+    assert tile.TILE_TYPES[tile.STREET.code] is tile.STREET
+
+
+def test_register_interns():
+    """Test that registering an existing name returns the existing type."""
+    assert tile.register('wall', '#', "a wall", False, False) is tile.WALL
+
+
+def test_tile_type_immutable():
+    """Test that tile types cannot be changed once registered."""
+    try:
+        tile.FLOOR.glyph = '_'
+    except AttributeError:
+        return
+    assert False, "Tile type attributes should not be assignable."
+
+
+def test_tile_type_pickle():
+    """Test that unpickling a tile type gives the registered instance."""
+    assert pickle.loads(pickle.dumps(tile.TREE, 2)) is tile.TREE
@@ -16,6 +16,8 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 import droog.turn as turn_
+import mock
+import random
 import unittest
 from .. import actor
 import logging
@@ -47,6 +49,19 @@ class ClockTurnTestCase(unittest.TestCase):
                          " advanced 100 seconds, to 07:01:40")
 
 
+class AdvanceClockTest(unittest.TestCase):
+    def runTest(self):
+        """Advancing should move the turn and the clock on, and the clock
+        should wrap around at midnight."""
+        turn = turn_.Turn()
+        turn.advance(3600)
+        self.assertEqual(turn.current_turn, 3600)
+        self.assertEqual(turn.current_time(), '08:00:00')
+        turn.advance(17 * 3600 + 61)
+        self.assertEqual(turn.current_time(), '01:01:01')
+        self.assertEqual(turn.current_time(), '01:01:01')
+
+
 class ManyActors(unittest.TestCase):
     def runTest(self):
         """Add a hundred TestActors and run through a thousand next()s"""
@@ -124,5 +139,187 @@ class DelayActorTest(unittest.TestCase):
         self.assertEqual(self.other_actor.count, 1,
                          "Other actor should have acted first.")
 
+class PriorityQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = turn_.PriorityQueue()
+
+    def testOrder(self):
+        """Actors should come out by tick, then in the order they were put
+        in, however they were rescheduled and removed."""
+        rng = random.Random(4)
+        actors = [TestActor(str(number)) for number in range(50)]
+        expected = {}
+        for step in range(500):
+            actor = rng.choice(actors)
+            if actor in expected and rng.random() < 0.2:
+                self.queue.remove(actor)
+                del expected[actor]
+            else:
+                tick = rng.randint(0, 20)
+                self.queue.put(actor, tick)
+                expected[actor] = (tick, step)
+            self.assertEqual(len(self.queue), len(expected))
+        for actor, (tick, _) in expected.items():
+            self.assertEqual(self.queue.when(actor), tick)
+        order = sorted(expected, key=expected.get)
+        self.assertEqual(self.queue.peek(), (expected[order[0]][0],
+                                             order[0]))
+        self.assertEqual([self.queue.get() for _ in order], order)
+        self.assertEqual(self.queue.peek(), None)
+        self.assertRaises(KeyError, self.queue.get)
+
+
+class RescheduleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.turn = turn_.Turn()
+        self.actors = [TestActor(str(number), 3) for number in range(10)]
+        for actor in self.actors:
+            self.turn.add_actor(actor)
+
+    def testNextActor(self):
+        """The next actor should be the one at the head of the queue."""
+        self.assertTrue(self.turn.next_actor() is self.actors[0])
+        self.turn.next()
+        self.assertTrue(self.turn.next_actor() is self.actors[1])
+        self.assertEqual(turn_.Turn().next_actor(), None)
+
+    def testDelayFromTick(self):
+        """A delay should be added to the tick the actor is queued at."""
+        self.turn.delay_actor(self.actors[0], 5)
+        self.assertEqual(self.turn._queue.when(self.actors[0]), 5)
+        self.turn.delay_actor(self.actors[0], 5)
+        self.assertEqual(self.turn._queue.when(self.actors[0]), 10)
+
+    def testQueueStaysSmall(self):
+        """Rescheduling and removing actors should not grow the queue."""
+        for _ in range(100):
+            for actor in self.actors[1:]:
+                self.turn.delay_actor(actor, 1)
+            self.turn.next()
+        self.assertEqual(len(self.turn._queue._heap), 10)
+        self.turn.remove_actor(self.actors[0])
+        self.assertEqual(len(self.turn._queue._heap), 9)
+        self.assertFalse(self.actors[0] in self.turn._queue)
+
+
+class TimingWheelTest(PriorityQueueTest):
+
+    def setUp(self):
+        self.queue = turn_.TimingWheel()
+
+    def testSameAsHeap(self):
+        """A timing wheel should give out actors in the same order as a
+        priority queue, across spans, after long gaps and for ticks it has
+        already passed."""
+        rng = random.Random(7)
+        heap = turn_.PriorityQueue()
+        actors = [TestActor(str(number)) for number in range(40)]
+        now = 0
+        for _ in range(5000):
+            actor = rng.choice(actors)
+            roll = rng.random()
+            if roll < 0.4 and len(heap):
+                self.assertEqual(self.queue.peek(), heap.peek())
+                now = heap.peek()[0]
+                self.assertEqual(self.queue.get(), heap.get())
+            elif roll < 0.5 and actor in heap:
+                self.queue.remove(actor)
+                heap.remove(actor)
+            else:
+                tick = now + rng.choice((-3, 0, 1, 5, 300, 5000))
+                self.queue.put(actor, tick)
+                heap.put(actor, tick)
+            self.assertEqual(len(self.queue), len(heap))
+        while len(heap):
+            self.assertEqual(self.queue.get(), heap.get())
+        self.assertEqual(self.queue.peek(), None)
+
+    def testTurn(self):
+        """Actors should take the same turns with either queue."""
+        counts = []
+        for queue in (turn_.PriorityQueue(), turn_.TimingWheel()):
+            turn = turn_.Turn(queue)
+            actors = [TestActor(str(number), 1 + number * 37 % 400)
+                      for number in range(20)]
+            for actor in actors:
+                turn.add_actor(actor)
+            for _ in range(2000):
+                turn.next()
+            counts.append([actor.count for actor in actors])
+        self.assertEqual(counts[0], counts[1])
+
+
+class BatchActor(TestActor):
+    """A test actor that acts in batches."""
+    batched = True
+    batches = []
+
+    @staticmethod
+    def act_batch(actors):
+        """Record the batch and have each actor act alone."""
+        BatchActor.batches.append(len(actors))
+        return [actor.act for actor in actors]
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        BatchActor.batches = []
+
+    def _run(self, actor_type, turns):
+        """Run a turn tracker with actors of a type for some turns, and
+        return the number of turns taken and the actors' counts."""
+        turn = turn_.Turn()
+        actors = [actor_type(str(number), 2 + number % 3)
+                  for number in range(10)]
+        lone_actor = TestActor("lone", 5)
+        for actor in actors[:5]:
+            turn.add_actor(actor)
+        turn.add_actor(lone_actor)
+        for actor in actors[5:]:
+            turn.add_actor(actor, 1)
+        while turn.current_turn < turns:
+            turn.next()
+        return turn.current_turn, [actor.count for actor in actors] + \
+            [lone_actor.count]
+
+    def testSameAsAlone(self):
+        """Batched actors should take as many turns, and act as many times,
+        as if they acted alone."""
+        turns, batched_counts = self._run(BatchActor, 300)
+        self.assertTrue(max(BatchActor.batches) > 1)
+        self.assertEqual(self._run(TestActor, turns), (turns, batched_counts))
+
+class HeroKiller(BatchActor):
+    """A batched test actor that kills the hero."""
+
+    def act(self):
+        turn_.the.hero.is_dead = True
+        return TestActor.act(self)
+
+
+class BatchDeathTest(unittest.TestCase):
+
+    def setUp(self):
+        self.hero = turn_.the.hero
+        turn_.the.hero = mock.Mock(is_dead=False)
+
+    def tearDown(self):
+        turn_.the.hero = self.hero
+
+    def testStopsWhenHeroDies(self):
+        """Once a monster kills the hero, the rest of its batch should not
+        act, and should stay queued at the batch's tick."""
+        turn = turn_.Turn()
+        killers = [HeroKiller(str(number)) for number in range(2)]
+        for killer in killers:
+            turn.add_actor(killer, 1)
+        turn.next()
+        self.assertEqual([killer.count for killer in killers], [1, 0])
+        self.assertEqual(turn.current_turn, 1)
+        self.assertEqual(turn._queue.when(killers[1]), 1)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,174 @@
+# Droog
+# Copyright (C) 2015  Adam Miezianko
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Unittests for the user interface."""
+
+import mock
+from .. import english
+from .. import hero
+from .. import message
+from .. import the
+from .. import turn
+from .. import ui
+from .. import world
+
+
+def test_changed_runs_unchanged():
+    """Test that an unchanged row has nothing to write."""
+    assert ui.changed_runs(list("..#"), [1, 1, 0], list("..#"),
+                           [1, 1, 0]) == []
+
+
+def test_changed_runs_span_changes():
+    """Test that the runs cover the first change to the last, split where
+    the attribute changes."""
+    old = list("....##..")
+    new = list("..Z.##d.")
+    attrs = [2, 2, 3, 2, 0, 0, 3, 2]
+    assert ui.changed_runs(old, [2] * 4 + [0] * 2 + [2] * 2, new, attrs) == \
+        [(2, 3), (3, 4), (4, 6), (6, 7)]
+
+
+def test_changed_runs_from_nothing():
+    """Test that a row drawn for the first time is written whole."""
+    attrs = [0, 0, 2, 2]
+    assert ui.changed_runs([None] * 4, [None] * 4, list("  .."), attrs) == \
+        [(0, 2), (2, 4)]
+
+
+def _side_panel_ui():
+    """Return a user interface with a mock hero window, and no screen."""
+    sut = object.__new__(ui.Curses)
+    sut.hero_window = mock.Mock()
+    sut.area_height = 21
+    sut._hero_shown = None
+    sut._targets_shown = None
+    return sut
+
+
+def test_hero_window_drawn_on_change():
+    """Test that the hero window is only drawn again when what it shows
+    changes, and only the targets when only they change."""
+    sut = _side_panel_ui()
+    hero = mock.Mock(strength=2, dexterity=3, constitution=2,
+                     is_wounded=False, is_stunned=False, is_diseased=False,
+                     inventory=[], is_hero=False, initial_vowel=False)
+    hero.name = "Snaugh"
+    hero.weapon.name = "fists"
+    hero.weapon.ammo_capacity = 0
+    world = mock.Mock(visible_monsters=[])
+    sut.draw_hero(hero, world)
+    assert sut.hero_window.clear.call_count == 1
+    assert sut.hero_window.refresh.call_count == 1
+    sut.draw_hero(hero, world)
+    assert sut.hero_window.refresh.call_count == 1
+    world.visible_monsters = [hero]
+    sut.draw_hero(hero, world)
+    assert sut.hero_window.clear.call_count == 1
+    assert sut.hero_window.refresh.call_count == 2
+    hero.is_wounded = True
+    with mock.patch.object(ui.curses, 'color_pair', return_value=0):
+        sut.draw_hero(hero, world)
+    assert sut.hero_window.clear.call_count == 2
+
+
+def test_refresh_updates_terminal():
+    """Test that refreshing the screen updates the terminal even when the
+    status line has not changed."""
+    # Imported here, once logging has been set up by the tests.
+    from .. import main
+    sut = object.__new__(ui.Curses)
+    sut.draw_area = mock.Mock()
+    sut.status_line = mock.Mock()
+    sut.status = ""
+    sut._status_time = "0:00"
+    sut._status_shown = ("0:00", "")
+    the.world = mock.Mock()
+    the.turn = mock.Mock(**{'current_time.return_value': "0:00"})
+    with mock.patch.object(ui.curses, 'doupdate') as doupdate:
+        main.refresh(sut)
+    sut.draw_area.assert_called_once_with(the.world, update=False)
+    assert not sut.status_line.addstr.called
+    assert doupdate.call_count == 1
+
+
+def test_headless_input():
+    """Test that the headless interface types the keys of its script, then
+    quits."""
+    sut = ui.Headless("hj")
+    assert [sut.input() for _ in range(4)] == ['h', 'j', 'q', 'q']
+
+
+def test_headless_character_creation():
+    """Test that the script picks the choices of character creation."""
+    sut = ui.Headless("3x1 23 ")
+    attrib, weapon, inventory = sut.character_creation(
+        english.CREATION_STORY, hero.attrib_choices(),
+        hero.weapon_choices(), hero.gear_choices())
+    assert attrib == "halest"
+    assert weapon.name == hero.weapon_choices()[0].name
+    assert [gear.name for gear in inventory] == \
+        [gear.name for gear in hero.gear_choices()[1:]]
+    quitter = ui.Headless("1")
+    assert quitter.character_creation(
+        english.CREATION_STORY, hero.attrib_choices(),
+        hero.weapon_choices(), hero.gear_choices()) == (None, None, None)
+
+
+def test_headless_game():
+    """Test that a game can be played to the end with no terminal, and
+    drawn as text."""
+    the.turn = turn.Turn()
+    sut = ui.Headless("hjklyubn" * 3)
+    the.hero = hero.Hero('Headless', sut)
+    the.hero.build(('strongest', hero.weapon_choices()[1], []))
+    the.turn.add_actor(the.hero)
+    the.messages = message.Messages(turn=the.turn)
+    the.world = world.World(40, 40)
+    while not the.hero.is_dead:
+        the.turn.next()
+        sut.draw_area(the.world)
+        sut.draw_status(time=the.turn.current_time())
+    screen = sut.screen()
+    assert len(screen) == sut.height
+    assert screen[sut.hero_y_offset + 2][sut.hero_x_offset] == '@'
+    assert screen[2].endswith("|Headless the strong")
+    assert screen[-1] == the.turn.current_time()
+    assert sut.frames == the.turn.current_turn
+
+
+def test_headless_scores_not_recorded():
+    """Test that a headless game is scored but not recorded in the high
+    scores, and that other games are."""
+    # Imported here, once logging has been set up by the tests.
+    from .. import main
+    the.hero = mock.Mock(is_dead=True)
+    the.messages = mock.Mock(**{'empty.return_value': True})
+    the.world = mock.Mock(dead_monsters=[])
+    with mock.patch.object(main, 'score') as score:
+        score.calculate_time_score.return_value = 1
+        score.calculate_map_score.return_value = 2
+        score.calculate_kill_score.return_value = 3
+        score.calculate_victory_score.return_value = 0
+        main.end_game(ui.Headless())
+        assert score.calculate_map_score.called
+        assert not score.record_score.called
+        recording = mock.Mock(records_scores=True)
+        main.end_game(recording)
+        score.record_score.assert_called_once_with(
+            the.hero.name, the.hero.end_reason, 6)
+        assert recording.record_screen.called
@@ -17,7 +17,9 @@
 
 """Unittests for World class."""
 
+import math
 import mock
+from .. import tile
 from .. import world
 from ..world import Location
 
@@ -82,6 +84,35 @@ def test_location_ne():
     assert first != second
 
 
+def test_location_hash():
+    """Test that equal locations hash equally, so they work as keys."""
+    assert hash(Location(3, 9)) == hash(Location(3, 9))
+    assert len(set([Location(3, 9), Location(3, 9), Location(9, 3)])) == 2
+
+
+def test_location_immutable():
+    """Test that a location cannot be changed once created."""
+    loc = Location(3, 9)
+    try:
+        loc.row = 4
+    except AttributeError:
+        return
+    assert False, "Location coordinates should not be assignable."
+
+
+def test_location_distance_squared_to():
+    """Test that distance_squared_to avoids the square root."""
+    start = Location(7, 11)
+    assert start.distance_squared_to(start.offset(3, 4)) == 25
+
+
+def test_world_location_pool():
+    """Test that the world hands out one shared Location per cell."""
+    sut = world.World(40, 40)
+    assert sut.location(5, 7) is sut.location(5, 7)
+    assert sut.location(5, 7) == Location(5, 7)
+
+
 def test_random_delta():
     """Test that random_delta() returns a delta in the range [-1..1] for both
     row and column."""
@@ -136,12 +167,230 @@ def test_glyph_at_item():
     assert sut.glyph_at(location) == item.glyph
 
 
+def test_view_row_matches_cells():
+    """Test that a view row has the glyph of each cell and how well it is
+    known."""
+    sut = world.World(80, 80)
+    sut.add_item(sut.hero_location.offset(0, 1), mock.Mock(glyph=')'))
+    row = sut.hero_location.row
+    glyphs, known = sut.view_row(row, 5, 70)
+    for col in range(5, 70):
+        loc = sut.location(row, col)
+        assert glyphs[col - 5] == sut.glyph_at(loc)
+        assert known[col - 5] == sut.cell(loc).seen + sut.cell(loc).was_seen
+    assert 2 in known
+
+
+def test_cell_seen_sets_was_seen():
+    """Test that seeing a cell also marks it as seen in the past."""
+    sut = world.World(40, 40)
+    cell = sut.cell(Location(5, 6))
+    cell.seen = True
+    cell.seen = False
+    assert not cell.seen
+    assert cell.was_seen
+
+
+def test_get_item():
+    """Test that items can be taken back out of the world."""
+    sut = world.World(40, 40)
+    item = mock.Mock()
+    location = Location(4, 3)
+    sut.add_item(location, item)
+    assert sut.get_item(location) is item
+    assert sut.get_item(location) is None
+    assert not sut.cell(location).items
+
+
+def test_looking_leaves_no_items():
+    """Test that looking at the items on empty cells keeps no lists of
+    them."""
+    sut = world.World(40, 40)
+    location = Location(4, 3)
+    assert sut.cell(location).items == []
+    sut.description_at(location)
+    assert sut.item_description_at(location) == ""
+    assert not sut._items
+
+
+def _seen_locations(sut):
+    """Return the locations currently being seen in a world."""
+    locations = [sut.location(row, col) for row in xrange(sut.rows)
+                 for col in xrange(sut.cols)]
+    return [loc for loc in locations if sut.cell(loc).seen]
+
+
+def test_fov_moves_with_hero():
+    """Test that moving the hero updates what is seen and leaves the fog of
+    war behind."""
+    sut = world.World(80, 80)
+    before = _seen_locations(sut)
+    assert before
+    sut.change_hero_loc(sut.location(sut.rows - sut.hero_location.row,
+                                     sut.cols - sut.hero_location.col))
+    after = _seen_locations(sut)
+    assert sut.seen_tile_count() == len(after)
+    for loc in before:
+        assert sut.cell(loc).was_seen
+        assert loc in after or not sut.cell(loc).seen
+
+
+def test_visible_monsters_follow_fov():
+    """Test that monsters come into and go out of view with the FOV."""
+    sut = world.World(80, 80)
+    monster = mock.Mock()
+    loc = _seen_locations(sut)[0]
+    sut.cell(loc).creature = monster
+    monster.loc = loc
+    sut.reset_fov()
+    sut.do_fov()
+    assert sut.visible_monsters == [monster]
+    sut.change_hero_loc(sut.location(loc.row + 30 if loc.row < 40
+                                     else loc.row - 30, loc.col))
+    assert sut.visible_monsters == []
+
+
+def test_view_changes_count_creatures_in_view():
+    """Test that creatures coming, going and moving in view are counted, and
+    those out of view are not."""
+    sut = world.World(80, 80)
+    monster = mock.Mock()
+    seen = _seen_locations(sut)
+    loc = [seen_loc for seen_loc in seen
+           if seen_loc != sut.hero_location and sut.cell(seen_loc).walkable][0]
+    changes = sut.view_changes
+    sut.cell(loc).creature = monster
+    assert sut.view_changes == changes + 1
+    sut.cell(loc).creature = None
+    unseen = [sut.location(row, col) for row in range(sut.rows)
+              for col in range(sut.cols)
+              if not sut.cell(sut.location(row, col)).seen][0]
+    sut.cell(unseen).creature = monster
+    sut.cell(unseen).creature = None
+    assert sut.view_changes == changes + 2
+
+
+def test_creature_index_follows_creatures():
+    """Test that the creature index tracks the hero and the monsters."""
+    sut = world.World(80, 80)
+    assert sut.creature_index.location_of(world.the.hero) == \
+        sut.hero_location
+    monster = mock.Mock()
+    while not sut.attempt_to_place_monster(monster):
+        pass
+    assert sut.creature_index.location_of(monster) == monster.loc
+    for delta in world._ALL_DELTAS:
+        if sut.move_creature(monster.loc, delta):
+            break
+    assert sut.creature_index.location_of(monster) == monster.loc
+    assert (monster, monster.loc) in sut.creature_index.within(monster.loc,
+                                                               0)
+    sut.remove_monster(monster)
+    assert monster not in sut.creature_index
+    new_loc = sut.location(sut.rows / 2, sut.cols / 2 + 1)
+    sut.change_hero_loc(new_loc)
+    assert sut.creature_index.location_of(world.the.hero) == new_loc
+
+
+def _check_sampling_sets(sut):
+    """Check the sampling sets of a world against its cells."""
+    free = set(index for index in xrange(sut.rows * sut.cols)
+               if world.tile.WALKABLE[sut._terrain[index]]
+               and index not in sut._creatures)
+    indoor = set(index for index in free
+                 if world.tile.INDOOR[sut._terrain[index]])
+    assert set(sut._free_indoor) == indoor
+    assert set(sut._free_outdoor) == free - indoor
+    assert set(sut._hidden) == free - sut._lit
+
+
+def test_sampling_sets_follow_changes():
+    """Test that the sampling sets keep up with creatures and the FOV."""
+    sut = world.World(80, 80)
+    _check_sampling_sets(sut)
+    monsters = [mock.Mock() for _ in xrange(20)]
+    for monster in monsters:
+        assert sut.attempt_to_place_monster(monster)
+    for monster in monsters:
+        for _ in xrange(5):
+            sut.move_creature(monster.loc, world.random_delta())
+    sut.change_hero_loc(sut.random_free_location())
+    sut.remove_monster(monsters[0])
+    _check_sampling_sets(sut)
+
+
+def test_random_free_location():
+    """Test that free locations are walkable, unoccupied and, when asked,
+    indoors and out of view."""
+    sut = world.World(80, 80)
+    for _ in xrange(50):
+        loc = sut.random_free_location(indoor=True)
+        assert sut.cell(loc).walkable and sut.cell(loc).indoor
+        loc = sut.random_free_location(hidden=True)
+        assert sut.cell(loc).walkable and not sut.cell(loc).seen
+
+
+def test_flow_step_follows_hero():
+    """Test that flow steps lead to the hero, and are worked out again when
+    the hero moves."""
+    sut = world.World(80, 80)
+    hero = sut.hero_location
+    for delta in world._ALL_DELTAS:
+        start = hero.offset(delta.row * 2, delta.col * 2)
+        step = sut.flow_step(start, 5)
+        if step is not None:
+            end = start.offset(step.row, step.col)
+            assert sut.cell(end).walkable
+            costs = sut._hero_flow.costs
+            assert costs[end.row * sut.cols + end.col] < \
+                costs[start.row * sut.cols + start.col]
+    assert sut.flow_step(hero.offset(20, 20), 5) is None
+    flow_field = sut._hero_flow
+    sut.flow_step(hero.offset(2, 2), 5)
+    assert sut._hero_flow is flow_field
+    sut.change_hero_loc(sut.random_free_location())
+    sut.flow_step(hero.offset(2, 2), 5)
+    assert sut._hero_flow is not flow_field
+
+
 def test_generate_world():
     """Test the new genreation function."""
     sut = world.World(40, 40)
     pass  # TODO put an assertion here.
 
 
+def _check_generated(sut):
+    """Check the fixed features of a generated world."""
+    assert sut.glyph_at(sut.generator_location) == 'G'
+    for row in xrange(sut.rows):
+        assert sut.cell(Location(row, 0)).glyph == '~'
+        assert sut.cell(Location(row, sut.cols - 1)).glyph == '~'
+    glyphs = set(sut.cell(Location(row, col)).glyph
+                 for row in xrange(sut.rows) for col in xrange(sut.cols))
+    assert '*' in glyphs and '.' in glyphs
+
+
+def test_generate_world_cell_by_cell():
+    """Test generating a world one cell at a time."""
+    _check_generated(world.World(96, 96, vectorized=False))
+
+
+def test_generate_world_vectorized():
+    """Test generating a world with NumPy, when it is installed."""
+    if world.numpy is None:
+        return
+    _check_generated(world.World(96, 96, vectorized=True))
+
+
+def test_seeded_worlds_match():
+    """Test that worlds with the same seed have the same map and start."""
+    for vectorized in (False, True) if world.numpy else (False,):
+        first = world.World(96, 96, vectorized=vectorized, seed=42)
+        second = world.World(96, 96, vectorized=vectorized, seed=42)
+        assert first._terrain == second._terrain
+        assert first.hero_location == second.hero_location
+
+
 def test_create_junction_grid():
     grid = world._create_junction_grid(40, 45, 20)
     assert len(grid) == 2
@@ -168,3 +417,87 @@ def test_position_hero():
     for _ in xrange(1, 100):
         hero_location = sut._position_hero()
         assert hero_location.distance_to(sut.generator_location) > 50
+
+
+def test_plan_route():
+    """Test that a planned route walks to the goal."""
+    sut = world.World(80, 80)
+    start = sut.hero_location
+    goal = sut.random_free_location()
+    route = sut.plan_route(start, goal)
+    if route is None:
+        return  # The goal is walled off.
+    assert route[-1] == goal
+    for here, there in zip([start] + route, route):
+        assert max(abs(here.row - there.row),
+                   abs(here.col - there.col)) == 1
+        assert sut.cell(there).walkable
+    assert sut.plan_route(start, start) == []
+
+
+def test_find_path():
+    """Test that a found path walks to the goal and keeps in range."""
+    sut = world.World(80, 80)
+    start = sut.hero_location
+    goal = sut.random_free_location()
+    path = sut.find_path(start, goal)
+    if path is not None:
+        assert path[-1] == goal
+        for here, there in zip([start] + path, path):
+            assert max(abs(here.row - there.row),
+                       abs(here.col - there.col)) == 1
+            assert sut.cell(there).walkable
+    for loc in sut.find_path(start, start.offset(3, 3), radius=3) or []:
+        assert max(abs(loc.row - start.row), abs(loc.col - start.col)) <= 3
+
+
+def test_catch_up_keeps_to_walks():
+    """Test that a woken monster is never moved somewhere it could not have
+    walked to."""
+    with mock.patch.object(world.the, 'turn') as turn:
+        turn.current_turn = 0
+        sut = world.World(80, 80)
+        monster = mock.Mock()
+        while not sut.attempt_to_place_monster(monster):
+            pass
+        start = monster.loc
+        for delta_row in xrange(-1, 2):
+            for delta_col in xrange(-1, 2):
+                row = start.row + delta_row
+                col = start.col + delta_col
+                if (delta_row or delta_col) and \
+                        0 <= row < sut.rows and 0 <= col < sut.cols:
+                    sut._set_terrain(row, col, tile.make_wall())
+        for _ in xrange(50):
+            sut._catch_up(monster, 1000)
+            assert monster.loc == start
+
+
+def test_parked_monsters_wake():
+    """Test that parked monsters are woken where they might have wandered to
+    when the hero comes near."""
+    with mock.patch.object(world.the, 'turn') as turn:
+        turn.current_turn = 0
+        sut = world.World(80, 80)
+        monster = mock.Mock()
+        while not sut.attempt_to_place_monster(monster):
+            pass
+        distance = int(math.sqrt(monster.loc.distance_squared_to(
+            sut.hero_location)))
+        sut.park(monster)
+        assert monster in sut.dormant
+        # Parked monsters are found where they are by the creature index.
+        assert sut.creature_index.location_of(monster) == monster.loc
+        turn.reset_mock()
+        sut.wake_radius = distance - 1
+        sut.change_hero_loc(sut.hero_location)
+        assert monster in sut.dormant
+        assert not turn.add_actor.called
+        turn.current_turn = 600
+        sut.wake_radius = distance + 1
+        sut.change_hero_loc(sut.hero_location)
+        assert monster not in sut.dormant
+        turn.add_actor.assert_called_once_with(monster, mock.ANY)
+        assert sut.cell(monster.loc).creature is monster
+        assert sut.creature_index.location_of(monster) == monster.loc
+        _check_sampling_sets(sut)
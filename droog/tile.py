@@ -17,77 +17,214 @@
 
 """Droog - Tile
 
-This module provides the Tile class representing map tiles and various factory
-functions to create different types of tiles.
+This module provides the TileType class describing each kind of terrain, the
+registry of tile types, the Tile class that presents a single map cell and
+various factory functions to get the different types of tiles.
 """
 
 
+class TileType(object):
+    """An immutable kind of terrain.
+
+    Each kind of terrain is registered once and the same TileType is shared by
+    every cell of the map that has it. Cells store only the type's code."""
+
+    __slots__ = ('code', 'name', 'glyph', 'description', 'walkable', 'indoor',
+                 'color')
+
+    def __init__(self, code, name, glyph, description, walkable, indoor,
+                 color=0):
+        for attribute, value in (('code', code), ('name', name),
+                                 ('glyph', glyph),
+                                 ('description', description),
+                                 ('walkable', walkable), ('indoor', indoor),
+                                 ('color', color)):
+            object.__setattr__(self, attribute, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TileType %s is immutable." % self.name)
+
+    def __reduce__(self):
+        """Unpickle to the registered instance rather than a copy."""
+        return (tile_type, (self.name,))
+
+    def __repr__(self):
+        return "<TileType %s>" % self.name
+
+    @property
+    def transparent(self):
+        """Returns True if the terrain does not block line of sight."""
+        return self.walkable
+
+
+# The registry of tile types, indexed by code. The world stores codes in a
+# bytearray, so there may be at most 256 of them.
+TILE_TYPES = []
+_TILE_TYPES_BY_NAME = {}
+
+# Per-code attribute tables, kept in step with the registry for the world's
+# hot paths.
+GLYPHS = []
+WALKABLE = []
+TRANSPARENT = []
+INDOOR = []
+
+
+def register(name, glyph, description, walkable, indoor, color=0):
+    """Register a kind of terrain and return its TileType.
+
+    Registering a name a second time returns the existing TileType."""
+    if name in _TILE_TYPES_BY_NAME:
+        return _TILE_TYPES_BY_NAME[name]
+    code = len(TILE_TYPES)
+    assert code < 256, "Too many tile types."
+    new_type = TileType(code, name, glyph, description, walkable, indoor,
+                        color)
+    TILE_TYPES.append(new_type)
+    _TILE_TYPES_BY_NAME[name] = new_type
+    GLYPHS.append(glyph)
+    WALKABLE.append(walkable)
+    TRANSPARENT.append(new_type.transparent)
+    INDOOR.append(indoor)
+    return new_type
+
+
+def tile_type(name):
+    """Look up a registered TileType by name."""
+    return _TILE_TYPES_BY_NAME[name]
+
+
+EMPTY = register('empty', '.', "open space", True, False)
+STREET = register('street', '*', "a street", True, False)
+SHIELD = register('shield', '~', "the shield", False, False)
+SHIELD_GENERATOR = register('shield generator', 'G', "the shield generator",
+                            False, False)
+TREE = register('tree', '%', "a tree", False, False, color=2)
+WALL = register('wall', '#', "a wall", False, False)
+FLOOR = register('floor', ',', "a floor", True, True)
+
+
 class Tile(object):
-    """Representation of a map tile."""
-    def __init__(self, glyph, description, walkable, indoor, color=0):
-        self.glyph = glyph
-        self.color = color
-        self.description = description
-        self._walkable = walkable
-        self.creature = None
-        self.items = []
-        self._seen = False
-        self.was_seen = False
-        self.indoor = indoor
+    """Representation of a map tile.
+
+    A Tile does not store anything itself; it is a view onto one cell of the
+    world's terrain grid, flag planes, creatures and items."""
+
+    __slots__ = ('_world', '_index')
+
+    def __init__(self, world, index):
+        self._world = world
+        self._index = index
+
+    @property
+    def type(self):
+        """The TileType of this tile's terrain."""
+        return TILE_TYPES[self._world._terrain[self._index]]
+
+    @property
+    def code(self):
+        """The terrain code of this tile."""
+        return self._world._terrain[self._index]
+
+    @property
+    def glyph(self):
+        """The glyph of the tile's terrain."""
+        return self.type.glyph
+
+    @property
+    def color(self):
+        """The color of the tile's terrain."""
+        return self.type.color
+
+    @property
+    def description(self):
+        """The description of the tile's terrain."""
+        return self.type.description
+
+    @property
+    def indoor(self):
+        """Returns True if the tile is indoors."""
+        return self.type.indoor
+
+    @property
+    def creature(self):
+        """The creature standing on this tile, or None."""
+        return self._world._creatures.get(self._index)
+
+    @creature.setter
+    def creature(self, creature):
+        """Place a creature on this tile, or clear it with None."""
+        self._world._set_creature(self._index, creature)
+
+    @property
+    def items(self):
+        """The list of items lying on this tile. Add items with
+        World.add_item, as an empty tile keeps no list to add to."""
+        return self._world._items.get(self._index, [])
 
     @property
     def seen(self):
-        """Seen property getter, to support setter behavior."""
-        return self._seen
+        """Returns True if the tile is currently being seen."""
+        return bool(self._world._seen[self._index])
 
     @seen.setter
     def seen(self, seen):
         """Set this tile to currently being seen, which also will set its
         was_seen for fog of war purposes."""
-        self._seen = seen
+        self._world._seen[self._index] = seen
         if seen:
-            self.was_seen = True
+            self._world._was_seen[self._index] = True
+
+    @property
+    def was_seen(self):
+        """Returns True if the tile has ever been seen."""
+        return bool(self._world._was_seen[self._index])
+
+    @was_seen.setter
+    def was_seen(self, was_seen):
+        """Set whether the tile has ever been seen."""
+        self._world._was_seen[self._index] = was_seen
 
     @property
     def walkable(self):
         """Returns True if the tile can be traversed by walking."""
-        return self._walkable and not self.creature
+        return self.type.walkable and not self.creature
 
     @property
     def transparent(self):
-        return self._walkable
+        return self.type.transparent
 
 
 def make_street():
-    """Factory function to create a street tile."""
-    return Tile('*', "a street", True, False)
+    """Factory function to get the street tile type."""
+    return STREET
 
 
 def make_empty():
-    """Factory function to create an empty tile."""
-    return Tile('.', "open space", True, False)
+    """Factory function to get the empty tile type."""
+    return EMPTY
 
 
 def make_shield():
-    """Factory function to create a shield tile."""
-    return Tile('~', "the shield", False, False)
+    """Factory function to get the shield tile type."""
+    return SHIELD
 
 
 def make_shield_generator():
-    """Factory function to create a shield generator tile."""
-    return Tile('G', "the shield generator", False, False)
+    """Factory function to get the shield generator tile type."""
+    return SHIELD_GENERATOR
 
 
 def make_tree():
-    """Create a tree tile."""
-    return Tile('%', "a tree", False, False, color=2)
+    """Get the tree tile type."""
+    return TREE
 
 
 def make_wall():
-    """Create a wall tile."""
-    return Tile('#', "a wall", False, False)
+    """Get the wall tile type."""
+    return WALL
 
 
 def make_floor():
-    """Create a floor tile."""
-    return Tile(',', "a floor", True, True)
+    """Get the floor tile type."""
+    return FLOOR
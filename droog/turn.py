@@ -16,57 +16,255 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 """Droog - Turn"""
-import datetime
+import collections
+import heapq
 import logging
 import sys
 import the
-import heapq
 
 LOG = logging.getLogger(__name__)
 SECONDS_PER_TURN = 1
+# The clock starts at 07:00:00 and wraps around at midnight.
+START_SECONDS = 7 * 60 * 60
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+# Entries are ordered by a single number, the tick shifted left by this many
+# bits plus the number of actors put in so far.
+_TICK_SHIFT = 40
+# The number of ticks in the span of a TimingWheel's near wheel.
+WHEEL_SIZE = 256
 
 
 class PriorityQueue(object):
-    """PriorityQueue implementation that can reorder elements."""
+    """PriorityQueue implementation that can reorder elements.
+
+    The queue is a binary heap of [key, actor] entries, ordered by tick and
+    then by the order the actors were put in. The position of each actor's
+    entry in the heap is kept, so an actor can be rescheduled or removed in
+    place, and the heap only ever holds the queued actors."""
 
     def __init__(self):
         self._heap = []
+        self._positions = {}
+        self._count = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, actor):
+        return actor in self._positions
+
+    def get(self):
+        """Get the next actor in the queue."""
+        if not self._heap:
+            raise KeyError('Get from an empty priority queue.')
+        actor = self._heap[0][1]
+        self._remove_at(0)
+        return actor
+
+    def peek(self):
+        """Return the (tick, actor) of the next actor in the queue without
+        taking it out, or None if the queue is empty."""
+        if not self._heap:
+            return None
+        key, actor = self._heap[0]
+        return key >> _TICK_SHIFT, actor
+
+    def put(self, actor, tick=0):
+        """Add actor to the queue at the specified tick, after the actors
+        already queued at that tick. An actor already in the queue is moved
+        to the new tick."""
+        self._count += 1
+        key = (tick << _TICK_SHIFT) + self._count
+        position = self._positions.get(actor)
+        if position is None:
+            self._heap.append([key, actor])
+            self._sift_up(len(self._heap) - 1)
+        elif key < self._heap[position][0]:
+            self._heap[position][0] = key
+            self._sift_up(position)
+        else:
+            self._heap[position][0] = key
+            self._sift_down(position)
+
+    def remove(self, actor):
+        """Take an actor out of the queue."""
+        self._remove_at(self._positions[actor])
+
+    def when(self, actor):
+        """Return the tick an actor is queued at."""
+        return self._heap[self._positions[actor]][0] >> _TICK_SHIFT
+
+    def _remove_at(self, position):
+        """Take the entry at a position out of the heap."""
+        heap = self._heap
+        del self._positions[heap[position][1]]
+        last = heap.pop()
+        if position == len(heap):
+            return
+        heap[position] = last
+        if position > 0 and last[0] < heap[(position - 1) >> 1][0]:
+            self._sift_up(position)
+        else:
+            self._sift_down(position)
+
+    def _sift_up(self, position):
+        """Move the entry at a position up the heap to where it belongs."""
+        heap, positions = self._heap, self._positions
+        entry = heap[position]
+        key = entry[0]
+        while position > 0:
+            parent = (position - 1) >> 1
+            parent_entry = heap[parent]
+            if parent_entry[0] < key:
+                break
+            heap[position] = parent_entry
+            positions[parent_entry[1]] = position
+            position = parent
+        heap[position] = entry
+        positions[entry[1]] = position
+
+    def _sift_down(self, position):
+        """Move the entry at a position down the heap to where it belongs."""
+        heap, positions = self._heap, self._positions
+        size = len(heap)
+        entry = heap[position]
+        key = entry[0]
+        child = 2 * position + 1
+        while child < size:
+            child_entry = heap[child]
+            if child + 1 < size and heap[child + 1][0] < child_entry[0]:
+                child += 1
+                child_entry = heap[child]
+            if key < child_entry[0]:
+                break
+            heap[position] = child_entry
+            positions[child_entry[1]] = position
+            position = child
+            child = 2 * position + 1
+        heap[position] = entry
+        positions[entry[1]] = position
+
+
+class TimingWheel(object):
+    """A turn queue with the same interface as PriorityQueue, for whole
+    number ticks.
+
+    The actors due in the current span of WHEEL_SIZE ticks are kept in a
+    wheel of first-in first-out slots, one for each tick, so putting an
+    actor in and getting the next one out take constant time. Actors due in
+    later spans wait in an overflow wheel holding a list for each span, and
+    are moved into the near wheel, in the order they were put in, when their
+    span comes up. Actors put in at a tick the wheel has already passed wait
+    in a small heap and come out first.
+
+    The live entry of each queued actor is kept by actor. The old entry of an
+    actor that was moved or removed is left where it is, and dropped when
+    the wheel reaches it."""
+
+    def __init__(self):
+        self._slots = [collections.deque() for _ in xrange(WHEEL_SIZE)]
+        self._later = {}
+        self._late = []
         self._entries = {}
-        self._REMOVED = None
+        self._tick = 0
         self._count = 0
 
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, actor):
+        return actor in self._entries
+
     def get(self):
         """Get the next actor in the queue."""
-        while self._heap:
-            tick, count, actor = heapq.heappop(self._heap)
-            if actor is not self._REMOVED:
-                del self._entries[actor]
-                return actor
-        raise KeyError('Get from an empty priority queue.')
+        head = self._head()
+        if head is None:
+            raise KeyError('Get from an empty timing wheel.')
+        _, actor, entries = head
+        if entries is self._late:
+            heapq.heappop(entries)
+        else:
+            entries.popleft()
+        del self._entries[actor]
+        return actor
+
+    def peek(self):
+        """Return the (tick, actor) of the next actor in the queue without
+        taking it out, or None if the queue is empty."""
+        head = self._head()
+        if head is None:
+            return None
+        return head[:2]
 
     def put(self, actor, tick=0):
-        """Add actor to the queue at the specified tick."""
-        if actor in self._entries:
-            self._remove(actor)
+        """Add actor to the queue at the specified tick, after the actors
+        already queued at that tick. An actor already in the queue is moved
+        to the new tick."""
         self._count += 1
-        entry = [tick, self._count, actor]
-        self._entries[actor] = entry
-        heapq.heappush(self._heap, entry)
+        count = self._count
+        self._entries[actor] = (tick, count)
+        if tick < self._tick:
+            heapq.heappush(self._late, (tick, count, actor))
+        elif tick // WHEEL_SIZE == self._tick // WHEEL_SIZE:
+            self._slots[tick % WHEEL_SIZE].append((count, actor))
+        else:
+            self._later.setdefault(tick // WHEEL_SIZE, []).append(
+                (tick, count, actor))
 
-    def _remove(self, actor):
-        """Mark an entry in the queue as removed."""
-        entry = self._entries.pop(actor)
-        entry[-1] = self._REMOVED
+    def remove(self, actor):
+        """Take an actor out of the queue."""
+        del self._entries[actor]
 
     def when(self, actor):
-        """Return the tick count of an actor, or 0 if not found."""
-        return self._entries[actor][1]
+        """Return the tick an actor is queued at."""
+        return self._entries[actor][0]
+
+    def _head(self):
+        """Return the (tick, actor, entries) of the next live entry, where
+        entries is the heap or slot holding it at the front, dropping the old
+        entries before it, or None if the queue is empty."""
+        live = self._entries
+        if not live:
+            return None
+        late = self._late
+        while late:
+            tick, count, actor = late[0]
+            if live.get(actor) == (tick, count):
+                return tick, actor, late
+            heapq.heappop(late)
+        while True:
+            slot = self._slots[self._tick % WHEEL_SIZE]
+            while slot:
+                count, actor = slot[0]
+                if live.get(actor) == (self._tick, count):
+                    return self._tick, actor, slot
+                slot.popleft()
+            self._advance()
+
+    def _advance(self):
+        """Move the near wheel on to the next tick, filling it from the
+        overflow wheel when it starts a new span."""
+        self._tick += 1
+        if self._tick % WHEEL_SIZE:
+            return
+        later = self._later
+        span = self._tick // WHEEL_SIZE
+        if span not in later and later:
+            # Skip straight over the spans nothing is due in.
+            span = min(later)
+            self._tick = span * WHEEL_SIZE
+        live, slots = self._entries, self._slots
+        for tick, count, actor in later.pop(span, ()):
+            if live.get(actor) == (tick, count):
+                slots[tick % WHEEL_SIZE].append((count, actor))
 
 
 class Turn(object):
     """Tracks the current turn and in-game time."""
 
-    def __init__(self):
+    def __init__(self, queue=None):
         """Creates the turn actor queue and adds the clock to it.
 
         After initialization, the turn actor queue only has one actor: the
@@ -74,16 +272,30 @@ class Turn(object):
         clock and time will advance. We could start the clock earlier than the
         desired game start-time, or implement a no-op tick for the first tick,
         but for now we'll delibrately leave it as is.
+
+        queue -- the empty queue to keep the actors in, a PriorityQueue by
+                 default; a TimingWheel is quicker with many actors
         """
-        self._queue = PriorityQueue()
+        self._queue = PriorityQueue() if queue is None else queue
         self.current_turn = 0
-        self._current_time = datetime.datetime(100, 1, 1, 7, 0, 0)  # 07:00:00
+        # The seconds passed since the clock started, and the last time of
+        # day shown along with the seconds it was shown for.
+        self.seconds = 0
+        self._shown = (None, None)
 
     def next(self):
-        """Advances to the turn."""
+        """Advances to the turn.
+
+        If the next actor is batched, it acts together with the batched actors
+        due at the same tick after it, each taking its own turn."""
+        head = self._queue.peek()
+        batch = self._take_batch()
+        if batch:
+            self._act_batch(head[0], batch)
+            return True
 
         self.current_turn += 1
-        self._current_time += datetime.timedelta(seconds=SECONDS_PER_TURN)
+        self.seconds += SECONDS_PER_TURN
 
         actor = self._queue.get()  # Ignoring priority
         LOG.info("It is time for %r to act.", actor)
@@ -110,9 +322,70 @@ class Turn(object):
             the.world.remove_monster(actor)
         return True
 
+    def _take_batch(self):
+        """Take the batched actors at the head of the queue that can act
+        together, and return them, or an empty list if the next actor acts
+        alone."""
+        batch = []
+        head = self._queue.peek()
+        # An actor requeued by the batch must not come due before the end of
+        # it, so the batch must be due by the first of the batch's turns.
+        if head is None or head[0] > self.current_turn + 1:
+            return batch
+        tick, first = head
+        while head is not None and head[0] == tick and \
+                getattr(head[1], "batched", False) and \
+                head[1].act_batch is first.act_batch and \
+                not getattr(head[1], "is_dead", False):
+            batch.append(self._queue.get())
+            head = self._queue.peek()
+        return batch
+
+    def _act_batch(self, tick, batch):
+        """Have a batch of actors due at a tick act, each on its own turn.
+
+        Once the hero is dead, the actors of the batch yet to act are put
+        back at the tick, as if they had been left in the queue."""
+        LOG.info("It is time for a batch of %d actors to act.", len(batch))
+        for index, (actor, action) in enumerate(
+                zip(batch, batch[0].act_batch(batch))):
+            if getattr(the.hero, "is_dead", False):
+                # The game is over, so the rest of the batch does not act.
+                LOG.info("The hero died; %d actors of the batch wait.",
+                         len(batch) - index)
+                for waiting in batch[index:]:
+                    self._queue.put(waiting, tick)
+                return
+            self.current_turn += 1
+            self.seconds += SECONDS_PER_TURN
+            action_cost = action()
+            while action_cost == 0:
+                action_cost = actor.act()
+            if action_cost != actor.DONE:
+                self._queue.put(actor, self.current_turn + action_cost)
+
+    def advance(self, turns):
+        """Move the turn count and the clock on by a number of turns, without
+        any actor acting."""
+        assert turns >= 0
+        self.current_turn += turns
+        self.seconds += turns * SECONDS_PER_TURN
+
+    def next_actor(self):
+        """Return the actor due to act next, or None if there are none."""
+        head = self._queue.peek()
+        return head and head[1]
+
     def current_time(self):
-        """Return the current in-game clock."""
-        return self._current_time.time().isoformat()
+        """Return the current in-game clock, as HH:MM:SS."""
+        seconds, shown = self._shown
+        if seconds != self.seconds:
+            seconds = self.seconds
+            minutes, second = divmod((START_SECONDS + seconds) %
+                                     SECONDS_PER_DAY, 60)
+            shown = '%02d:%02d:%02d' % (divmod(minutes, 60) + (second,))
+            self._shown = (seconds, shown)
+        return shown
 
     def add_actor(self, actor, future=0):
         """Add a new actor to the end of the turn queue."""
@@ -120,6 +393,11 @@ class Turn(object):
         self._queue.put(actor, self.current_turn + future)
         LOG.info("New actor in the turn queue: %r", actor)
 
+    def remove_actor(self, actor):
+        """Take an actor out of the turn queue."""
+        self._queue.remove(actor)
+        LOG.info("Removed actor from the turn queue: %r", actor)
+
     def delay_actor(self, actor, delta):
         """Add a delay to an actor."""
         tick = self._queue.when(actor)
@@ -46,9 +46,10 @@ COLOR_MAP = {'Z': 3,
              '*': 3}
 
 
-class Curses(object):
-    """The UserInterface class manages the drawing to curses and input from the
-    user."""
+class UserInterface(object):
+    """The UserInterface class is what the game draws to and takes the
+    user's commands from. Subclasses draw to and read from somewhere in
+    particular; the screen is laid out the same way for all of them."""
 
     movements = {'h': (0, -1),   # West
                  'l': (0, 1),    # East
@@ -59,6 +60,213 @@ class Curses(object):
                  'b': (1, -1),   # Southwest
                  'n': (1, 1)}    # Southeast
 
+    # Whether the games played through this interface go in the high scores.
+    records_scores = True
+
+    def __init__(self, height, width):
+        """Lays out a screen of the given height and width.
+
+        -- the area : the map with the hero in the center, taking all of the
+                      screen but the hero column, message and status rows
+        -- the hero column : HERO_COLUMNS wide, displays the hero information
+        -- the message rows : full width, displays messages
+        -- the status rows : full width, displays the time and status
+        """
+        self.height = height
+        self.width = width
+        # Calculate the area window size (it should be the biggest)
+        self.area_width = self.width - HERO_COLUMNS - 1
+        self.area_height = self.height - MESSAGE_ROWS - STATUS_ROWS - 1
+        LOG.info('Area window has %r width and %r height', self.area_width,
+                 self.area_height)
+        self.status = ""
+
+        # The hero will always be present in the center.
+        self.hero_x_offset = self.area_width / 2
+        self.hero_y_offset = self.area_height / 2
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        pass
+
+    def map_bounds(self, world):
+        """Calculate world coordinates visible in the UI area.
+
+        Return the left and right limit of the x-axis and top and bottom
+        limit of the y-axis of the world-coordinates visible in the area
+        window.
+
+        The coorindates are returned as a tuple of (left, right, top, bottom).
+
+        The calculation is based on the hero's location.
+        """
+        hero_col = world.hero_location.col
+        hero_row = world.hero_location.row
+        left = hero_col - self.hero_x_offset
+        right = hero_col + self.hero_x_offset
+        top = hero_row - self.hero_y_offset
+        bottom = hero_row + self.hero_y_offset
+
+        LOG.debug("Calculated map bounds for hero (col=%d, row=%d):",
+                  hero_col, hero_row)
+        LOG.debug("Hero X offset: %d  Hero Y offset %d", self.hero_x_offset,
+                  self.hero_y_offset)
+        LOG.debug("Left = %d, Right = %d, Top = %d, Bottom = %d", left, right,
+                  top, bottom)
+        return (left, right, top, bottom)
+
+    def area_bounds(self, world):
+        """Return the (left, right, top, bottom) of the cells drawn in the
+        area, the same as map_bounds() but with the right and bottom limits
+        exclusive."""
+        (left, right, top, bottom) = self.map_bounds(world)
+
+        # If the area is an odd height and/or width we want to add one to the
+        # bottom and/or right to prevent a gutter of undrawn map.
+        if not self.area_width % 2 == 0:
+            right += 1
+        if not self.area_height % 2 == 0:
+            bottom += 1
+        return (left, right, top, bottom)
+
+    def area_cells(self, world, row, left, right):
+        """Return the list of glyphs of the cells of a map row from column
+        left up to right, and a list of how well each cell is known, as
+        World.view_row() returns them. Cells that have never been seen, and
+        cells off the map, are blank and unknown."""
+        first = max(left, 0)
+        last = min(right, world.cols)
+        if not 0 <= row < world.rows or first >= last:
+            return [' '] * (right - left), [0] * (right - left)
+        glyphs, known = world.view_row(row, first, last)
+        for offset, how_well in enumerate(known):
+            if not how_well:
+                glyphs[offset] = ' '
+        return ([' '] * (first - left) + glyphs + [' '] * (right - last),
+                [0] * (first - left) + known + [0] * (right - last))
+
+    def draw_area(self, world, update=True):
+        """Draws an area of the world around the hero.
+
+        update -- whether to show the drawing now, or with the next call to
+                  update()
+        """
+        raise NotImplementedError
+
+    def update(self):
+        """Show everything drawn so far that is not shown yet."""
+        pass
+
+    def draw_status(self, message=None, time=None):
+        """Draw the time and a status message that lasts until the next
+        input."""
+        raise NotImplementedError
+
+    def draw_hero(self, hero, world):
+        """Draws the hero information and the visible targets."""
+        raise NotImplementedError
+
+    def draw_messages(self, messages):
+        """Draws the most recent messages in the message log."""
+        raise NotImplementedError
+
+    def input(self):
+        """Returns the next character the user types."""
+        raise NotImplementedError
+
+    def look(self, world):
+        """Let the user look around the map with the movement keys."""
+        raise NotImplementedError
+
+    def target(self, hero, world):
+        """Let the user pick a visible monster, and return it, or None."""
+        raise NotImplementedError
+
+    def help(self):
+        """Display the help screen."""
+        raise NotImplementedError
+
+    def history(self, messages):
+        """Display the message history."""
+        raise NotImplementedError
+
+    def story_screen(self, story):
+        """Display a story screen."""
+        raise NotImplementedError
+
+    def score_screen(self, time_score, map_score, kill_score, victory_score):
+        """Display the score screen."""
+        raise NotImplementedError
+
+    def record_screen(self, high_scores):
+        """Display a list of high score records."""
+        raise NotImplementedError
+
+    def character_creation(self, story, attribs, weapons, gears):
+        """Perform character creation with a given story, and return the
+        (attribute, weapon, inventory) picked, or (None, None, None) if the
+        user quit."""
+        raise NotImplementedError
+
+    def redraw(self):
+        """Redraw everything."""
+        raise NotImplementedError
+
+    def drop(self, hero, world):
+        """Drop an item."""
+        self.draw_status(message="Drop what?")
+        alpha = self.input()
+        index = alpha_to_index(alpha)
+        item = hero.inventory.pop(index)
+        world.add_item(world.hero_location, item)
+
+    def wield(self, hero):
+        """Equip an item."""
+        self.draw_status(message="Wield what? '-' for nothing.")
+        alpha = self.input()
+        old_weapon = hero.weapon
+        if alpha == '-':
+            hero.wield(None)
+        else:
+            index = alpha_to_index(alpha)
+            item = hero.inventory.pop(index)
+            hero.wield(item)
+        if not old_weapon.virtual:
+            hero.inventory.append(old_weapon)
+
+    def pickup(self, hero, world):
+        """Pickup the item at the hero's feet."""
+        item = world.get_item(world.hero_location)
+        if item:
+            hero.inventory.append(item)
+
+    def wizard(self, world):
+        """Parses a wizard command."""
+        self.draw_status(message="What doest thou want, wizard?")
+        command = self.input()
+        if command == 's':
+            self.draw_status(message="Summon what?")
+            monster = creature.create_from_glyph(self.input())
+            if not monster:
+                self.draw_status("I know not how to spawn a %s, wizard." %
+                                 monster)
+            LOG.info("Spawning a %r near the hero.", monster)
+            if not world.attempt_to_place_monster(monster,
+                                                  near=world.hero_location):
+                self.draw_status("There wasn't room.")
+        if command == 't':
+            self.draw_status(message="Teleport where?")
+            location = self.input()
+            if location == 'g':
+                world.teleport_hero(world.generator_location)
+
+
+class Curses(UserInterface):
+    """The Curses user interface draws to a terminal with curses and takes
+    input from its keyboard."""
+
     def __init__(self):
         """Initializes the rendering environment.
 
@@ -83,23 +291,17 @@ class Curses(object):
         self.build_palette()
 
         # Our screen size
-        self.height, self.width = self.main_window.getmaxyx()
-        LOG.info('Main window has %r width and %r height', self.width,
-                 self.height)
+        height, width = self.main_window.getmaxyx()
+        LOG.info('Main window has %r width and %r height', width, height)
 
         # Ensure that our screen size is at least the minimum required
-        if self.width < MINIMUM_WIDTH or self.height < MINIMUM_HEIGHT:
+        if width < MINIMUM_WIDTH or height < MINIMUM_HEIGHT:
             shutdown()
             print 'ERROR: Terminal window too small.'
             print 'Minimum width: %r' % MINIMUM_WIDTH
             print 'Minimum height: %r' % MINIMUM_HEIGHT
             sys.exit(1)
-
-        # Calculate the area window size (it should be the biggest)
-        self.area_width = self.width - HERO_COLUMNS - 1
-        self.area_height = self.height - MESSAGE_ROWS - STATUS_ROWS - 1
-        LOG.info('Area window has %r width and %r height', self.area_width,
-                 self.area_height)
+        UserInterface.__init__(self, height, width)
 
         # We make the area_window actually be one column larger than necessary
         # because curses will throw an error if we write to the
@@ -123,11 +325,17 @@ class Curses(object):
                                                    self.width,
                                                    self.area_height + 1 +
                                                    MESSAGE_ROWS, 0)
-        self.status = ""
 
-        # The hero will always be present in the center.
-        self.hero_x_offset = self.area_width / 2
-        self.hero_y_offset = self.area_height / 2
+        # The (glyphs, attributes) of each row of the area window as it was
+        # last drawn, and the attributes of the glyphs in view.
+        self._frame = None
+        self._glyph_attrs = {}
+        # What the side panels last showed, so that they are only drawn again
+        # when it changes; None when they must be drawn.
+        self._hero_shown = None
+        self._targets_shown = None
+        self._status_shown = None
+        self._status_time = None
 
         self.main_window.refresh()
 
@@ -143,9 +351,6 @@ class Curses(object):
 
         self.main_window.refresh()
 
-    def __enter__(self):
-        return self
-
     def __exit__(self, exception_type, exception_value, traceback):
         shutdown()
 
@@ -167,64 +372,53 @@ class Curses(object):
         LOG.warning("No known color for '%r' glyph.", glyph)
         return curses.color_pair(0)
 
-    def map_bounds(self, world):
-        """Calculate world coordinates visible in the UI area.
-
-        Return the left and right limit of the x-axis and top and bottom
-        limit of the y-axis of the world-coordinates visible in the area
-        window.
+    def draw_area(self, world, update=True):
+        """Draws an area of the world onto the renderer's area window.
 
-        The coorindates are returned as a tuple of (left, right, top, bottom).
+        The last frame drawn is kept, and only the runs of cells that changed
+        since then are written to the window.
 
-        The calculation is based on the hero's location.
+        update -- whether to update the terminal now; without it, the window
+                  is updated along with the next window refreshed
         """
-        hero_col = world.hero_location.col
-        hero_row = world.hero_location.row
-        left = hero_col - self.hero_x_offset
-        right = hero_col + self.hero_x_offset
-        top = hero_row - self.hero_y_offset
-        bottom = hero_row + self.hero_y_offset
-
-        LOG.debug("Calculated map bounds for hero (col=%d, row=%d):",
-                  hero_col, hero_row)
-        LOG.debug("Hero X offset: %d  Hero Y offset %d", self.hero_x_offset,
-                  self.hero_y_offset)
-        LOG.debug("Left = %d, Right = %d, Top = %d, Bottom = %d", left, right,
-                  top, bottom)
-        return (left, right, top, bottom)
-
-    def draw_area(self, world):
-        """Draws an area of the world onto the renderer's area window."""
-        (left, right, top, bottom) = self.map_bounds(world)
-
-        # If the area is an odd height and/or width we want to add one to the
-        # bottom and/or right to prevent a gutter of undrawn map.
-        if not self.area_width % 2 == 0:
-            right += 1
-        if not self.area_height % 2 == 0:
-            bottom += 1
-
-        for y in range(top, bottom):
-            for x in range(left, right):
-                loc = _world.Location(y, x)
-                if not world.is_valid_location(loc):
-                    continue
-                glyph = world.glyph_at(loc)
-                if world.cell(loc).seen:
-                    self.area_window.addstr(y - top, x - left,
-                                            glyph, self.glyph_color(glyph))
-                elif world.cell(loc).was_seen:
-                    self.area_window.addstr(y - top, x - left,
-                                            glyph, curses.color_pair(0))
-                else:
-                    self.area_window.addstr(y - top, x - left, ' ')
-
-        # The hero is drawn in the center last so we can always see him or
-        # her. The curses is then placed on top of the hero for visual
-        # distinction.
-        self.area_window.addstr(self.hero_y_offset, self.hero_x_offset,
-                                '@', curses.A_REVERSE)
-        self.area_window.refresh()
+        (left, right, top, bottom) = self.area_bounds(world)
+        if self._frame is None or len(self._frame) != bottom - top:
+            self._frame = [None] * (bottom - top)
+        for y in xrange(bottom - top):
+            glyphs, attrs = self._area_row(world, top + y, left, right)
+            # The hero is drawn in the center so we can always see him or
+            # her, in reverse for visual distinction.
+            if y == self.hero_y_offset:
+                glyphs[self.hero_x_offset] = '@'
+                attrs[self.hero_x_offset] = curses.A_REVERSE
+            old_glyphs, old_attrs = self._frame[y] or ([None] * len(glyphs),
+                                                       [None] * len(attrs))
+            for start, end in changed_runs(old_glyphs, old_attrs, glyphs,
+                                           attrs):
+                self.area_window.addstr(y, start, ''.join(glyphs[start:end]),
+                                        attrs[start])
+            self._frame[y] = (glyphs, attrs)
+        self.area_window.noutrefresh()
+        if update:
+            curses.doupdate()
+
+    def _area_row(self, world, row, left, right):
+        """Return the lists of glyphs and attributes of the cells of a map row
+        from column left up to right."""
+        glyphs, known = self.area_cells(world, row, left, right)
+        remembered = curses.color_pair(0)
+        attrs = []
+        for glyph, how_well in zip(glyphs, known):
+            if how_well == 2:
+                attr = self._glyph_attrs.get(glyph)
+                if attr is None:
+                    attr = self._glyph_attrs[glyph] = self.glyph_color(glyph)
+                attrs.append(attr)
+            elif how_well:
+                attrs.append(remembered)
+            else:
+                attrs.append(0)
+        return glyphs, attrs
 
     def draw_status(self, message=None, time=None):
         """Draw a status message.
@@ -239,16 +433,50 @@ class Curses(object):
 
         """
         if time:
-            self.status_line.addstr(0, 0, time)
+            self._status_time = time
         if message or message == "":
             self.status = message
+        if self._status_shown == (self._status_time, self.status):
+            return
+        self._status_shown = (self._status_time, self.status)
+        if time:
+            self.status_line.addstr(0, 0, time)
         self.status_line.addstr(0, 10, self.status)
         self.status_line.clrtoeol()
-        self.status_line.refresh()
+        self.status_line.noutrefresh()
+        curses.doupdate()
+
+    def update(self):
+        """Update the terminal with every window drawn but not shown."""
+        curses.doupdate()
 
     def draw_hero(self, hero, world):
         """Draws the hero information window. Does not draw the actual @
-        symbol on the map; that is handled by draw_area."""
+        symbol on the map; that is handled by draw_area.
+
+        The hero's details and the targets are each only drawn again when
+        what they show has changed."""
+        hero_shown = (hero.name, hero.strength, hero.dexterity,
+                      hero.constitution, hero.is_wounded, hero.is_stunned,
+                      hero.is_diseased, _item_shown(hero.weapon),
+                      [_item_shown(item) for item in hero.inventory])
+        targets = world.visible_monsters
+        if hero_shown != self._hero_shown:
+            self._hero_shown = hero_shown
+            self._draw_hero_details(hero)
+        elif targets != self._targets_shown:
+            for row in xrange(self.target_toprow, self.area_height):
+                self.hero_window.move(row, 0)
+                self.hero_window.clrtoeol()
+        else:
+            return
+        self._targets_shown = targets
+        self.draw_targets(targets, self.target_toprow)
+        self.hero_window.refresh()
+
+    def _draw_hero_details(self, hero):
+        """Draw the hero's name, conditions, equipment and inventory on a
+        cleared hero window."""
         self.hero_window.clear()
         stats = english.epithet(hero.strength, hero.dexterity,
                                 hero.constitution)
@@ -265,8 +493,6 @@ class Curses(object):
         index = self.draw_equipment(hero.weapon, None, index + 1)
         index = self.draw_inventory(hero.inventory, index + 1)
         self.target_toprow = index + 1
-        index = self.draw_targets(world.visible_monsters, self.target_toprow)
-        self.hero_window.refresh()
 
     def draw_conditions(self, hero, index):
         """Draw the hero's conditions."""
@@ -376,7 +602,8 @@ class Curses(object):
             x += delta_x
             if y >= 0 and y < max_y and x >= 0 and x < max_x - 1:
                 LOG.info("Highlighting %r, %r.", y, x)
-                description = world.description_at(Location(y + top, x + left))
+                description = world.description_at(
+                    _world.Location(y + top, x + left))
                 self.draw_status("You see here %s." % description)
                 self.area_window.move(y, x)
                 self.area_window.refresh()
@@ -401,6 +628,7 @@ class Curses(object):
         command = 1
         while command != ord(' '):
             if command == 27:
+                self._targets_shown = None
                 return None
             if command == ord('\t'):
                 select += 1
@@ -410,6 +638,8 @@ class Curses(object):
                               select)
             self.hero_window.refresh()
             command = self.main_window.getch()
+        # The targets are drawn again without the selection next time.
+        self._targets_shown = None
         self.draw_status(message="")
         return world.visible_monsters[select]
 
@@ -421,54 +651,6 @@ class Curses(object):
             return ' '
         return chr(key)
 
-    def drop(self, hero, world):
-        """Drop an item."""
-        self.draw_status(message="Drop what?")
-        alpha = self.input()
-        index = alpha_to_index(alpha)
-        item = hero.inventory.pop(index)
-        world.add_item(world.hero_location, item)
-
-    def wield(self, hero):
-        """Equip an item."""
-        self.draw_status(message="Wield what? '-' for nothing.")
-        alpha = self.input()
-        old_weapon = hero.weapon
-        if alpha == '-':
-            hero.wield(None)
-        else:
-            index = alpha_to_index(alpha)
-            item = hero.inventory.pop(index)
-            hero.wield(item)
-        if not old_weapon.virtual:
-            hero.inventory.append(old_weapon)
-
-    def pickup(self, hero, world):
-        """Pickup the item at the hero's feet."""
-        item = world.get_item(world.hero_location)
-        if item:
-            hero.inventory.append(item)
-
-    def wizard(self, world):
-        """Parses a wizard command."""
-        self.draw_status(message="What doest thou want, wizard?")
-        command = self.input()
-        if command == 's':
-            self.draw_status(message="Summon what?")
-            monster = creature.create_from_glyph(self.input())
-            if not monster:
-                self.draw_status("I know not how to spawn a %s, wizard." %
-                                 monster)
-            LOG.info("Spawning a %r near the hero.", monster)
-            if not world.attempt_to_place_monster(monster,
-                                                  near=world.hero_location):
-                self.draw_status("There wasn't room.")
-        if command == 't':
-            self.draw_status(message="Teleport where?")
-            location = self.input()
-            if location == 'g':
-                world.teleport_hero(world.generator_location)
-
     def help(self):
         """Display the help screen."""
         # height, width = self.main_window.getmaxyx()
@@ -723,6 +905,230 @@ class Curses(object):
     def redraw(self):
         """Redraw the windows."""
         self.main_window.redrawwin()
+        self._frame = None
+        self._hero_shown = None
+        self._targets_shown = None
+        self._status_shown = None
+
+
+class Headless(UserInterface):
+    """The Headless user interface draws into lists of strings, or not at
+    all, and takes its input from a script of keys, so that the game can be
+    played without a terminal. Its games are not recorded in the high
+    scores."""
+
+    records_scores = False
+
+    def __init__(self, keys=(), height=MINIMUM_HEIGHT, width=MINIMUM_WIDTH,
+                 render=True):
+        """Lays out a screen without drawing it anywhere.
+
+        keys -- the characters the user types, in order; once they run out,
+                every key typed is 'q', which quits
+        render -- whether to draw into the text of the screen, or only count
+                  the frames
+        """
+        UserInterface.__init__(self, height, width)
+        self._keys = iter(keys)
+        self.render = render
+        self.frames = 0
+        # The text of each part of the screen, as last drawn.
+        self.area_rows = []
+        self.hero_lines = []
+        self.message_lines = []
+        self.status_line = ""
+        self._time = ""
+
+    def screen(self):
+        """Return the lines of text of the whole screen."""
+        lines = (self.message_lines + [''] * MESSAGE_ROWS)[:MESSAGE_ROWS]
+        lines.append('-' * self.width)
+        for row in xrange(self.area_height):
+            area_row = self.area_rows[row] if row < len(self.area_rows) \
+                else ''
+            hero_line = self.hero_lines[row] if row < len(self.hero_lines) \
+                else ''
+            lines.append('%-*s|%s' % (self.area_width, area_row, hero_line))
+        lines.append(self.status_line)
+        return [line.rstrip() for line in lines]
+
+    def draw_area(self, world, update=True):
+        """Draws an area of the world into the area rows."""
+        self.frames += 1
+        if not self.render:
+            return
+        (left, right, top, bottom) = self.area_bounds(world)
+        self.area_rows = []
+        for row in xrange(top, bottom):
+            glyphs, _ = self.area_cells(world, row, left, right)
+            if row - top == self.hero_y_offset:
+                glyphs[self.hero_x_offset] = '@'
+            self.area_rows.append(''.join(glyphs))
+
+    def draw_status(self, message=None, time=None):
+        """Draw the time and a status message into the status line."""
+        if time:
+            self._time = time
+        if message or message == "":
+            self.status = message
+        if self.render:
+            self.status_line = '%-10s%s' % (self._time, self.status)
+
+    def draw_hero(self, hero, world):
+        """Draws the hero information and the visible targets into the hero
+        lines, laid out as Curses lays them out."""
+        if not self.render:
+            return
+        stats = english.epithet(hero.strength, hero.dexterity,
+                                hero.constitution)
+        if stats:
+            hero_line = hero.name + " the " + stats
+        else:
+            hero_line = hero.name
+        lines = english.wrap(hero_line, HERO_COLUMNS)
+        for condition, name in ((hero.is_wounded, "Wounded"),
+                                (hero.is_stunned, "Stunned"),
+                                (hero.is_diseased, "Diseased")):
+            if condition:
+                lines.append("  " + name)
+        lines.append("")
+        weapon = hero.weapon
+        lines.append('W - %s' % weapon.name +
+                     (" [%d]" % weapon.ammo if weapon.ammo_capacity else ""))
+        lines.append('A - None')
+        lines.append("")
+        for item_index, item in enumerate(hero.inventory):
+            lines.append('%s - %s' % (index_to_alpha(item_index), item.name) +
+                         (" [%d]" % item.ammo if item.ammo_capacity else ""))
+        lines.append("")
+        lines.extend(english.indefinite_creature(monster)
+                     for monster in world.visible_monsters)
+        self.hero_lines = lines[:self.area_height]
+
+    def draw_messages(self, messages):
+        """Draws the most recent messages into the message lines, all at
+        once rather than a screen at a time."""
+        all_messages = ""
+        while not messages.empty():
+            all_messages += messages.get() + " "
+        if self.render:
+            self.message_lines = english.wrap(all_messages.strip(),
+                                              self.width - 1)
+
+    def input(self):
+        """Returns the next key of the script."""
+        self.status = ""
+        return next(self._keys, 'q')
+
+    def look(self, world):
+        """Take the movement keys looking around, up to the next key."""
+        command = self.input()
+        while command in self.movements:
+            command = self.input()
+
+    def target(self, hero, world):
+        """Pick a target: each tab picks the next one, a space fires at the
+        one picked and any other key gives up."""
+        if not world.visible_monsters:
+            self.draw_status(message="No visible targets!")
+            return None
+        select = 0
+        command = self.input()
+        while command == '\t':
+            select = (select + 1) % len(world.visible_monsters)
+            command = self.input()
+        self.draw_status(message="")
+        if command != ' ':
+            return None
+        return world.visible_monsters[select]
+
+    def help(self):
+        """Take the key that closes the help screen."""
+        self.input()
+
+    def history(self, messages):
+        """Take keys until the one that closes the message history."""
+        while self.input() != 'q':
+            pass
+
+    def story_screen(self, story):
+        """Take the key that closes a story screen."""
+        self.input()
+
+    def score_screen(self, time_score, map_score, kill_score, victory_score):
+        """Take the key that closes the score screen."""
+        self.input()
+
+    def record_screen(self, high_scores):
+        """Take the key that closes the high scores."""
+        self.input()
+
+    def character_creation(self, story, attribs, weapons, gears):
+        """Perform character creation, taking a key for each choice in the
+        story as Curses.character_creation() does."""
+        items = 2
+        inventory = []
+        for paragraph in story:
+            for segment in paragraph:
+                if segment == "{attrib}":
+                    attrib, _ = self._choose(attribs)
+                    if not attrib:
+                        return (None, None, None)
+                if segment == "{weapon}":
+                    weapon, items = self._choose(weapons)
+                    if not weapon:
+                        return (None, None, None)
+                if segment == "{gear}" and items:
+                    gear, _ = self._choose(gears)
+                    if not gear:
+                        return (None, None, None)
+                    inventory.append(gear)
+                    items -= 1
+        self.input()
+        return (attrib, weapon, inventory)
+
+    def _choose(self, options):
+        """Take keys until one picks an option, and return the option and
+        the number of gear choices that follow, as Curses.do_cc_menu()
+        does."""
+        valid_selections = ['%d' % (number + 1)
+                            for number in xrange(len(options))]
+        selection = 'none'
+        while selection not in valid_selections:
+            selection = self.input()
+            if selection == 'q':
+                return None, None
+        return options[int(selection) - 1], int(selection) + 1
+
+    def redraw(self):
+        """Nothing to redraw; the text is always up to date."""
+        pass
+
+
+def _item_shown(item):
+    """Return what the hero window shows of an item."""
+    return (item.name, item.ammo if item.ammo_capacity else None)
+
+
+def changed_runs(old_glyphs, old_attrs, glyphs, attrs):
+    """Return the (start, end) column ranges to write to turn one row of
+    glyphs and attributes into another, as the runs of the same attribute
+    from the first cell that changed to the last."""
+    first = 0
+    last = len(glyphs)
+    while first < last and glyphs[first] == old_glyphs[first] and \
+            attrs[first] == old_attrs[first]:
+        first += 1
+    while last > first and glyphs[last - 1] == old_glyphs[last - 1] and \
+            attrs[last - 1] == old_attrs[last - 1]:
+        last -= 1
+    runs = []
+    start = first
+    for column in xrange(first + 1, last + 1):
+        if column == last or attrs[column] != attrs[start]:
+            runs.append((start, column))
+            start = column
+    return runs
 
 
 def index_to_alpha(index):
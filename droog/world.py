@@ -23,14 +23,26 @@ Location -- A class for value objects storing coordinates in the world.
 World -- A class for reference objects of the World itself.
 """
 
+import collections
 import random
 import logging
 import math
 from . import tile
+from . import fov
+from . import mapcache
+from . import spatial
+from . import sampling
+from . import flow
+from . import pathing
 from . import engine
 from . import english
 from . import the
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 LOG = logging.getLogger(__name__)
 
 TREE_CHANCE = 0.05
@@ -39,18 +51,38 @@ ROAD_CHANCE = 0.5
 BUILDING_CHANCE = 0.42
 WALL_BREAK_CHANCE = 0.12
 
-mult = [[1, 0, 0, -1, -1, 0, 0, 1],
-        [0, 1, -1, 0, 0, -1, 1, 0],
-        [0, 1, 1, 0, 0, -1, -1, 0],
-        [1, 0, 0, 1, -1, 0, 0, -1]]
+FOV_RADIUS = 10
+# Monsters further than DORMANT_RADIUS from the hero are parked out of the
+# turn queue until the hero comes within WAKE_RADIUS of them. The gap keeps
+# monsters near the edge from being parked and woken over and over.
+DORMANT_RADIUS = 50
+WAKE_RADIUS = 40
+# The average number of ticks a wandering monster takes for each step.
+WANDER_TICKS = 3
+# A woken monster catches up on at most this many steps of wandering, which
+# keeps the search for its walk small.
+CATCH_UP_STEPS = 30
 
 
 class Location(object):
-    """The Location class represents a position on a grid."""
+    """The Location class represents a position on a grid.
+
+    Locations are immutable values: they compare and hash by their
+    coordinates, so they can be shared freely and used as keys."""
+
+    __slots__ = ('row', 'col')
+
     def __init__(self, row, col):
         """Construct a new location."""
-        self.row = row
-        self.col = col
+        _set_row(self, row)
+        _set_col(self, col)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Locations are immutable.")
+
+    def __reduce__(self):
+        """Pickle by value, since the slots cannot be set after creation."""
+        return (Location, (self.row, self.col))
 
     def offset(self, delta_row, delta_col):
         """Offset the location by a given number of rows and columns."""
@@ -58,9 +90,14 @@ class Location(object):
 
     def distance_to(self, other_loc):
         """Return the distance between another location and this one."""
-        delta_row = abs(other_loc.row - self.row)
-        delta_col = abs(other_loc.col - self.col)
-        return math.sqrt(delta_row * delta_row + delta_col * delta_col)
+        return math.sqrt(self.distance_squared_to(other_loc))
+
+    def distance_squared_to(self, other_loc):
+        """Return the square of the distance between another location and this
+        one. Compare it to a squared range to avoid the square root."""
+        delta_row = other_loc.row - self.row
+        delta_col = other_loc.col - self.col
+        return delta_row * delta_row + delta_col * delta_col
 
     def delta_to(self, other_loc):
         """Return a delta between the other_loc and this one."""
@@ -72,7 +109,7 @@ class Location(object):
             delta_col = 0
         else:
             delta_col = 1 if (other_loc.col - self.col > 0) else -1
-        return Location(delta_row, delta_col)
+        return _DELTAS[delta_row + 1][delta_col + 1]
 
     def __repr__(self):
         """Return string representation."""
@@ -80,100 +117,402 @@ class Location(object):
 
     def __eq__(self, other):
         """Return True if these have the same value."""
-        if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
-        else:
-            return False
+        return other.__class__ is Location and self.row == other.row \
+            and self.col == other.col
 
     def __ne__(self, other):
         """Return True if these do not have the same value."""
         return not self.__eq__(other)
 
+    def __hash__(self):
+        """Hash by value, consistent with __eq__."""
+        return hash((self.row, self.col))
+
+
+_set_row = Location.row.__set__
+_set_col = Location.col.__set__
+
+# All single-step deltas, indexed by [delta_row + 1][delta_col + 1].
+_DELTAS = tuple(tuple(Location(delta_row, delta_col)
+                      for delta_col in (-1, 0, 1))
+                for delta_row in (-1, 0, 1))
+_ALL_DELTAS = sum(_DELTAS, ())
+
 
 def random_delta():
     """Return a random delta."""
-    return Location(random.choice([-1, 0, 1]), random.choice([-1, 0, 1]))
+    return random.choice(_ALL_DELTAS)
 
 
 class World(object):
     """Representation of the game world."""
 
-    def __init__(self, rows, cols):
+    def __init__(self, rows, cols, vectorized=None, seed=None,
+                 cache_dir=None):
         """Creates a World of the specified width, height, number of roads and
         probability of intersection continuations.
 
         The world is a grid of streets with the hero in the center.
+
+        vectorized -- generate the map with NumPy; by default, this is done
+                      whenever NumPy is installed
+        seed -- the seed the map and the hero's starting place are generated
+                from; by default, a random one
+        cache_dir -- a directory of saved maps; the map is loaded from there
+                     if it has been generated before, and saved there if not
         """
         assert rows > 20
         assert cols > 20
+        if vectorized is None:
+            vectorized = numpy is not None
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self._random = random.Random(seed)
         self.cols = cols
         self.rows = rows
-        self.tiles = []
+        self._allocate()
+        self._create_caches()
+        # The indices of the cells currently in view, and the monsters on
+        # them in the order they came into view.
+        self._lit = set()
+        self._visible = collections.OrderedDict()
+        # The number of times a creature has come, gone or moved in view, so
+        # that a change to what the hero sees can be noticed.
+        self.view_changes = 0
+        # Creatures and items are sparse, so they are mapped by cell index.
+        self._creatures = {}
+        self._items = {}
+        # The hero and the monsters on the map, by where they are.
+        self.creature_index = spatial.SpatialHash()
+        # Maps the monsters parked out of the turn queue to the turn each was
+        # parked on. They are found by where they are in the creature index.
+        self.dormant_radius = DORMANT_RADIUS
+        self.wake_radius = WAKE_RADIUS
+        self.dormant = {}
+        # The costs of walking to the hero, worked out when first needed
+        # after the hero moves, as far as the widest range asked for.
+        self._hero_flow = None
+        self._flow_radius = 0
         self.generator = engine.Generator()
         self.generator_location = None
         # The junction grid used to make this map, for logging and debugging.
         self._junction_grid = None
 
-        for row in range(rows):
-            self.tiles.append(list())
-            for _ in range(cols):
-                self.tiles[row].append(tile.make_empty())
         self.hero_location = self._position_hero()
         self.cell(self.hero_location).creature = the.hero
-        self._generate()
+        self.creature_index.add(the.hero, self.hero_location)
+        if cache_dir is None:
+            self._generate(vectorized)
+        else:
+            map_path = mapcache.path_for(cache_dir, seed, rows, cols,
+                                         vectorized)
+            if not mapcache.load(map_path, self):
+                self._generate(vectorized)
+                mapcache.save(map_path, self)
+        self._index_locations()
         self.do_fov()
-        self.visible_monsters = []
         self.monster_count = 0
         self.dead_monsters = []
 
+    def _allocate(self):
+        """Allocate the planes of per-cell state for the whole map."""
+        size = self.rows * self.cols
+        # The terrain is a row-major grid of tile codes, one byte per cell.
+        # Whether a cell is in view, or has ever been, is kept in flag planes
+        # of the same layout.
+        self._terrain = bytearray(size)
+        # Which cells let light through, derived from the terrain for the
+        # field of view.
+        self._transparent = bytearray([tile.TRANSPARENT[0]]) * size
+        self._seen = bytearray(size)
+        self._was_seen = bytearray(size)
+        # Unoccupied, walkable cells indoors and outdoors, and those of them
+        # out of the hero's view, to pick places for monsters and loot from.
+        # They are indexed once the map is generated.
+        self._free_indoor = None
+        self._free_outdoor = None
+        self._hidden = None
+
+    def _index_locations(self):
+        """Index the unoccupied, walkable cells of the map."""
+        size = self.rows * self.cols
+        if numpy is None:
+            indoor = self._walkable_indices(True)
+            outdoor = self._walkable_indices(False)
+            hidden = [index for index in indoor + outdoor
+                      if index not in self._lit]
+        else:
+            codes = numpy.frombuffer(bytes(self._terrain), numpy.uint8)
+            free = numpy.array(tile.WALKABLE, bool)[codes]
+            free[list(self._creatures)] = False
+            indoor_cells = numpy.array(tile.INDOOR, bool)[codes]
+            indoor = numpy.flatnonzero(free & indoor_cells)
+            outdoor = numpy.flatnonzero(free & ~indoor_cells)
+            free[list(self._lit)] = False
+            hidden = numpy.flatnonzero(free)
+        self._free_indoor = sampling.IndexSet(size, indoor)
+        self._free_outdoor = sampling.IndexSet(size, outdoor)
+        self._hidden = sampling.IndexSet(size, hidden)
+
+    def _create_caches(self):
+        """Create the caches of state that can be worked out again."""
+        # Shared Locations for in-bounds cells, created on first use.
+        self._locations = [None] * (self.rows * self.cols)
+        self.fov_cache = fov.FovCache()
+        # Planned over blocks of the road grid once the map is made.
+        self._route_planner = None
+        self._path_finder = None
+
+    def __getstate__(self):
+        """Pickle the world without its caches and sampling sets."""
+        state = self.__dict__.copy()
+        state.pop('_locations', None)
+        del state['fov_cache']
+        state.pop('_route_planner', None)
+        state.pop('_path_finder', None)
+        for name in ('_free_indoor', '_free_outdoor', '_hidden'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._create_caches()
+        self._index_locations()
+
+    @property
+    def visible_monsters(self):
+        """The list of monsters in view, in the order they came into view."""
+        return self._visible.keys()
+
     def is_empty(self, loc):
         """Returns True if the location is empty."""
-        return self.cell(loc).transparent
+        return bool(self._transparent[loc.row * self.cols + loc.col])
 
     def is_valid_location(self, loc):
         """Return true if this location is in the world bounds."""
         return 0 <= loc.row < self.rows and 0 <= loc.col < self.cols
 
+    def location(self, row, col):
+        """Return the shared Location for (row, col), which must be within the
+        world bounds."""
+        index = row * self.cols + col
+        loc = self._locations[index]
+        if loc is None:
+            loc = self._locations[index] = Location(row, col)
+        return loc
+
     def cell(self, loc):
         """Return the tile at the location."""
-        return self.tiles[loc.row][loc.col]
+        return tile.Tile(self, loc.row * self.cols + loc.col)
+
+    def _set_terrain(self, row, col, tile_type):
+        """Set the terrain of the cell at (row, col) to a TileType."""
+        index = row * self.cols + col
+        self._terrain[index] = tile_type.code
+        self._transparent[index] = tile_type.transparent
+
+    def _terrain_at(self, row, col):
+        """Return the terrain code of the cell at (row, col)."""
+        return self._terrain[row * self.cols + col]
 
     def size_in_tiles(self):
         """Return the size of the world in tiles."""
         return self.rows * self.cols
 
-    def indoor_walkable_locations(self):
-        """Return a list of Locations that are indoors."""
-        results = []
-        for row in xrange(self.rows):
-            for col in xrange(self.cols):
-                loc = Location(row, col)
-                if self.cell(loc).indoor and self.cell(loc).walkable:
-                    results.append(loc)
-        return results
+    def seen_tile_count(self):
+        """Return the number of tiles currently being seen."""
+        return self._seen.count(chr(True))
 
-    def outdoor_walkable_locations(self):
-        """Return a list of Locations that are outside and walkable."""
+    def indoor_walkable_locations(self, area=None):
+        """Return a list of Locations that are indoors.
+
+        area -- (top, bottom, left, right) half-open ranges of rows and
+                columns to search; by default, the whole map
+        """
+        return self._walkable_locations(True, area)
+
+    def outdoor_walkable_locations(self, area=None):
+        """Return a list of Locations that are outside and walkable.
+
+        area -- (top, bottom, left, right) half-open ranges of rows and
+                columns to search; by default, the whole map
+        """
+        return self._walkable_locations(False, area)
+
+    def _walkable_locations(self, indoor, area=None):
+        """Return a list of unoccupied, walkable Locations that are either
+        indoors or outdoors."""
+        return [self.location(index // self.cols, index % self.cols)
+                for index in self._walkable_indices(indoor, area)]
+
+    def _walkable_indices(self, indoor, area=None):
+        """Return a list of the indices of unoccupied, walkable cells that are
+        either indoors or outdoors."""
+        codes = [chr(tile_type.code) for tile_type in tile.TILE_TYPES
+                 if tile_type.walkable and tile_type.indoor == indoor]
+        if area is None:
+            spans = [(0, self._terrain)]
+        else:
+            top, bottom, left, right = area
+            spans = [(row * self.cols + left,
+                      self._terrain[row * self.cols + left:
+                                    row * self.cols + right])
+                     for row in xrange(top, bottom)]
         results = []
-        for row in xrange(self.rows):
-            for col in xrange(self.cols):
-                loc = Location(row, col)
-                if not self.cell(loc).indoor and self.cell(loc).walkable:
-                    results.append(loc)
+        for start, terrain in spans:
+            for code in codes:
+                offset = terrain.find(code)
+                while offset != -1:
+                    index = start + offset
+                    if index not in self._creatures:
+                        results.append(index)
+                    offset = terrain.find(code, offset + 1)
         return results
 
+    def random_free_location(self, indoor=None, hidden=False):
+        """Return a random unoccupied, walkable Location, or None if there are
+        none. Every such location is equally likely.
+
+        indoor -- True for indoor locations only, False for outdoor ones only
+                  and None for either
+        hidden -- whether to exclude locations visible to the hero; hidden
+                  locations may be indoors or outdoors
+        """
+        if hidden:
+            index = self._hidden.choice()
+        elif indoor is None:
+            index = sampling.choice([self._free_indoor, self._free_outdoor])
+        elif indoor:
+            index = self._free_indoor.choice()
+        else:
+            index = self._free_outdoor.choice()
+        if index is None:
+            return None
+        return self.location(index // self.cols, index % self.cols)
+
+    def flow_step(self, loc, radius):
+        """Return the delta of the best open step from a location along the
+        cheapest walk to the hero, or None if the hero is further than radius
+        rows or columns away, out of reach or no open step gets closer."""
+        hero_index = self.hero_location.row * self.cols + \
+            self.hero_location.col
+        if radius > self._flow_radius:
+            self._flow_radius = radius
+            self._hero_flow = None
+        if self._hero_flow is None or self._hero_flow.goal != hero_index:
+            self._hero_flow = flow.FlowField(self._terrain, self.rows,
+                                             self.cols, hero_index,
+                                             self._flow_radius)
+        step = self._hero_flow.step(
+            loc.row, loc.col, lambda index: index not in self._creatures)
+        if step is None:
+            return None
+        return _DELTAS[step[0] + 1][step[1] + 1]
+
+    def find_path(self, start, goal, radius=None):
+        """Return a list of the Locations along the cheapest walk from the
+        start to the goal, leaving out the start, or None if there is no walk
+        between them.
+
+        Creatures are not taken into account. Use plan_route() for walks
+        across the map, which are quicker to plan but not always the
+        cheapest.
+
+        radius -- if given, only walk through cells within this many rows and
+                  columns of the start
+        """
+        if self._path_finder is None:
+            self._path_finder = pathing.PathFinder(
+                self._terrain, self.rows, self.cols, self.rows * self.cols)
+        walk = self._path_finder.path(start.row * self.cols + start.col,
+                                      goal.row * self.cols + goal.col,
+                                      radius)
+        if walk is None:
+            return None
+        return [self.location(index // self.cols, index % self.cols)
+                for index in walk]
+
+    def plan_route(self, start, goal):
+        """Return a list of the Locations along a short walk from the start
+        to the goal, leaving out the start, or None if there is no walk
+        between them.
+
+        Creatures are not taken into account, so the walk may be blocked by
+        them."""
+        if self._route_planner is None:
+            self._route_planner = pathing.RoutePlanner(
+                self._terrain, self.rows, self.cols, ROAD_GRID_SIZE)
+        walk = self._route_planner.route(start.row * self.cols + start.col,
+                                         goal.row * self.cols + goal.col)
+        if walk is None:
+            return None
+        return [self.location(index // self.cols, index % self.cols)
+                for index in walk]
+
+    def _set_creature(self, index, creature):
+        """Place a creature in the cell at index, or clear it with None."""
+        if index in self._lit:
+            self.view_changes += 1
+        if creature is None:
+            if self._creatures.pop(index, None) is not None and \
+                    self._hidden is not None:
+                self._free_cell(index)
+        else:
+            self._creatures[index] = creature
+            if self._hidden is not None:
+                self._free_indoor.discard(index)
+                self._free_outdoor.discard(index)
+                self._hidden.discard(index)
+
+    def _free_cell(self, index):
+        """Return a cell that has just been left to the sampling sets."""
+        code = self._terrain[index]
+        if tile.WALKABLE[code]:
+            if tile.INDOOR[code]:
+                self._free_indoor.add(index)
+            else:
+                self._free_outdoor.add(index)
+            if index not in self._lit:
+                self._hidden.add(index)
+
     def glyph_at(self, loc):
         """Returns the world glyph and its color at the specified location.  If
         the location coordinates are out of bounds, returns a shield character.
         """
         if loc == self.hero_location:
             return '@'
-        cell = self.cell(loc)
-        if cell.creature:
-            return cell.creature.glyph
-        if cell.items:
-            return cell.items[0].glyph
-        return cell.glyph
+        index = loc.row * self.cols + loc.col
+        creature = self._creatures.get(index)
+        if creature:
+            return creature.glyph
+        items = self._items.get(index)
+        if items:
+            return items[0].glyph
+        return tile.GLYPHS[self._terrain[index]]
+
+    def view_row(self, row, left, right):
+        """Return the glyphs of the cells of a row from column left up to
+        right, as glyph_at() would return them, and a list of how well each
+        cell is known: 2 if it is in view, 1 if it has been seen before and 0
+        if it has never been seen."""
+        start = row * self.cols
+        hero_index = self.hero_location.row * self.cols + \
+            self.hero_location.col
+        creatures, items = self._creatures, self._items
+        seen, was_seen = self._seen, self._was_seen
+        glyphs = [tile.GLYPHS[code]
+                  for code in self._terrain[start + left:start + right]]
+        known = []
+        for offset, index in enumerate(xrange(start + left, start + right)):
+            known.append(seen[index] + was_seen[index])
+            if index == hero_index:
+                glyphs[offset] = '@'
+            elif index in creatures:
+                glyphs[offset] = creatures[index].glyph
+            elif items.get(index):
+                glyphs[offset] = items[index][0].glyph
+        return glyphs, known
 
     def description_at(self, loc):
         """Return a description of the location specified.
@@ -214,29 +553,45 @@ class World(object):
 
         assert delta.row < 2
         assert delta.col < 2
-        to_loc = from_loc.offset(delta.row, delta.col)
-        if self.cell(to_loc).walkable:
-            moved_creature = self.cell(from_loc).creature
-            LOG.info('Moved creature %r from %r to %r', moved_creature.name,
-                     from_loc, to_loc)
-            moved_creature.loc = to_loc
-            self.cell(from_loc).creature = None
-            self.cell(to_loc).creature = moved_creature
+        to_index = (from_loc.row + delta.row) * self.cols + from_loc.col + \
+            delta.col
+        if tile.WALKABLE[self._terrain[to_index]] and \
+                to_index not in self._creatures:
+            self._relocate_creature(from_loc, self.location(
+                from_loc.row + delta.row, from_loc.col + delta.col))
             return engine.movement_cost(delta.row, delta.col)
         return 0
 
+    def _relocate_creature(self, from_loc, to_loc):
+        """Move the creature at one location to another, empty location."""
+        from_index = from_loc.row * self.cols + from_loc.col
+        to_index = to_loc.row * self.cols + to_loc.col
+        moved_creature = self._creatures[from_index]
+        LOG.info('Moved creature %r from %r to %r', moved_creature.name,
+                 from_loc, to_loc)
+        moved_creature.loc = to_loc
+        self._set_creature(from_index, None)
+        self._set_creature(to_index, moved_creature)
+        self.creature_index.add(moved_creature, to_loc)
+        if to_index in self._lit:
+            self._visible[moved_creature] = True
+        else:
+            self._visible.pop(moved_creature, None)
+
     def change_hero_loc(self, new_loc):
         """Change the hero location."""
         old_loc = self.hero_location
         self.hero_location = new_loc
         self.cell(old_loc).creature = None
         self.cell(new_loc).creature = the.hero
+        self.creature_index.add(the.hero, new_loc)
         self.do_fov()
+        self._wake_monsters()
 
     def move_hero(self, delta_y, delta_x):
         """Move the hero by (delta_y, delta_x)."""
         old_loc = self.hero_location
-        new_loc = self.hero_location.offset(delta_y, delta_x)
+        new_loc = self.location(old_loc.row + delta_y, old_loc.col + delta_x)
         if self.cell(new_loc).walkable:
             LOG.info('Moved hero from %r to %r', old_loc, new_loc)
             self.change_hero_loc(new_loc)
@@ -259,13 +614,13 @@ class World(object):
         """Calculates the location for the hero.
 
         The hero will start in the other ring of the map."""
-        rand_dist = random.uniform(self.cols / 4, self.cols / 2 - 1)
-        rand_dir = random.uniform(0, 359)
+        rand_dist = self._random.uniform(self.cols / 4, self.cols / 2 - 1)
+        rand_dir = self._random.uniform(0, 359)
         row = int(rand_dist * math.sin(rand_dir)) + self.rows / 2
         col = int(rand_dist * math.cos(rand_dir)) + self.cols / 2
-        the.hero.loc = Location(row, col)
+        the.hero.loc = self.location(row, col)
         LOG.debug("Hero starts at %r.", the.hero.loc)
-        return Location(row, col)
+        return the.hero.loc
 
     def add_road(self, start_loc, delta_y, delta_x, beta):
         """Adds a road to the map
@@ -278,26 +633,30 @@ class World(object):
         keep_going = True
         road_loc = start_loc
         while self.is_valid_location(road_loc) and keep_going:
-            self.tiles[road_loc.row][road_loc.col] = tile.make_street()
+            self._set_terrain(road_loc.row, road_loc.col, tile.make_street())
             road_loc = road_loc.offset(delta_y, delta_x)
             if self.is_valid_location(road_loc) \
-                    and self.cell(road_loc).glyph == '#':
+                    and self.cell(road_loc).type is tile.WALL:
                 keep_going = random.uniform(0, 1) < beta
 
     def _log(self):
         """Dumps the world into a file called 'world.dump'"""
         with open("world.dump", "w") as dump_file:
-            for row in self._junction_grid:
+            # Maps loaded from the cache have no junction grid.
+            for row in self._junction_grid or []:
                 dump_file.write("%r" % row)
             for row in range(self.rows):
-                for col in range(self.cols):
-                    dump_file.write(self.cell(Location(row, col)).glyph)
+                start = row * self.cols
+                dump_file.write("".join(
+                    tile.GLYPHS[code]
+                    for code in self._terrain[start:start + self.cols]))
                 dump_file.write("\n")
 
     def random_empty_location(self, near=None, attempts=5, radius=10):
         """Creates a random location on the map, or a random location on the
         map near a specified location."""
-
+        if near is None:
+            return self.random_free_location()
         while attempts > 0:
             if near is None:
                 row = int(random.uniform(0, self.rows))
@@ -307,10 +666,10 @@ class World(object):
                                             high=near.row + radius))
                 col = int(random.triangular(low=near.col - radius,
                                             high=near.col + radius))
-            loc = Location(row, col)
-            if self.is_valid_location(loc) and \
-               self.cell(loc).creature is None and self.cell(loc).walkable:
-                return loc
+            if 0 <= row < self.rows and 0 <= col < self.cols:
+                loc = self.location(row, col)
+                if self.cell(loc).walkable:
+                    return loc
             attempts -= 1
         return None
 
@@ -323,8 +682,10 @@ class World(object):
         """Spawns a monster on the map.
 
         The monster should already be created, place_monster only attempts to
-        find a suitable location on the map and place it. If a suitable
-        location cannot be found in one attempt, it returns False.
+        find a suitable location on the map and place it. Anywhere in the
+        world, it fails only if there is no room; near a location, it fails if
+        a suitable location cannot be found in one attempt. It returns False
+        on failure.
 
         monster - the monster to add to the map
         near - a location near which to place the monster, or None if anywhere
@@ -332,7 +693,10 @@ class World(object):
         hidden - whether to exclude locations visible to the hero
         """
         assert monster
-        location = self.random_empty_location(near)
+        if near is None:
+            location = self.random_free_location(hidden=hidden)
+        else:
+            location = self.random_empty_location(near)
         if location is None:
             return False
         if self.cell(location).seen and hidden:
@@ -341,99 +705,140 @@ class World(object):
             the.turn.add_actor(monster)
             monster.loc = location
             self.cell(location).creature = monster
+            self.creature_index.add(monster, location)
+            self._update_visibility(monster, location)
             LOG.info('%r placed at %r', monster, location)
             self.monster_count += 1
             return True
 
+    def park(self, monster):
+        """Park a monster, further than dormant_radius from the hero, out of
+        the turn queue.
+
+        A parked monster stays where it is until the hero comes near enough
+        to wake it, and must not be requeued."""
+        self.dormant[monster] = the.turn.current_turn
+        LOG.info('%r parked at %r', monster, monster.loc)
+
+    def _wake_monsters(self):
+        """Return the parked monsters near the hero to the turn queue, each
+        moved about as far as it would have wandered while parked."""
+        if not self.dormant:
+            return
+        for monster, _ in self.creature_index.within(self.hero_location,
+                                                     self.wake_radius):
+            if monster not in self.dormant:
+                continue
+            parked_for = the.turn.current_turn - self.dormant.pop(monster)
+            self._catch_up(monster, parked_for // WANDER_TICKS)
+            # Spread the woken monsters' turns out, as if they had been
+            # acting all along.
+            the.turn.add_actor(monster, random.randint(0, WANDER_TICKS))
+            LOG.info('%r woken at %r', monster, monster.loc)
+
+    def _catch_up(self, monster, steps):
+        """Move a monster to where a random walk of some steps might have
+        taken it, if that place is free and it could have walked there."""
+        steps = min(steps, CATCH_UP_STEPS)
+        if steps <= 0:
+            return
+        # Each random step moves a row and a column with chance 2/3 each, so
+        # the walk spreads out like a normal distribution.
+        spread = math.sqrt(steps * 2.0 / 3)
+        delta_row, delta_col = [max(-steps, min(steps, int(round(
+            random.gauss(0, spread))))) for _ in xrange(2)]
+        row = monster.loc.row + delta_row
+        col = monster.loc.col + delta_col
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return
+        to_loc = self.location(row, col)
+        if not self.cell(to_loc).walkable:
+            return
+        # Only accept places the monster could have reached in time, so it
+        # never turns up on the far side of a wall.
+        walk = self.find_path(monster.loc, to_loc, radius=steps)
+        if walk is not None and len(walk) <= steps:
+            self._relocate_creature(monster.loc, to_loc)
+
     def remove_monster(self, monster):
         """Removes a monster from the map, for example when it dies."""
-        self.visible_monsters.remove(monster)
-        self.tiles[monster.loc.row][monster.loc.col].creature = None
+        self.dormant.pop(monster, None)
+        self._visible.pop(monster, None)
+        self.cell(monster.loc).creature = None
+        self.creature_index.remove(monster)
         self.monster_count -= 1
         self.dead_monsters.append(monster)
 
     def add_item(self, loc, item):
         """Add an item to a location."""
         assert self.is_valid_location(loc)
-        self.cell(loc).items.append(item)
+        index = loc.row * self.cols + loc.col
+        self._items.setdefault(index, []).append(item)
 
     def get_item(self, loc):
         """Get an item from the world."""
         assert self.is_valid_location(loc)
+        index = loc.row * self.cols + loc.col
         item = None
-        if self.cell(loc).items:
-            item = self.cell(loc).items.pop()
+        items = self._items.get(index)
+        if items:
+            item = items.pop()
+            if not items:
+                del self._items[index]
         return item
 
     def set_lit(self, loc):
         """Set the cell at loc as visible."""
-        self.cell(loc).seen = True
-        monster = self.cell(loc).creature
-        if monster and monster not in self.visible_monsters:
-            self.visible_monsters.append(monster)
-
-    def _cast_light(self, cx, cy, row, start, end, radius, xx, xy, yx, yy):
-        "Recursive lightcasting function"
-        if start < end:
-            return
-        radius_squared = radius*radius
-        for j in range(row, radius+1):
-            dx, dy = -j-1, -j
-            blocked = False
-            while dx <= 0:
-                dx += 1
-                # Translate the dx, dy coordinates into map coordinates:
-                X, Y = cx + dx * xx + dy * xy, cy + dx * yx + dy * yy
-                # l_slope and r_slope store the slopes of the left and right
-                # extremities of the square we're considering:
-                l_slope, r_slope = (dx-0.5)/(dy+0.5), (dx+0.5)/(dy-0.5)
-                loc = Location(Y, X)
-                if not self.is_valid_location(loc):
-                    return
-                if start < r_slope:
-                    continue
-                elif end > l_slope:
-                    break
-                else:
-                    # Our light beam is touching this square; light it:
-                    if dx*dx + dy*dy < radius_squared:
-                        self.set_lit(loc)
-                    if blocked:
-                        # we're scanning a row of blocked squares:
-                        if not self.is_empty(loc):
-                            new_start = r_slope
-                            continue
-                        else:
-                            blocked = False
-                            start = new_start
-                    else:
-                        if not self.is_empty(loc) and j < radius:
-                            # This is a blocking square, start a child scan:
-                            blocked = True
-                            self._cast_light(cx, cy, j+1, start, l_slope,
-                                             radius, xx, xy, yx, yy)
-                            new_start = r_slope
-            # Row is scanned; do next row unless last square was blocked:
-            if blocked:
-                break
+        self._light(loc.row * self.cols + loc.col)
+
+    def _light(self, index):
+        """Bring the cell at index into view."""
+        self._lit.add(index)
+        self._hidden.discard(index)
+        self._seen[index] = True
+        self._was_seen[index] = True
+        monster = self._creatures.get(index)
+        if monster and monster is not the.hero:
+            self._visible[monster] = True
+
+    def _unlight(self, index):
+        """Take the cell at index out of view."""
+        self._lit.discard(index)
+        self._seen[index] = False
+        monster = self._creatures.get(index)
+        if monster:
+            self._visible.pop(monster, None)
+        elif tile.WALKABLE[self._terrain[index]]:
+            self._hidden.add(index)
+
+    def _update_visibility(self, monster, loc):
+        """Add or remove a monster that has just arrived at loc from the
+        visible monsters."""
+        if loc.row * self.cols + loc.col in self._lit:
+            self._visible[monster] = True
+        else:
+            self._visible.pop(monster, None)
 
     def reset_fov(self):
         """Reset the field of view data for the map."""
-        for row in xrange(self.rows):
-            for col in xrange(self.cols):
-                self.tiles[row][col].seen = False
-        self.visible_monsters = []
+        for index in list(self._lit):
+            self._unlight(index)
+        self._visible.clear()
 
     def do_fov(self):
-        "Calculate lit squares from the given location and radius"
-        self.reset_fov()
-        for octant in range(8):
-            self._cast_light(self.hero_location.col, self.hero_location.row,
-                             1, 1.0, 0.0, 10,
-                             mult[0][octant], mult[1][octant],
-                             mult[2][octant], mult[3][octant])
-
-    def _generate(self):
+        """Calculate the cells lit from the hero location.
+
+        The new field of view is compared with the current one, so only the
+        cells that go out of or come into view are updated."""
+        lit = self.fov_cache.shadowcast(self._transparent, self.rows,
+                                        self.cols, self.hero_location.row,
+                                        self.hero_location.col, FOV_RADIUS)
+        for index in self._lit - lit:
+            self._unlight(index)
+        for index in sorted(lit - self._lit):
+            self._light(index)
+
+    def _generate(self, vectorized):
         """Generate the world map.
 
         This function builds the world in several stages.
@@ -442,27 +847,33 @@ class World(object):
         2) Generate the road grid.
         3) Build the fortress.
         4) Build the other buildings and a lake.
-        """
-        self._generate_vegetation()
-        self._generate_roads()
-        self._generate_computer()
-        self._generate_shield()
-        self._generate_buildings()
 
-    def _generate_vegetation(self):
+        vectorized -- paint whole areas at once with NumPy, rather than one
+                      cell at a time
+        """
+        if vectorized:
+            painter = _ArrayPainter(self)
+        else:
+            painter = _GridPainter(self)
+        self._generate_vegetation(painter)
+        self._generate_roads(painter)
+        self._generate_computer(painter)
+        self._generate_shield(painter)
+        self._generate_buildings(painter)
+        painter.finish()
+
+    def _generate_vegetation(self, painter):
         """Fill the map with vegeation."""
-        for row in xrange(0, self.rows):
-            for col in xrange(0, self.cols):
-                if TREE_CHANCE > random.random():
-                    self.tiles[row][col] = tile.make_tree()
-                else:
-                    self.tiles[row][col] = tile.make_empty()
+        painter.sprinkle(0, self.rows, 0, self.cols, tile.make_tree(),
+                         TREE_CHANCE, tile.make_empty())
 
-    def _generate_roads(self):
+    def _generate_roads(self, painter):
         """Fill the map with a grid of roads."""
         junction_grid = _create_junction_grid(self.rows, self.cols,
-                                              ROAD_GRID_SIZE)
+                                              ROAD_GRID_SIZE, self._random)
         self._junction_grid = junction_grid  # for dumping purposes
+        street = tile.make_street()
+        empty = tile.make_empty()
         prev_road_row = 0
         road_row = ROAD_GRID_SIZE
         prev_road_col = 0
@@ -477,37 +888,29 @@ class World(object):
                     extended_prev_road_row = prev_road_row - 3
                     if extended_prev_road_row < 0:
                         extended_prev_road_row = 0
-                    for row in xrange(extended_prev_road_row, road_row):
-                        if self.tiles[row][road_col - 5].glyph != '*':
-                            self.tiles[row][road_col - 5] = tile.make_empty()
-                        if self.tiles[row][road_col - 4].glyph != '*':
-                            self.tiles[row][road_col - 4] = tile.make_empty()
-                        self.tiles[row][road_col - 3] = tile.make_street()
-                        self.tiles[row][road_col - 2] = tile.make_street()
-                        self.tiles[row][road_col - 1] = tile.make_street()
-                        if road_col < self.cols - 1 \
-                                and self.tiles[row][road_col].glyph != '*':
-                            self.tiles[row][road_col + 0] = tile.make_empty()
-                        if road_col < self.cols - 2 \
-                                and self.tiles[row][road_col + 1].glyph != '*':
-                            self.tiles[row][road_col + 1] = tile.make_empty()
+                    top, bottom = extended_prev_road_row, road_row
+                    painter.fill_around(top, bottom, road_col - 5,
+                                        road_col - 3, empty, street)
+                    painter.fill(top, bottom, road_col - 3, road_col, street)
+                    if road_col < self.cols - 1:
+                        painter.fill_around(top, bottom, road_col,
+                                            road_col + 1, empty, street)
+                    if road_col < self.cols - 2:
+                        painter.fill_around(top, bottom, road_col + 1,
+                                            road_col + 2, empty, street)
                 if junction[3]:  # West road
                     LOG.debug("Drawing west road from col %d to col %d in "
                               "row %d", prev_road_col, road_col, road_row)
-                    for col in xrange(prev_road_col, road_col):
-                        if self.tiles[road_row - 5][col].glyph != '*':
-                            self.tiles[road_row - 5][col] = tile.make_empty()
-                        if self.tiles[road_row - 4][col].glyph != '*':
-                            self.tiles[road_row - 4][col] = tile.make_empty()
-                        self.tiles[road_row - 3][col] = tile.make_street()
-                        self.tiles[road_row - 2][col] = tile.make_street()
-                        self.tiles[road_row - 1][col] = tile.make_street()
-                        if road_row < self.rows - 1 \
-                                and self.tiles[road_row][col].glyph != '*':
-                            self.tiles[road_row][col] = tile.make_empty()
-                        if road_row < self.rows - 2 \
-                                and self.tiles[road_row + 1][col].glyph != '*':
-                            self.tiles[road_row + 1][col] = tile.make_empty()
+                    left, right = prev_road_col, road_col
+                    painter.fill_around(road_row - 5, road_row - 3, left,
+                                        right, empty, street)
+                    painter.fill(road_row - 3, road_row, left, right, street)
+                    if road_row < self.rows - 1:
+                        painter.fill_around(road_row, road_row + 1, left,
+                                            right, empty, street)
+                    if road_row < self.rows - 2:
+                        painter.fill_around(road_row + 1, road_row + 2, left,
+                                            right, empty, street)
                 prev_road_col = road_col
                 road_col += ROAD_GRID_SIZE
                 if road_col >= self.cols:
@@ -524,13 +927,17 @@ class World(object):
         for junction_row in junction_grid:
             for junction in junction_row:
                 if not junction[0] and not junction[3]:
-                    self.tiles[road_row - 3][road_col - 3] = tile.make_empty()
+                    painter.fill(road_row - 3, road_row - 2, road_col - 3,
+                                 road_col - 2, empty)
                 if not junction[2] and not junction[3]:
-                    self.tiles[road_row - 1][road_col - 3] = tile.make_empty()
+                    painter.fill(road_row - 1, road_row, road_col - 3,
+                                 road_col - 2, empty)
                 if not junction[1] and not junction[2]:
-                    self.tiles[road_row - 1][road_col - 1] = tile.make_empty()
+                    painter.fill(road_row - 1, road_row, road_col - 1,
+                                 road_col, empty)
                 if not junction[0] and not junction[1]:
-                    self.tiles[road_row - 3][road_col - 1] = tile.make_empty()
+                    painter.fill(road_row - 3, road_row - 2, road_col - 1,
+                                 road_col, empty)
                 road_col += ROAD_GRID_SIZE
                 if road_col >= self.cols:
                     road_col = self.cols
@@ -539,25 +946,22 @@ class World(object):
             if road_row >= self.rows:
                 road_row = self.rows
 
-    def _generate_computer(self):
+    def _generate_computer(self, painter):
         """Places a shield generator in the center of the map."""
         row = self.rows / 2
         col = self.cols / 2
-        self.generator_location = Location(row, col)
-        self.tiles[row][col] = tile.make_shield_generator()
+        self.generator_location = self.location(row, col)
+        painter.fill(row, row + 1, col, col + 1, tile.make_shield_generator())
 
-    def _generate_shield(self):
+    def _generate_shield(self, painter):
         """Creates the shield border around the navigable map."""
+        shield = tile.make_shield()
+        painter.fill(0, self.rows, 0, 1, shield)
+        painter.fill(0, self.rows, self.cols - 1, self.cols, shield)
+        painter.fill(0, 1, 0, self.cols, shield)
+        painter.fill(self.rows - 1, self.rows, 0, self.cols, shield)
 
-        for row in range(0, self.rows):
-            self.tiles[row][0] = tile.make_shield()
-            self.tiles[row][self.cols - 1] = tile.make_shield()
-
-        for col in range(self.cols):
-            self.tiles[0][col] = tile.make_shield()
-            self.tiles[self.rows - 1][col] = tile.make_shield()
-
-    def _generate_buildings(self):
+    def _generate_buildings(self, painter):
         """Create buildings in some blocks."""
         cell_begin_row = 0
         cell_end_row = ROAD_GRID_SIZE
@@ -566,10 +970,11 @@ class World(object):
 
         while cell_end_row < self.rows:
             while cell_end_col < self.cols:
-                if random.random() < BUILDING_CHANCE:
+                if self._random.random() < BUILDING_CHANCE:
                     begin = Location(cell_begin_row, cell_begin_col)
                     end = Location(cell_end_row, cell_end_col)
-                    self._generate_building(begin, end)
+                    self._generate_building(painter, begin, end,
+                                            self._random)
                 cell_begin_col = cell_end_col
                 cell_end_col += ROAD_GRID_SIZE
             cell_begin_row = cell_end_row
@@ -577,26 +982,121 @@ class World(object):
             cell_begin_col = 0
             cell_end_col = ROAD_GRID_SIZE
 
-    def _generate_building(self, begin, end):
-        """Create a building at the sepcified site."""
+    def _generate_building(self, painter, begin, end, rng):
+        """Create a building at the sepcified site, sized by the random number
+        generator given."""
         LOG.debug("Generating a building between %r and %r.", begin, end)
-        top = begin.row + random.randint(3, ROAD_GRID_SIZE / 3)
-        bottom = end.row - random.randint(6, ROAD_GRID_SIZE / 3)
-        left = begin.col + random.randint(3, ROAD_GRID_SIZE / 3)
-        right = end.col - random.randint(6, ROAD_GRID_SIZE / 3)
-        for row in xrange(top, bottom + 1):
-            for col in xrange(left, right + 1):
-                if row == top or row == bottom or col == left or col == right:
-                    if WALL_BREAK_CHANCE < random.random():
-                        self.tiles[row][col] = tile.make_wall()
+        top = begin.row + rng.randint(3, ROAD_GRID_SIZE / 3)
+        bottom = end.row - rng.randint(6, ROAD_GRID_SIZE / 3)
+        left = begin.col + rng.randint(3, ROAD_GRID_SIZE / 3)
+        right = end.col - rng.randint(6, ROAD_GRID_SIZE / 3)
+        painter.outline(top, bottom + 1, left, right + 1, tile.make_wall(),
+                        WALL_BREAK_CHANCE)
+        painter.fill(top + 1, bottom, left + 1, right, tile.make_floor())
+
+
+class _GridPainter(object):
+    """Paints terrain onto a world one cell at a time.
+
+    Areas are given as half-open ranges of rows, from top to bottom, and of
+    columns, from left to right."""
+
+    def __init__(self, world):
+        self._world = world
+
+    def fill(self, top, bottom, left, right, tile_type):
+        """Fill an area with a type of tile."""
+        for row in xrange(top, bottom):
+            for col in xrange(left, right):
+                self._world._set_terrain(row, col, tile_type)
+
+    def fill_around(self, top, bottom, left, right, tile_type, keep):
+        """Fill an area with a type of tile, except for cells that are
+        already of the type to keep."""
+        for row in xrange(top, bottom):
+            for col in xrange(left, right):
+                if self._world._terrain_at(row, col) != keep.code:
+                    self._world._set_terrain(row, col, tile_type)
+
+    def sprinkle(self, top, bottom, left, right, tile_type, chance,
+                 otherwise):
+        """Fill each cell of an area with a type of tile by chance, and with
+        the other type of tile otherwise."""
+        for row in xrange(top, bottom):
+            for col in xrange(left, right):
+                if chance > self._world._random.random():
+                    self._world._set_terrain(row, col, tile_type)
                 else:
-                    self.tiles[row][col] = tile.make_floor()
-
-
-def _generate_random_junction(north, south, east, west):
+                    self._world._set_terrain(row, col, otherwise)
+
+    def outline(self, top, bottom, left, right, tile_type, break_chance):
+        """Draw the border of an area with a type of tile, leaving each cell
+        of it untouched by chance."""
+        for row in xrange(top, bottom):
+            for col in xrange(left, right):
+                if row == top or row == bottom - 1 or col == left \
+                        or col == right - 1:
+                    if break_chance < self._world._random.random():
+                        self._world._set_terrain(row, col, tile_type)
+
+    def finish(self):
+        """Nothing to do; the terrain was painted in place."""
+        pass
+
+
+class _ArrayPainter(object):
+    """Paints terrain onto a NumPy array a whole area at a time, and copies
+    the result into the world when finished.
+
+    The array's random numbers are seeded from the random module, so seeding
+    that still reproduces a world."""
+
+    def __init__(self, world):
+        self._world = world
+        self._terrain = numpy.zeros((world.rows, world.cols), numpy.uint8)
+        self._random = numpy.random.RandomState(
+            world._random.getrandbits(32))
+
+    def fill(self, top, bottom, left, right, tile_type):
+        """Fill an area with a type of tile."""
+        self._terrain[top:bottom, left:right] = tile_type.code
+
+    def fill_around(self, top, bottom, left, right, tile_type, keep):
+        """Fill an area with a type of tile, except for cells that are
+        already of the type to keep."""
+        area = self._terrain[top:bottom, left:right]
+        area[area != keep.code] = tile_type.code
+
+    def sprinkle(self, top, bottom, left, right, tile_type, chance,
+                 otherwise):
+        """Fill each cell of an area with a type of tile by chance, and with
+        the other type of tile otherwise."""
+        area = self._terrain[top:bottom, left:right]
+        area[...] = numpy.where(self._random.random_sample(area.shape) <
+                                chance, tile_type.code, otherwise.code)
+
+    def outline(self, top, bottom, left, right, tile_type, break_chance):
+        """Draw the border of an area with a type of tile, leaving each cell
+        of it untouched by chance."""
+        area = self._terrain[top:bottom, left:right]
+        wall = self._random.random_sample(area.shape) > break_chance
+        wall[1:-1, 1:-1] = False
+        area[wall] = tile_type.code
+
+    def finish(self):
+        """Copy the painted terrain, and its transparency, into the world."""
+        transparency = numpy.array(tile.TRANSPARENT, numpy.uint8)
+        self._world._terrain = bytearray(self._terrain.tobytes())
+        self._world._transparent = bytearray(
+            transparency[self._terrain].tobytes())
+
+
+def _generate_random_junction(north, south, east, west, rng=random):
     """Generate random junction given which roads much or must not exist.
     For north, south, east, and west True means road must exist, False means
     road must not exist, and None means either is okay.
+
+    rng -- the random number generator to use
     """
     result = [north, south, east, west]
     free_roads = []
@@ -606,9 +1106,9 @@ def _generate_random_junction(north, south, east, west):
     free_road_count = len(free_roads)
     fill_road_count = 0
     for _ in xrange(free_road_count):
-        fill_road_count += random.random() < ROAD_CHANCE
+        fill_road_count += rng.random() < ROAD_CHANCE
     while fill_road_count > 0:
-        fill_road = random.choice(free_roads)
+        fill_road = rng.choice(free_roads)
         result[fill_road] = True
         free_roads.remove(fill_road)
         fill_road_count -= 1
@@ -617,7 +1117,7 @@ def _generate_random_junction(north, south, east, west):
         if road is True:
             road_count += 1
     if road_count == 1:
-        fill_road = random.choice(free_roads)
+        fill_road = rng.choice(free_roads)
         free_roads.remove(fill_road)
         result[fill_road] = True
     while free_roads:
@@ -633,8 +1133,9 @@ def _log_junction_grid(grid):
         LOG.debug(row)
 
 
-def _create_junction_grid(map_rows, map_cols, cell_size):
-    """Create a grid of valid road intersations."""
+def _create_junction_grid(map_rows, map_cols, cell_size, rng=random):
+    """Create a grid of valid road intersations with a random number
+    generator."""
     assert cell_size < map_rows
     assert cell_size < map_cols
     junction_grid = []
@@ -649,6 +1150,7 @@ def _create_junction_grid(map_rows, map_cols, cell_size):
         for col in xrange(0, cols):
             north = junction_grid[row - 1][col][2] if row > 0 else None
             west = junction_grid[row][col - 1][1] if col > 0 else None
-            junction = _generate_random_junction(north, None, None, west)
+            junction = _generate_random_junction(north, None, None, west,
+                                                 rng)
             junction_grid[row].append(junction)
     return junction_grid